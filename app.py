@@ -1,29 +1,832 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify, g, has_request_context
 import pandas as pd
+import numpy as np
 import os
 import glob
-from datetime import datetime, timedelta
+import io
+import re
+import csv
+import json
+import gzip
+import hashlib
+import shutil
+import tempfile
+import threading
+import queue
+import zlib
+import time
+import select
+import sqlite3
+import struct
+import ctypes
+import ctypes.util
+import resource
+import atexit
+import multiprocessing
+import click
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
 
 app = Flask(__name__)
 
-def calculate_trading_analytics(transactions_df, start_date=None, end_date=None):
-    """Calculate various trading analytics from the transactions data."""
-    analytics = {}
+# Copy-on-write makes shallow copies of cached frames safe to hand out:
+# any modification made by a request copies the data instead of changing
+# the cached original.
+pd.set_option('mode.copy_on_write', True)
 
-    # Convert date strings to datetime
-    transactions_df['Date'] = pd.to_datetime(transactions_df['Date'], format='%Y%m%d')
+# Worker processes for CPU-bound work (default one per CPU). They are started once,
+# on first use, by a fork server (or spawned where there is none) rather than forked
+# from a server process whose threads may hold locks, and are stopped at exit.
+PROCESS_POOL_WORKERS = int(os.environ.get('PROCESS_POOL_WORKERS', os.cpu_count() or 1))
+PROCESS_POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
 
-    # Apply date filtering if provided
-    if start_date:
-        start_date = pd.to_datetime(start_date)
-        transactions_df = transactions_df[transactions_df['Date'] >= start_date]
+process_pool = None
+process_pool_lock = threading.Lock()
 
-    if end_date:
-        end_date = pd.to_datetime(end_date)
-        transactions_df = transactions_df[transactions_df['Date'] <= end_date]
+def shared_process_pool():
+    """Return the shared worker process pool, starting it on first use."""
+    global process_pool
+    with process_pool_lock:
+        if process_pool is None:
+            process_pool = ProcessPoolExecutor(max_workers=max(1, PROCESS_POOL_WORKERS),
+                                               mp_context=multiprocessing.get_context(PROCESS_POOL_START_METHOD))
+            atexit.register(process_pool.shutdown, cancel_futures=True)
+        return process_pool
 
-    # Return empty analytics if no data after filtering
+def pool_map(function, *iterables):
+    """Map a picklable function over the iterables on the shared pool, returning a list."""
+    global process_pool
+    pool = shared_process_pool()
+    try:
+        return list(pool.map(function, *iterables))
+    except BrokenProcessPool:
+        # A worker died; the next call starts a new pool
+        with process_pool_lock:
+            if process_pool is pool:
+                process_pool = None
+        raise
+
+# Memory budget for parsed datasets kept between requests (default 512 MB)
+DATASET_CACHE_MAX_BYTES = int(os.environ.get('DATASET_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+def file_fingerprint(path):
+    """Identify a file's current contents by (path, mtime, size)."""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def estimate_dataset_size(dataset):
+    """Estimate the memory held by a parsed dataset in bytes."""
+    size = 0
+    frames = {}
+    for value in dataset.values():
+        if isinstance(value, pd.DataFrame):
+            frames[id(value)] = value
+        elif isinstance(value, TradeLedger):
+            for frame in value.frames():
+                frames[id(frame)] = frame
+            size += value.index_nbytes()
+        else:
+            # Analytics, summaries and alerts are small in comparison
+            size += 1024
+    # Frames shared between entries (e.g. the ledger's fills) are counted once
+    for frame in frames.values():
+        size += frame_size(frame)
+    return size
+
+# Object columns are sized from a sample of their values rather than every value
+SIZE_SAMPLE_ROWS = 1000
+
+def frame_size(frame):
+    """Estimate the memory held by a DataFrame in bytes."""
+    size = int(frame.memory_usage(index=True, deep=False).sum())
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories
+            size += int(categories.memory_usage(deep=True) - categories.memory_usage())
+        elif values.dtype == object and len(values):
+            sample = values.iloc[np.linspace(0, len(values) - 1, min(len(values), SIZE_SAMPLE_ROWS)).astype(int)]
+            size += int(sample.memory_usage(index=False, deep=True) - sample.memory_usage(index=False)) * len(values) // len(sample)
+    return size
+
+class DatasetCache:
+    """
+    Process-level LRU cache of parsed datasets, bounded by a memory budget.
+    Only one load per source runs at a time: while a source is being rebuilt,
+    other requests for it get its previous dataset instead of waiting.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # fingerprint -> (dataset, size)
+        self._loading = {}  # source -> event set when its running load finishes
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, loader):
+        """
+        Return the dataset for key, calling loader() to build it on a miss.
+        key is a fingerprint of the source whose first element names it, e.g. file_fingerprint(path).
+        """
+        source = key[0]
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+                loading = self._loading.get(source)
+                if loading is None:
+                    self.misses += 1
+                    loading = self._loading[source] = threading.Event()
+                    break
+                # Serve the previous version rather than block behind the rebuild
+                stale = self._latest(source)
+                if stale is not None:
+                    self.stale_hits += 1
+                    return stale
+            # Nothing to serve yet: wait for the running load, then look again
+            loading.wait()
+
+        try:
+            # Parse outside the lock so other files can still be served meanwhile
+            dataset = loader()
+            size = estimate_dataset_size(dataset)
+
+            with self._lock:
+                # Older versions of the same source can never be hit again
+                for stale_key in [k for k in self._entries if k[0] == source and k != key]:
+                    self._remove(stale_key)
+                if size <= self.max_bytes and key not in self._entries:
+                    self._entries[key] = (dataset, size)
+                    self._size += size
+                    while self._size > self.max_bytes:
+                        self._remove(next(iter(self._entries)))
+                        self.evictions += 1
+        finally:
+            with self._lock:
+                del self._loading[source]
+            loading.set()
+        return dataset
+
+    def latest(self, source):
+        """Return the most recently cached dataset of a source (a key's first element), even if stale."""
+        with self._lock:
+            return self._latest(source)
+
+    def _latest(self, source):
+        for key in reversed(self._entries):
+            if key[0] == source:
+                return self._entries[key][0]
+        return None
+
+    def sources(self):
+        """Return the sources that have a cached dataset."""
+        with self._lock:
+            return {key[0] for key in self._entries}
+
+    def datasets(self):
+        """Return the cached (key, dataset) pairs, least recently used first."""
+        with self._lock:
+            return [(key, entry[0]) for key, entry in self._entries.items()]
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self._size -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current memory use."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups * 100) if lookups > 0 else 0,
+                'entries': len(self._entries),
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes
+            }
+
+dataset_cache = DatasetCache(DATASET_CACHE_MAX_BYTES)
+
+# Set in gunicorn workers forked from a master that keeps the datasets current
+# (see gunicorn.conf.py): they serve the preloaded datasets instead of parsing
+SERVE_PRELOADED = False
+
+# Stage timing: every response reports the time its request spent in each stage
+# (file reading, parsing, matching, analytics, complex trades, rendering) in a
+# Server-Timing header. With METRICS_ENABLED=1 the timings also feed latency
+# histograms that /metrics serves in the Prometheus text format.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Histogram:
+    """Cumulative latency histogram with one series per label value."""
+
+    def __init__(self, name, description, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, seconds):
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def render(self):
+        """Return the histogram as Prometheus exposition lines."""
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {value: list(counts) for value, counts in self._series.items()}
+        for value, counts in sorted(series.items()):
+            label = f'{self.label}="{metric_label(value)}"'
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {counts[-2]}')
+            lines.append(f'{self.name}_count{{{label}}} {counts[-2]}')
+            lines.append(f'{self.name}_sum{{{label}}} {counts[-1]:.6f}')
+        return lines
+
+def metric_label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+stage_latency = Histogram('tlg_stage_duration_seconds', 'Time spent in each dashboard stage.', 'stage')
+request_latency = Histogram('tlg_request_duration_seconds', 'Time spent handling each endpoint.', 'endpoint')
+
+def record_stage(stage, seconds):
+    """Add time spent in a stage to the current request's timings and the histograms."""
+    if has_request_context():
+        timings = g.setdefault('stage_timings', {})
+        timings[stage] = timings.get(stage, 0) + seconds
+    if METRICS_ENABLED:
+        stage_latency.observe(stage, seconds)
+
+@contextmanager
+def stage_timer(stage):
+    """Time a block, or a whole function when used as a decorator, as a stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+def read_only_view(dataset):
+    """
+    Return a per-request view of a cached dataset that cannot alter the cache. Routes
+    replace the view's entries rather than change them, so only the frames (which a
+    route could add columns to) are copied, lazily; the analytics, summaries and
+    indexes are shared with the cache and never modified after the dataset is built.
+    """
+    view = dict(dataset)
+    for key, value in dataset.items():
+        if isinstance(value, pd.DataFrame):
+            view[key] = value.copy(deep=False)  # lazy copy under copy-on-write
+        elif isinstance(value, TradeLedger):
+            view[key] = value.view()
+    return view
+
+def load_trading_data(filename):
+    """
+    Return the parsed dataset for filename (or ALL_DATA_FILES for the consolidated view),
+    reusing cached results while the files are unchanged.
+    """
+    return read_only_view(cached_trading_data(filename))
+
+def dataset_source(filename):
+    """Return the fingerprint of the files a dataset is parsed from, and a function parsing it."""
+    if filename == ALL_DATA_FILES:
+        filenames = sorted(get_available_data_files())
+        key = ('consolidated',) + tuple(file_fingerprint(os.path.join('data', f)) for f in filenames)
+        return key, lambda: parse_consolidated_data(filenames)
+    return file_fingerprint(os.path.join('data', filename)), lambda: parse_trading_data(filename)
+
+def cached_trading_data(filename):
+    """Return the cached dataset itself for filename, loading it on a miss; callers must not modify it."""
+    key, loader = dataset_source(filename)
+    if filename != ALL_DATA_FILES and INCREMENTAL_INGEST:
+        # Read only what was appended since the cached parse, if there is one
+        loader = lambda: ingest_trading_data(filename, dataset_cache.latest(key[0]))
+
+    def load():
+        dataset = loader()
+        dataset['fingerprint'] = key  # the file contents this dataset was parsed from
+        return dataset
+
+    if SERVE_PRELOADED:
+        # Forked worker: the master re-parses changed files and replaces the workers
+        dataset = dataset_cache.latest(key[0])
+        if dataset is not None:
+            return dataset
+    return dataset_cache.get(key, load)
+
+def group_cumsum(values, starts, sizes):
+    """Cumulative sum of values restarting at every group start (rows sorted by group)."""
+    totals = np.cumsum(values)
+    return totals - np.repeat(totals[starts] - values[starts], sizes)
+
+def match_option_trades(transactions_df):
+    """
+    Match opening and closing option fills into trades with FIFO lot accounting.
+    Returns one row per matched lot (Status 'Closed') with entry/exit amounts, fees,
+    days held and PnL, followed by the unmatched remainder of every opening fill
+    (Status 'Open').
+
+    Fills are sorted by contract and time, and each contract's opened and closed
+    quantities are laid out as consecutive intervals on one number line. Every
+    overlap between an opening and a closing interval is a matched lot, so the
+    whole frame is matched with sorts, cumulative sums and binary searches.
+    When the fills carry an Account column, lots are matched within each account.
+    """
+    columns = ['Symbol', 'Description', 'Contract', 'Type', 'Direction', 'Status', 'Entry_ID', 'Exit_ID',
+               'Entry_Seq', 'Exit_Seq', 'Entry_Date', 'Exit_Date', 'Quantity', 'Entry_Amount', 'Exit_Amount',
+               'Entry_Fee', 'Exit_Fee', 'Fees', 'PnL', 'Is_Win', 'Days_Held']
     if transactions_df.empty:
+        return pd.DataFrame(columns=columns)
+    by_account = 'Account' in transactions_df.columns
+    if by_account:
+        columns = ['Account'] + columns
+
+    dates = transactions_df['Date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format='%Y%m%d')
+    times = transactions_df['Time'] if 'Time' in transactions_df.columns else pd.Series('', index=transactions_df.index)
+
+    # Sort by contract, then date, time and file order. The three keys are packed
+    # into one integer so a single stable argsort does the work.
+    contracts = contract_keys(transactions_df)
+    if by_account:
+        contract_codes, _ = pd.factorize(transactions_df['Account'].astype(str) + '|' + contracts)
+    else:
+        contract_codes, _ = pd.factorize(contracts)
+    time_codes, time_values = pd.factorize(times, sort=True)
+    day_codes, day_values = pd.factorize(dates, sort=True)
+    span = (len(day_values) + 1) * (len(time_values) + 1)
+    if span * (int(contract_codes.max()) + 1) < 2 ** 62:
+        sort_key = (contract_codes.astype(np.int64) * span
+                    + day_codes.astype(np.int64) * (len(time_values) + 1) + time_codes)
+        order = np.argsort(sort_key, kind='stable')
+    else:
+        order = np.lexsort((np.arange(len(transactions_df)), time_codes, day_codes, contract_codes))
+    codes = contract_codes[order]
+    dates = dates.to_numpy()[order]
+
+    # Buys add to a position and sells reduce it; fills without a quantity carry no lots.
+    # Actions take only a few distinct values, so classify those instead of every row.
+    action_codes, actions = pd.factorize(transactions_df['Action'].astype(str))
+    action_codes = action_codes[order]
+    side = np.where(np.array(['BUY' in action for action in actions], dtype=bool)[action_codes], 1.0, -1.0)
+    opening_action = np.array(['OPEN' in action for action in actions], dtype=bool)[action_codes]
+    quantity = np.abs(transactions_df['Quantity'].to_numpy(dtype=float)[order])
+
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(codes)])
+
+    # A contract's direction is the side of its first opening fill (or of its first fill)
+    side_series = pd.Series(side)
+    direction = side_series.where(opening_action).groupby(codes).transform('first')
+    direction = direction.fillna(side_series.groupby(codes).transform('first')).to_numpy()
+    is_open = side == direction
+
+    opened = group_cumsum(np.where(is_open, quantity, 0.0), starts, sizes)
+    closed = group_cumsum(np.where(is_open, 0.0, quantity), starts, sizes)
+    # A close can only consume quantity opened before it: matched closes follow
+    # M = C + min(0, running min of (O - C)), so excess closes match nothing
+    shortfall = pd.Series(opened - closed).groupby(codes).cummin().clip(upper=0).to_numpy()
+    matched = closed + shortfall
+    matched_before = np.r_[0.0, matched[:-1]]
+    matched_before[starts] = 0.0
+
+    # Lay every contract out after the opened quantity of the contracts before it
+    opened_totals = opened[starts + sizes - 1]
+    offsets = np.repeat(np.cumsum(opened_totals) - opened_totals, sizes)
+
+    open_rows = np.flatnonzero(is_open & (quantity > 0))
+    open_ends = offsets[open_rows] + opened[open_rows]
+    open_starts = open_ends - quantity[open_rows]
+    close_rows = np.flatnonzero(~is_open & (matched > matched_before))
+    close_starts = offsets[close_rows] + matched_before[close_rows]
+    close_ends = offsets[close_rows] + matched[close_rows]
+
+    # Each segment between consecutive breakpoints is a lot when a close covers it
+    breakpoints = np.unique(np.concatenate([open_starts, open_ends, close_starts, close_ends]))
+    lot_starts, lot_ends = breakpoints[:-1], breakpoints[1:]
+    close_index = np.searchsorted(close_ends, lot_starts, side='right')
+    covered = close_index < len(close_rows)
+    covered[covered] = close_starts[close_index[covered]] <= lot_starts[covered]
+    lot_starts, lot_ends, close_index = lot_starts[covered], lot_ends[covered], close_index[covered]
+    open_index = np.searchsorted(open_ends, lot_starts, side='right')
+
+    # Position of each fill in its file (Seq when the ledger has numbered the fills)
+    if 'Seq' in transactions_df.columns:
+        sequence = transactions_df['Seq'].to_numpy()
+    else:
+        sequence = np.arange(len(transactions_df))
+    amounts = transactions_df['Amount'].to_numpy(dtype=float)[order]
+    fees = transactions_df['Fee'].to_numpy(dtype=float)[order]
+
+    def entry_columns(entry_rows, lot_quantity):
+        # Entry side of a lot, pro-rated from its opening fill.
+        # Long: paid the entry amount; short: received it.
+        entry_fills = order[entry_rows]
+        lot_direction = direction[entry_rows]
+        share = lot_quantity / quantity[entry_rows]
+        lot = {'Account': transactions_df['Account'].to_numpy()[entry_fills]} if by_account else {}
+        return {
+            **lot,
+            'Symbol': transactions_df['Symbol'].to_numpy()[entry_fills],
+            'Description': transactions_df['Description'].to_numpy()[entry_fills],
+            'Contract': contracts.to_numpy()[entry_fills],
+            'Type': transactions_df['Type'].to_numpy()[entry_fills],
+            'Direction': np.where(lot_direction > 0, 'Long', 'Short'),
+            'Entry_ID': transactions_df['ID'].to_numpy()[entry_fills],
+            'Entry_Seq': sequence[entry_fills],
+            'Entry_Date': dates[entry_rows],
+            'Quantity': lot_quantity,
+            'Entry_Amount': lot_direction * amounts[entry_rows] * share,
+            'Entry_Fee': fees[entry_rows] * share
+        }
+
+    # Closed lots
+    entry_rows = open_rows[open_index]
+    exit_rows = close_rows[close_index]
+    lot_quantity = lot_ends - lot_starts
+    closed_lots = entry_columns(entry_rows, lot_quantity)
+    exit_share = lot_quantity / quantity[exit_rows]
+    exit_amount = -direction[entry_rows] * amounts[exit_rows] * exit_share
+    exit_fee = fees[exit_rows] * exit_share
+    pnl = (direction[entry_rows] * (exit_amount - closed_lots['Entry_Amount'])
+           - closed_lots['Entry_Fee'] - exit_fee)
+    closed_lots.update({
+        'Status': 'Closed',
+        'Exit_ID': transactions_df['ID'].to_numpy()[order[exit_rows]],
+        'Exit_Seq': sequence[order[exit_rows]],
+        'Exit_Date': dates[exit_rows],
+        'Exit_Amount': exit_amount,
+        'Exit_Fee': exit_fee,
+        'Fees': closed_lots['Entry_Fee'] + exit_fee,
+        'PnL': pnl,
+        'Is_Win': pnl > 0,
+        'Days_Held': (dates[exit_rows] - dates[entry_rows]).astype('timedelta64[D]').astype(np.int64)
+    })
+
+    # Whatever part of an opening fill no close has consumed is still open.
+    # Open lots count their days held up to the last transaction in the frame.
+    matched_totals = np.repeat(matched[starts + sizes - 1], sizes)
+    remaining = np.clip(opened - np.maximum(opened - quantity, matched_totals), 0, None)
+    remaining_rows = np.flatnonzero(is_open & (remaining > 0))
+    open_lots = entry_columns(remaining_rows, remaining[remaining_rows])
+    open_lots.update({
+        'Status': 'Open',
+        'Exit_ID': np.full(len(remaining_rows), None, dtype=object),
+        'Exit_Seq': -1,
+        'Exit_Date': np.full(len(remaining_rows), np.datetime64('NaT'), dtype=dates.dtype),
+        'Exit_Amount': np.nan,
+        'Exit_Fee': np.nan,
+        'Fees': open_lots['Entry_Fee'],
+        'PnL': np.nan,
+        'Is_Win': False,
+        'Days_Held': (dates.max() - dates[remaining_rows]).astype('timedelta64[D]').astype(np.int64)
+    })
+
+    # Joined column by column, so each column keeps the dtype of its arrays even
+    # when one side is empty or its exit columns are all missing
+    sizes = [len(lot_quantity), len(remaining_rows)]
+    return pd.DataFrame({column: np.concatenate([np.broadcast_to(lots[column], size) for lots, size in
+                                                 zip([closed_lots, open_lots], sizes)]) for column in columns})
+
+class DateWindowIndex:
+    """
+    Sorted datetime64 keys with prefix sums of per-row values, so the sum of any
+    value over a date window is two binary searches and one subtraction.
+    """
+
+    def __init__(self, dates, **values):
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.prefix = {}
+        for name, value in values.items():
+            self.prefix[name] = np.concatenate([[0.0], np.cumsum(np.asarray(value, dtype=float))])
+        # The arrays are shared by every request, so make them read-only
+        self.dates.flags.writeable = False
+        for prefix in self.prefix.values():
+            prefix.flags.writeable = False
+
+    def bounds(self, start_date=None, end_date=None):
+        """Return the [lo, hi) row range dated within [start_date, end_date]."""
+        lo = np.searchsorted(self.dates, np.datetime64(pd.to_datetime(start_date)), side='left') if start_date else 0
+        hi = np.searchsorted(self.dates, np.datetime64(pd.to_datetime(end_date)), side='right') if end_date else len(self.dates)
+        return int(lo), int(max(lo, hi))
+
+    def sum(self, name, lo, hi):
+        return self.prefix[name][hi] - self.prefix[name][lo]
+
+    def extended(self, dates, start, **values):
+        """
+        Return the index of rows whose first start rows are this index's first start rows:
+        their prefix sums are kept and only the rows from start on are summed again.
+        """
+        index = DateWindowIndex(dates)
+        for name, value in values.items():
+            tail = np.cumsum(np.r_[self.prefix[name][start], np.asarray(value, dtype=float)[start:]])
+            index.prefix[name] = np.concatenate([self.prefix[name][:start], tail])
+            index.prefix[name].flags.writeable = False
+        return index
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(prefix.nbytes for prefix in self.prefix.values())
+
+def date_sorted(df, column='Date'):
+    """Return df sorted by a datetime column, keeping file order within a day."""
+    return df.sort_values(column, kind='stable', ignore_index=True)
+
+def date_window(df, start_date=None, end_date=None, column='Date'):
+    """Return the rows of a date-sorted frame within [start_date, end_date] without copying."""
+    if not start_date and not end_date:
+        return df
+    lo, hi = DateWindowIndex(df[column].to_numpy()).bounds(start_date, end_date)
+    return df.iloc[lo:hi]
+
+def sort_keys(df, columns):
+    """The integer or datetime columns of a frame as one structured array, which sorts like the row tuples."""
+    keys = np.empty(len(df), dtype=[(column, np.int64) for column in columns])
+    for column in columns:
+        values = df[column].to_numpy()
+        keys[column] = values.view(np.int64) if values.dtype.kind == 'M' else values
+    return keys
+
+def merged_codes(values, added):
+    """
+    Return (categories, codes) for two categorical Series laid end to end. The categories of
+    values are sorted, as astype('category') makes them, and any new ones are inserted in
+    order by binary search, so existing codes are shifted rather than looked up.
+    """
+    categories = values.cat.categories
+    codes = values.cat.codes.to_numpy()
+    added_categories = added.cat.categories.to_numpy()
+    missing = np.sort(added_categories[categories.get_indexer(added_categories) < 0])
+    if len(missing):
+        slots = np.searchsorted(categories.to_numpy(), missing)
+        shift = np.searchsorted(slots, np.arange(len(categories)), side='right')
+        codes = np.append(np.arange(len(categories)) + shift, -1)[codes]  # missing values keep the code -1
+        categories = pd.Index(np.insert(categories.to_numpy(), slots, missing))
+    added_codes = np.searchsorted(categories.to_numpy(), added_categories)
+    return categories, np.concatenate([codes, np.append(added_codes, -1)[added.cat.codes.to_numpy()]])
+
+def merge_rows(df, rows, positions, keep=None):
+    """
+    Return the rows of a sorted frame that keep selects (all by default), with rows inserted
+    before the given non-decreasing positions among them. Every column is assembled with one
+    take and nothing is sorted; categorical columns keep their codes.
+    """
+    kept = np.arange(len(df)) if keep is None else np.flatnonzero(keep)
+    if not len(rows):
+        return df if keep is None else df.iloc[kept].reset_index(drop=True)
+    if not len(kept):
+        return compact_columns(rows.reset_index(drop=True))
+    placed = np.asarray(positions, dtype=np.intp) + np.arange(len(rows))
+    take = np.empty(len(kept) + len(rows), dtype=np.intp)
+    is_kept = np.ones(len(take), dtype=bool)
+    is_kept[placed] = False
+    take[is_kept] = kept
+    take[placed] = len(df) + np.arange(len(rows))
+
+    columns = {}
+    for column in df.columns:
+        values, added = df[column], rows[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) and isinstance(added.dtype, pd.CategoricalDtype):
+            categories, codes = merged_codes(values, added)
+            columns[column] = pd.Categorical.from_codes(codes[take], dtype=pd.CategoricalDtype(categories),
+                                                        validate=False)
+        else:
+            columns[column] = np.concatenate([values.to_numpy(), added.to_numpy()])[take]
+    return compact_columns(pd.DataFrame(columns, copy=False))
+
+@dataclass(frozen=True)
+class TradeLedger:
+    """
+    Normalized option trade ledger, built once per dataset and never modified.
+    fills holds the option transactions with typed dates and contract keys, sorted
+    by date; closed_trades and open_trades hold one row per FIFO lot, sorted by
+    exit and entry date. Each frame has a DateWindowIndex of its running totals;
+    entry_index and entry_order give the closed lots in entry date order.
+    """
+    fills: pd.DataFrame
+    closed_trades: pd.DataFrame
+    open_trades: pd.DataFrame
+    fills_index: DateWindowIndex
+    closed_index: DateWindowIndex
+    open_index: DateWindowIndex
+    entry_index: DateWindowIndex
+    entry_order: np.ndarray
+
+    def fills_between(self, start_date=None, end_date=None):
+        lo, hi = self.fills_index.bounds(start_date, end_date)
+        return self.fills.iloc[lo:hi]
+
+    def held_past(self, start_date=None, end_date=None):
+        """
+        Rows of the closed lots opened within the window and closed after its end,
+        which were still open when the window ended.
+        """
+        if not end_date:
+            return self.entry_order[:0]
+        lo, hi = self.entry_index.bounds(start_date, end_date)
+        rows = self.entry_order[lo:hi]
+        return rows[rows >= self.closed_index.bounds(None, end_date)[1]]
+
+    def frames(self):
+        return [self.fills, self.closed_trades, self.open_trades]
+
+    def index_nbytes(self):
+        return (self.fills_index.nbytes + self.closed_index.nbytes + self.open_index.nbytes
+                + self.entry_index.nbytes + self.entry_order.nbytes)
+
+    def view(self):
+        """Return a copy whose frames can be modified without touching this ledger."""
+        return replace(self, fills=self.fills.copy(deep=False),
+                       closed_trades=self.closed_trades.copy(deep=False),
+                       open_trades=self.open_trades.copy(deep=False))
+
+def premium(trades):
+    """Premium of each lot's opening fill: received (positive) for shorts, paid (negative) for longs."""
+    return np.where(trades['Direction'] == 'Long', -1, 1) * trades['Entry_Amount'].to_numpy()
+
+def prepare_fills(option_transactions):
+    """Return option transactions with typed dates and contract keys, as the ledger keeps them."""
+    fills = option_transactions.copy(deep=False)
+    if not pd.api.types.is_datetime64_any_dtype(fills['Date']):
+        fills['Date'] = pd.to_datetime(fills['Date'], format='%Y%m%d')
+    if 'Contract' not in fills.columns:
+        fills['Contract'] = contract_keys(fills)
+    if 'Seq' not in fills.columns:
+        fills['Seq'] = np.arange(len(fills))  # file order, which breaks ties between lots
+    return fills
+
+def lot_keys(df):
+    """Key of the position a fill or lot belongs to: its contract, within its account if any."""
+    if 'Account' in df.columns:
+        return df['Account'].astype(str) + '|' + df['Contract']
+    return df['Contract']
+
+@stage_timer('ledger')
+def build_trade_ledger(option_transactions):
+    """Build the TradeLedger for a frame of option transactions."""
+    fills = date_sorted(prepare_fills(option_transactions))
+    return ledger_from_trades(fills, match_option_trades(fills))
+
+# Sort order of the closed and the open lots; ties on a date are broken by file order,
+# so the order does not depend on how the lots were matched
+CLOSED_LOT_ORDER = ['Exit_Date', 'Exit_Seq', 'Entry_Seq']
+OPEN_LOT_ORDER = ['Entry_Date', 'Entry_Seq']
+
+@dataclass(frozen=True)
+class LedgerChange:
+    """What extend_trade_ledger changed, so that what was derived from the ledger can be updated."""
+    rows: np.ndarray  # positions of the appended fills in the extended ledger's fills
+    keys: np.ndarray  # lot keys of the positions that were matched again
+    exit_dates: np.ndarray  # exit dates of the closed lots removed or added
+
+@stage_timer('ledger')
+def extend_trade_ledger(ledger, new_transactions):
+    """
+    Return (ledger, change): the ledger with new option transactions added, and the
+    LedgerChange. The new fills are merged into the date-sorted fills by position and only
+    the contracts they touch are matched again, their lots replacing the old ones by
+    position too; running totals are summed again only from the first changed row.
+    """
+    new_fills = new_transactions.copy(deep=False)
+    # Appended fills come after every fill already in the ledger
+    new_fills['Seq'] = np.arange(len(new_fills)) + (int(ledger.fills['Seq'].max()) + 1 if len(ledger.fills) else 0)
+    new_fills = date_sorted(prepare_fills(new_fills))
+    positions = np.searchsorted(ledger.fills_index.dates, new_fills['Date'].to_numpy(), side='right')
+    fills = merge_rows(ledger.fills, new_fills, positions)
+
+    keys = lot_keys(new_fills).unique()
+    trades = match_option_trades(fills[lot_keys(fills).isin(keys)])
+    closed = add_returns(compact_columns(trades[trades['Status'] == 'Closed'].sort_values(
+        CLOSED_LOT_ORDER, kind='stable', ignore_index=True)))
+    opened = compact_columns(trades[trades['Status'] == 'Open'].sort_values(
+        OPEN_LOT_ORDER, kind='stable', ignore_index=True))
+    closed_removed = lot_keys(ledger.closed_trades).isin(keys).to_numpy()
+    closed_trades, closed_start = replace_lots(ledger.closed_trades, closed_removed, closed, CLOSED_LOT_ORDER)
+    open_trades, open_start = replace_lots(
+        ledger.open_trades, lot_keys(ledger.open_trades).isin(keys).to_numpy(), opened, OPEN_LOT_ORDER)
+    # Open lots are held up to the last transaction in the ledger
+    open_trades['Days_Held'] = (fills['Date'].iloc[-1] - open_trades['Entry_Date']).dt.days.astype(np.int64)
+
+    change = LedgerChange(
+        rows=positions + np.arange(len(new_fills)),
+        keys=keys,
+        exit_dates=np.concatenate([ledger.closed_trades['Exit_Date'].to_numpy()[closed_removed],
+                                   closed['Exit_Date'].to_numpy()])
+    )
+    starts = (min(positions.tolist()[:1] + [len(fills)]), closed_start, open_start)
+    return indexed_ledger(fills, closed_trades, open_trades, ledger, starts), change
+
+def replace_lots(lots, removed, new_lots, columns):
+    """
+    Return (lots, start): the lots sorted by columns without the removed rows and with the
+    sorted new_lots merged in by position, and the first row at which they changed.
+    """
+    positions = np.searchsorted(sort_keys(lots, columns)[~removed], sort_keys(new_lots, columns))
+    merged = merge_rows(lots, new_lots, positions, keep=~removed)
+    return merged, min(np.flatnonzero(removed).tolist()[:1] + positions.tolist()[:1] + [len(merged)])
+
+def add_returns(closed_trades):
+    """Add the simple daily return of every closed lot held at least one day, for risk metrics."""
+    days_held = closed_trades['Days_Held'].where(closed_trades['Days_Held'] > 0)
+    closed_trades['Return'] = closed_trades['PnL'] / (closed_trades['Entry_Amount'].abs() * days_held)
+    return closed_trades
+
+def ledger_from_trades(fills, trades):
+    """Build the TradeLedger of date-sorted fills and the lots matched from them."""
+    closed_trades = trades[trades['Status'] == 'Closed'].sort_values(CLOSED_LOT_ORDER, kind='stable', ignore_index=True)
+    open_trades = trades[trades['Status'] == 'Open'].sort_values(OPEN_LOT_ORDER, kind='stable', ignore_index=True)
+
+    compact_columns(closed_trades)
+    compact_columns(open_trades)
+
+    # Open lots are held up to the last transaction in the ledger
+    if not fills.empty:
+        open_trades['Days_Held'] = (fills['Date'].max() - open_trades['Entry_Date']).dt.days.astype(np.int64)
+
+    return indexed_ledger(fills, add_returns(closed_trades), open_trades)
+
+def indexed_ledger(fills, closed_trades, open_trades, previous=None, starts=None):
+    """
+    Build the TradeLedger of date-sorted fills and lots, indexing their running totals.
+    Given the previous ledger and the first row of each frame that differs from it
+    (starts), the running totals of the rows before are taken from its indexes.
+    """
+    returns = closed_trades['Return'].fillna(0).to_numpy()
+    totals = [
+        (fills['Date'], {'fees': fills['Fee']}),
+        (closed_trades['Exit_Date'], {
+            'pnl': closed_trades['PnL'],
+            'wins': closed_trades['Is_Win'],
+            'days_held': closed_trades['Days_Held'],
+            'premium': premium(closed_trades),
+            'returns': closed_trades['Return'].notna(),
+            'return_sum': returns,
+            'return_sumsq': returns ** 2
+        }),
+        (open_trades['Entry_Date'], {'premium': premium(open_trades), 'entry_fees': open_trades['Entry_Fee']})
+    ]
+    if previous is None:
+        indexes = [DateWindowIndex(dates, **values) for dates, values in totals]
+    else:
+        indexes = [index.extended(dates, start, **values) for index, start, (dates, values) in
+                   zip([previous.fills_index, previous.closed_index, previous.open_index], starts, totals)]
+    # Closed lots by entry date, for the lots still open at the end of a window
+    entry_dates = closed_trades['Entry_Date'].to_numpy()
+    entry_order = np.argsort(entry_dates, kind='stable')
+    entry_order.flags.writeable = False
+    return TradeLedger(fills, closed_trades, open_trades, *indexes, DateWindowIndex(entry_dates[entry_order]),
+                       entry_order)
+
+# Holding period categories, in days held (trades closed the day they opened fall in none)
+HOLDING_PERIOD_BINS = [0, 7, 14, 30, 90, float('inf')]
+HOLDING_PERIOD_LABELS = ['<1 week', '1-2 weeks', '2-4 weeks', '1-3 months', '>3 months']
+
+@stage_timer('analytics')
+def calculate_trading_analytics(ledger, start_date=None, end_date=None):
+    """
+    Calculate various trading analytics for the trades closed within the date window.
+    Counts, totals, averages, win rate and volatility come from the ledger's prefix
+    sums; only the path-dependent and per-group statistics look at the window's rows.
+    """
+    analytics = {}
+
+    # Return empty analytics if no data after filtering
+    fills_lo, fills_hi = ledger.fills_index.bounds(start_date, end_date)
+    if fills_hi == fills_lo:
         return {
             'total_trades': 0,
             'winning_trades': 0,
@@ -44,97 +847,50 @@ def calculate_trading_analytics(transactions_df, start_date=None, end_date=None)
             'holding_period_stats': {}
         }
 
-    # Group trades by symbol, expiration, strike, and type
-    transactions_df['Trade_Group'] = transactions_df.apply(
-        lambda row: f"{row['Symbol']}_{row['Description'].split()[1]}_{row['Description'].split()[2]}_{row['Description'].split()[-1]}",
-        axis=1
-    )
-
-    # Calculate trade outcomes
-    trade_groups = transactions_df.groupby('Trade_Group')
-    completed_trades = []
-    daily_returns = []  # For calculating risk metrics
-
-    for group_name, group in trade_groups:
-        if len(group) >= 2:  # Only consider trades that have been closed
-            # Sort by date to ensure proper order
-            group = group.sort_values('Date')
-            first_trade = group.iloc[0]
-            last_trade = group.iloc[-1]
-
-            # Calculate profit/loss based on trade direction including fees
-            if first_trade['Action'] == 'BUYTOOPEN':
-                entry_amount = first_trade['Amount']  # This is positive (cost to buy)
-                entry_fee = first_trade['Fee']
-                exit_amount = -last_trade['Amount']   # This is negative (value received from sell)
-                exit_fee = last_trade['Fee']
-                pnl = exit_amount - entry_amount - entry_fee - exit_fee
-            else:  # SELLTOOPEN
-                entry_amount = -first_trade['Amount']  # This is positive (value received from sell)
-                entry_fee = first_trade['Fee']
-                exit_amount = last_trade['Amount']     # This is positive (cost to buy back)
-                exit_fee = last_trade['Fee']
-                pnl = entry_amount - exit_amount - entry_fee - exit_fee
-
-            # Determine if it was a winning trade
-            is_win = pnl > 0
-
-            # Calculate daily return for risk metrics
-            days_held = (last_trade['Date'] - first_trade['Date']).days
-            if days_held > 0:
-                daily_return = pnl / (abs(entry_amount) * days_held)  # Simple daily return
-                daily_returns.append({
-                    'date': last_trade['Date'],
-                    'return': daily_return
-                })
-
-            completed_trades.append({
-                'Symbol': first_trade['Symbol'],
-                'Description': first_trade['Description'],
-                'Entry_Date': first_trade['Date'],
-                'Exit_Date': last_trade['Date'],
-                'Entry_Amount': entry_amount,
-                'Exit_Amount': exit_amount,
-                'PnL': pnl,
-                'Is_Win': is_win,
-                'Type': first_trade['Description'].split()[-1],  # P or C
-                'Days_Held': days_held
-            })
-
-    if completed_trades:
-        trades_df = pd.DataFrame(completed_trades)
-        returns_df = pd.DataFrame(daily_returns)
+    index = ledger.closed_index
+    lo, hi = index.bounds(start_date, end_date)
+    trades_df = ledger.closed_trades.iloc[lo:hi]
 
+    if not trades_df.empty:
         # Calculate overall statistics
-        analytics['total_trades'] = len(trades_df)
-        analytics['winning_trades'] = len(trades_df[trades_df['Is_Win']])
-        analytics['losing_trades'] = len(trades_df[~trades_df['Is_Win']])
+        analytics['total_trades'] = hi - lo
+        analytics['winning_trades'] = int(round(index.sum('wins', lo, hi)))
+        analytics['losing_trades'] = analytics['total_trades'] - analytics['winning_trades']
         analytics['win_rate'] = (analytics['winning_trades'] / analytics['total_trades'] * 100) if analytics['total_trades'] > 0 else 0
 
         # Profit/Loss statistics
-        analytics['total_pnl'] = trades_df['PnL'].sum()
-        analytics['avg_pnl'] = trades_df['PnL'].mean()
-        analytics['max_profit'] = trades_df['PnL'].max()
-        analytics['max_loss'] = trades_df['PnL'].min()
+        pnl = trades_df['PnL'].to_numpy()
+        analytics['total_pnl'] = index.sum('pnl', lo, hi)
+        analytics['avg_pnl'] = analytics['total_pnl'] / analytics['total_trades']
+        analytics['max_profit'] = pnl.max()
+        analytics['max_loss'] = pnl.min()
 
         # Risk Metrics
-        if not returns_df.empty:
-            # Calculate cumulative returns for drawdown
-            returns_df = returns_df.sort_values('date')
-            returns_df['cumulative_return'] = (1 + returns_df['return']).cumprod()
-            returns_df['rolling_max'] = returns_df['cumulative_return'].cummax()
-            returns_df['drawdown'] = (returns_df['cumulative_return'] - returns_df['rolling_max']) / returns_df['rolling_max']
+        return_count = int(round(index.sum('returns', lo, hi)))
+        if return_count > 0:
+            # Mean and sample standard deviation of the daily returns from their running sums
+            avg_daily_return = index.sum('return_sum', lo, hi) / return_count
+            if return_count > 1:
+                variance = (index.sum('return_sumsq', lo, hi) - return_count * avg_daily_return ** 2) / (return_count - 1)
+                daily_volatility = max(variance, 0) ** 0.5
+            else:
+                daily_volatility = np.nan
+
+            # Calculate cumulative returns for drawdown (trades are already in exit date order)
+            returns = trades_df['Return'].to_numpy()
+            returns = returns[~np.isnan(returns)]
+            cumulative_return = np.cumprod(1 + returns)
+            rolling_max = np.maximum.accumulate(cumulative_return)
+            drawdown = (cumulative_return - rolling_max) / rolling_max
 
             # Max and Average Drawdown
-            analytics['max_drawdown'] = abs(returns_df['drawdown'].min()) * analytics['total_pnl']
-            analytics['avg_drawdown'] = abs(returns_df['drawdown'].mean()) * analytics['total_pnl']
+            analytics['max_drawdown'] = abs(drawdown.min()) * analytics['total_pnl']
+            analytics['avg_drawdown'] = abs(drawdown.mean()) * analytics['total_pnl']
 
             # Return Volatility (annualized)
-            analytics['return_volatility'] = returns_df['return'].std() * (252 ** 0.5) * 100  # Annualized volatility as percentage
+            analytics['return_volatility'] = daily_volatility * (252 ** 0.5) * 100  # Annualized volatility as percentage
 
             # Sharpe Ratio (assuming risk-free rate of 0 for simplicity)
-            avg_daily_return = returns_df['return'].mean()
-            daily_volatility = returns_df['return'].std()
             if daily_volatility != 0:
                 sharpe_ratio = (avg_daily_return / daily_volatility) * (252 ** 0.5)  # Annualized Sharpe ratio
                 analytics['sharpe_ratio'] = sharpe_ratio
@@ -148,7 +904,7 @@ def calculate_trading_analytics(transactions_df, start_date=None, end_date=None)
             analytics['sharpe_ratio'] = 0
 
         # Statistics by option type
-        type_stats = trades_df.groupby('Type').agg({
+        type_stats = trades_df.groupby('Type', observed=True).agg({
             'PnL': ['count', 'sum', 'mean'],
             'Is_Win': 'mean'
         }).round(2)
@@ -161,15 +917,15 @@ def calculate_trading_analytics(transactions_df, start_date=None, end_date=None)
         analytics['worst_trades'] = trades_df.nsmallest(3, 'PnL')[['Symbol', 'Description', 'PnL', 'Days_Held']].to_dict('records')
 
         # Average holding period
-        analytics['avg_holding_period'] = trades_df['Days_Held'].mean()
+        analytics['avg_holding_period'] = index.sum('days_held', lo, hi) / analytics['total_trades']
 
         # Success rate by holding period
         trades_df['Holding_Period_Category'] = pd.cut(
             trades_df['Days_Held'],
-            bins=[0, 7, 14, 30, 90, float('inf')],
-            labels=['<1 week', '1-2 weeks', '2-4 weeks', '1-3 months', '>3 months']
+            bins=HOLDING_PERIOD_BINS,
+            labels=HOLDING_PERIOD_LABELS
         )
-        holding_period_stats = trades_df.groupby('Holding_Period_Category').agg({
+        holding_period_stats = trades_df.groupby('Holding_Period_Category', observed=False).agg({
             'PnL': ['count', 'mean', 'sum'],
             'Is_Win': 'mean'
         }).round(2)
@@ -179,73 +935,175 @@ def calculate_trading_analytics(transactions_df, start_date=None, end_date=None)
 
     return analytics
 
-def calculate_option_summary(transactions_df, start_date=None, end_date=None):
-    """Calculate summary statistics for option transactions based on their type."""
-    # Apply date filtering if provided
-    if start_date or end_date:
-        # Ensure Date column is datetime
-        if 'Date' not in transactions_df.columns or not pd.api.types.is_datetime64_any_dtype(transactions_df['Date']):
-            transactions_df['Date'] = pd.to_datetime(transactions_df['Date'], format='%Y%m%d')
+# Period analytics: calculate_trading_analytics for many date windows at once,
+# e.g. every month of the history, in one grouped pass over the closed trades
+ANALYTICS_PERIODS = ['W', 'M', 'Q', 'Y']
+ANALYTICS_MAX_WINDOWS = 5000
+PERIOD_METRICS = ['total_trades', 'winning_trades', 'losing_trades', 'win_rate', 'total_pnl', 'avg_pnl',
+                  'max_profit', 'max_loss', 'max_drawdown', 'avg_drawdown', 'return_volatility', 'sharpe_ratio',
+                  'avg_holding_period']
 
-        if start_date:
-            start_date = pd.to_datetime(start_date)
-            transactions_df = transactions_df[transactions_df['Date'] >= start_date]
+def period_windows(ledger, frequency, start_date=None, end_date=None):
+    """
+    Return the labels and (start, end) dates of the calendar periods covering the date
+    range (by default the dates of all fills), with the first and last cut to the range.
+    """
+    dates = ledger.fills_index.dates
+    if not len(dates):
+        return [], []
+    first = pd.to_datetime(start_date) if start_date else pd.Timestamp(dates[0])
+    last = pd.to_datetime(end_date) if end_date else pd.Timestamp(dates[-1])
+    if last < first:
+        return [], []
+    periods = pd.period_range(first, last, freq=frequency)
+    starts = np.maximum(periods.start_time.to_numpy(), np.datetime64(first))
+    ends = np.minimum(periods.end_time.normalize().to_numpy(), np.datetime64(last))
+    return [str(period) for period in periods], list(zip(starts, ends))
 
-        if end_date:
-            end_date = pd.to_datetime(end_date)
-            transactions_df = transactions_df[transactions_df['Date'] <= end_date]
+def window_rows(lo, hi):
+    """Return the window of every row of the [lo, hi) ranges laid end to end, and the row itself."""
+    lengths = hi - lo
+    window = np.repeat(np.arange(len(lo)), lengths)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return window, np.arange(lengths.sum()) - offsets + np.repeat(lo, lengths)
+
+@stage_timer('analytics')
+def calculate_period_analytics(ledger, labels, windows):
+    """
+    Calculate the trading analytics of many (start, end) windows, labelled by labels, as
+    tidy tables: one row per window with every scalar metric, and one row per window and
+    group for the type, holding period, best and worst trade tables. Each value equals
+    what calculate_trading_analytics returns for the window on its own; windows without
+    closed trades have zero metrics. Counts and sums come from the ledger's prefix sums;
+    the trades of all windows are gathered once and grouped by window for the rest.
+    """
+    index = ledger.closed_index
+    # An open (None) side of a window is NaT and takes in every trade on that side
+    starts = pd.DatetimeIndex([start for start, _ in windows]).to_numpy()
+    ends = pd.DatetimeIndex([end for _, end in windows]).to_numpy()
+    lo = np.where(np.isnat(starts), 0, np.searchsorted(index.dates, starts, side='left'))
+    hi = np.where(np.isnat(ends), len(index.dates), np.searchsorted(index.dates, ends, side='right'))
+    hi = np.maximum(lo, hi)
+    window, rows = window_rows(lo, hi)
+    trades = ledger.closed_trades.iloc[rows][['Symbol', 'Description', 'Type', 'PnL', 'Is_Win', 'Days_Held',
+                                              'Return']].reset_index(drop=True)
+    trades['Window'] = window
+
+    count = hi - lo
+    traded = count > 0
+    per_trade = np.maximum(count, 1)
+    metrics = {'total_trades': count}
+    metrics['winning_trades'] = np.rint(index.sum('wins', lo, hi)).astype(int)
+    metrics['losing_trades'] = count - metrics['winning_trades']
+    metrics['win_rate'] = metrics['winning_trades'] / per_trade * 100
+    metrics['total_pnl'] = index.sum('pnl', lo, hi)
+    metrics['avg_pnl'] = metrics['total_pnl'] / per_trade
+    pnl = trades.groupby('Window')['PnL']
+    metrics['max_profit'] = pnl.max().reindex(range(len(lo)), fill_value=0).to_numpy()
+    metrics['max_loss'] = pnl.min().reindex(range(len(lo)), fill_value=0).to_numpy()
+    metrics['avg_holding_period'] = index.sum('days_held', lo, hi) / per_trade
+
+    # Risk metrics of the windows with daily returns, from their running sums
+    return_count = np.rint(index.sum('returns', lo, hi)).astype(int)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_daily_return = index.sum('return_sum', lo, hi) / np.maximum(return_count, 1)
+        variance = (index.sum('return_sumsq', lo, hi) - return_count * avg_daily_return ** 2) / (return_count - 1)
+        daily_volatility = np.where(return_count > 1, np.sqrt(np.maximum(variance, 0)), np.nan)
+        sharpe_ratio = np.where(daily_volatility != 0, (avg_daily_return / daily_volatility) * (252 ** 0.5), 0)
+    has_returns = return_count > 0
+    metrics['return_volatility'] = np.where(has_returns, daily_volatility * (252 ** 0.5) * 100, 0)
+    metrics['sharpe_ratio'] = np.where(has_returns, sharpe_ratio, 0)
+
+    # Drawdowns of each window's compounded returns, in exit order
+    returns = trades[trades['Return'].notna()]
+    growth = (1 + returns['Return']).groupby(returns['Window']).cumprod()
+    peak = growth.groupby(returns['Window']).cummax()
+    drawdown = ((growth - peak) / peak).groupby(returns['Window'])
+    for name, values in [('max_drawdown', drawdown.min()), ('avg_drawdown', drawdown.mean())]:
+        values = values.reindex(range(len(lo)), fill_value=0).to_numpy()
+        metrics[name] = np.where(has_returns, np.abs(values) * metrics['total_pnl'], 0)
+    for name in metrics:
+        metrics[name] = np.where(traded, metrics[name], 0)
+
+    labels = np.array(labels, dtype=object)
+    periods = pd.DataFrame({'period': labels, 'start': starts, 'end': ends, **metrics})
+    periods[['total_trades', 'winning_trades', 'losing_trades']] = periods[
+        ['total_trades', 'winning_trades', 'losing_trades']].astype(int)
 
+    # Statistics by option type
+    type_stats = trades.groupby(['Window', 'Type'], observed=True).agg({
+        'PnL': ['count', 'sum', 'mean'],
+        'Is_Win': 'mean'
+    }).round(2)
+    type_stats.columns = ['Count', 'Total_PnL', 'Avg_PnL', 'Win_Rate']
+    type_stats['Win_Rate'] = type_stats['Win_Rate'] * 100
+
+    # Success rate by holding period (every category of each window with trades)
+    trades['Holding_Period_Category'] = pd.cut(trades['Days_Held'], bins=HOLDING_PERIOD_BINS,
+                                               labels=HOLDING_PERIOD_LABELS)
+    holding_period_stats = trades.groupby(['Window', 'Holding_Period_Category'], observed=False).agg({
+        'PnL': ['count', 'mean', 'sum'],
+        'Is_Win': 'mean'
+    }).round(2)
+    holding_period_stats.columns = ['Count', 'Avg_PnL', 'Total_PnL', 'Win_Rate']
+    holding_period_stats['Win_Rate'] = holding_period_stats['Win_Rate'] * 100
+
+    tables = {'periods': periods}
+    for name, stats, group in [('type_stats', type_stats, 'Type'),
+                               ('holding_period_stats', holding_period_stats, 'Holding_Period_Category')]:
+        stats = stats.reset_index()
+        stats[group] = stats[group].astype(str)
+        stats.insert(0, 'period', labels[stats.pop('Window').to_numpy()])
+        tables[name] = stats
+
+    # Three best and worst trades of each window; ties keep exit order, as nlargest does
+    position = np.arange(len(trades))
+    for name, sign in [('best_trades', -1), ('worst_trades', 1)]:
+        order = np.lexsort((position, sign * trades['PnL'].to_numpy(), trades['Window'].to_numpy()))
+        rank = pd.Series(trades['Window'].to_numpy()[order]).groupby(trades['Window'].to_numpy()[order]).cumcount()
+        ranked = trades.iloc[order[rank.to_numpy() < 3]]
+        ranked = ranked[['Window', 'Symbol', 'Description', 'PnL', 'Days_Held']].astype({'Symbol': object,
+                                                                                         'Description': object})
+        ranked.insert(0, 'period', labels[ranked.pop('Window').to_numpy()])
+        tables[name] = ranked.reset_index(drop=True)
+    return tables
+
+@stage_timer('analytics')
+def calculate_option_summary(ledger, start_date=None, end_date=None):
+    """
+    Calculate summary statistics for option transactions within the date window:
+    positions closed in the window and positions opened in the window that are still
+    open, or were at the end of the window.
+    """
+    fills_lo, fills_hi = ledger.fills_index.bounds(start_date, end_date)
     summary = {
-        'total_transactions': len(transactions_df),
+        'total_transactions': fills_hi - fills_lo,
         'total_premium': 0,
-        'total_fees': transactions_df['Fee'].sum() if not transactions_df.empty else 0,
+        'open_premium': 0,
+        'total_fees': ledger.fills_index.sum('fees', fills_lo, fills_hi),
         'net_pnl': 0,
         'open_positions': 0,
         'closed_positions': 0
     }
 
     # Return early if no transactions after filtering
-    if transactions_df.empty:
+    if fills_hi == fills_lo:
         return summary
 
-    # Group by trade identifier (symbol + expiration + strike + type)
-    transactions_df['Trade_Group'] = transactions_df.apply(
-        lambda row: f"{row['Symbol']}_{row['Description'].split()[1]}_{row['Description'].split()[2]}_{row['Description'].split()[-1]}",
-        axis=1
-    )
+    closed_lo, closed_hi = ledger.closed_index.bounds(start_date, end_date)
+    open_lo, open_hi = ledger.open_index.bounds(start_date, end_date)
 
-    # Calculate summary by trade group
-    trade_groups = transactions_df.groupby('Trade_Group')
-    for group_name, group in trade_groups:
-        group = group.sort_values('Date')
-        first_trade = group.iloc[0]
-        last_trade = group.iloc[-1]
-
-        # Calculate premium based on trade direction
-        if first_trade['Action'] == 'BUYTOOPEN':
-            entry_premium = first_trade['Amount']  # Positive (cost to buy)
-            entry_fee = first_trade['Fee']  # Fee for entry
-            if len(group) > 1:  # Closed position
-                exit_premium = -last_trade['Amount']  # Negative (value received from sell)
-                exit_fee = last_trade['Fee']  # Fee for exit
-                trade_pnl = exit_premium - entry_premium - entry_fee - exit_fee
-                summary['net_pnl'] += trade_pnl
-                summary['closed_positions'] += 1
-            else:  # Open position
-                summary['net_pnl'] -= (entry_premium + entry_fee)
-                summary['open_positions'] += 1
-        else:  # SELLTOOPEN
-            entry_premium = -first_trade['Amount']  # Positive (value received from sell)
-            entry_fee = first_trade['Fee']  # Fee for entry
-            if len(group) > 1:  # Closed position
-                exit_premium = last_trade['Amount']  # Positive (cost to buy back)
-                exit_fee = last_trade['Fee']  # Fee for exit
-                trade_pnl = entry_premium - exit_premium - entry_fee - exit_fee
-                summary['net_pnl'] += trade_pnl
-                summary['closed_positions'] += 1
-            else:  # Open position
-                summary['net_pnl'] += (entry_premium - entry_fee)
-                summary['open_positions'] += 1
+    held = ledger.closed_trades.iloc[ledger.held_past(start_date, end_date)]
+
+    # Open lots count their premium net of the entry fee towards the PnL
+    open_premium = ledger.open_index.sum('premium', open_lo, open_hi) + premium(held).sum()
+    entry_fees = ledger.open_index.sum('entry_fees', open_lo, open_hi) + held['Entry_Fee'].sum()
+    summary['open_premium'] = open_premium - entry_fees
+    summary['total_premium'] = ledger.closed_index.sum('premium', closed_lo, closed_hi) + open_premium
+
+    summary['net_pnl'] = ledger.closed_index.sum('pnl', closed_lo, closed_hi) + summary['open_premium']
+    summary['closed_positions'] = closed_hi - closed_lo
+    summary['open_positions'] = open_hi - open_lo + len(held)
 
     return summary
 
@@ -259,397 +1117,3131 @@ def calculate_option_positions_summary(positions_df):
         'total_fees': 0  # Fees for open positions
     }
 
-    for _, position in positions_df.iterrows():
-        quantity = position['Quantity']
-        amount = position['Amount']
-        fee = position['Fee'] if 'Fee' in position else 0
-
+    if len(positions_df):
         # For long positions (positive quantity), amount is negative (cost)
         # For short positions (negative quantity), amount is negative (credit)
-        if quantity > 0:  # Long position
-            summary['total_value'] -= amount  # Subtract cost (amount is negative)
-            summary['long_positions'] += 1
-        else:  # Short position
-            summary['total_value'] -= amount  # Subtract credit (amount is negative, so this adds the credit)
-            summary['short_positions'] += 1
-
-        summary['total_fees'] += fee
+        # Either way the amount is subtracted from the value
+        long_positions = int((positions_df['Quantity'] > 0).sum())
+        summary['total_value'] -= positions_df['Amount'].sum()
+        summary['long_positions'] = long_positions
+        summary['short_positions'] = len(positions_df) - long_positions
+        if 'Fee' in positions_df.columns:
+            summary['total_fees'] = positions_df['Fee'].sum()
 
     return summary
 
-def calculate_expiration_alerts(positions_df):
-    """Calculate alerts for upcoming option expirations."""
-    if positions_df is None or positions_df.empty:
-        return []
+# Alert levels by days to expiration; later expirations are 'info'
+ALERT_LEVELS = [(3, 'danger'), (7, 'warning')]
+
+class ExpiryCalendar:
+    """
+    Option positions sorted by expiration date. On any day the expired positions
+    are a prefix of the calendar and each alert level is a contiguous run after
+    it, so the alerts of a day are found with a few binary searches.
+    """
 
-    alerts = []
-    today = datetime.now()
+    def __init__(self, positions_df):
+        if positions_df is None or positions_df.empty:
+            positions_df = pd.DataFrame(columns=['Type', 'Symbol', 'Description', 'Quantity', 'Strike', 'Premium'])
+        options = positions_df[positions_df['Type'].isin(['P', 'C'])]
 
-    # Filter for option positions only
-    option_positions = positions_df[positions_df['Type'].isin(['P', 'C'])]
+        # The expiry is the second word of the description, e.g. "04APR25"; each distinct one is parsed once
+        expiry_codes, expiry_values = pd.factorize(options['Description'].astype(str).str.split().str[1])
+        parsed = pd.to_datetime(pd.Series(expiry_values, dtype=object), format='%d%b%y', errors='coerce')
+        expiries = np.append(parsed.to_numpy(dtype='datetime64[D]'), np.datetime64('NaT'))[expiry_codes]
+        valid = ~np.isnat(expiries)
+        order = np.argsort(expiries[valid], kind='stable')
+        options = options[valid].iloc[order]
+        self.expiries = expiries[valid][order]
+        self.expiries.flags.writeable = False
 
-    for _, position in option_positions.iterrows():
-        try:
-            # Extract expiration date from description
-            desc_parts = position['Description'].split()
-            if len(desc_parts) >= 2:
-                exp_date_str = desc_parts[1]  # e.g., "04APR25"
-                exp_date = datetime.strptime(exp_date_str, '%d%b%y')
-
-                # Calculate days until expiration
-                days_to_exp = (exp_date - today).days
-
-                # Only include positions that haven't expired
-                if days_to_exp >= 0:
-                    # Calculate alert level
-                    if days_to_exp <= 3:
-                        alert_level = 'danger'
-                    elif days_to_exp <= 7:
-                        alert_level = 'warning'
-                    else:
-                        alert_level = 'info'
-
-                    alerts.append({
-                        'symbol': position['Symbol'],
-                        'description': position['Description'],
-                        'expiration_date': exp_date.strftime('%Y-%m-%d'),
-                        'days_to_expiration': days_to_exp,
-                        'quantity': position['Quantity'],
-                        'strike': position['Strike'],
-                        'type': position['Type'],
-                        'premium': position['Premium'],
-                        'alert_level': alert_level
-                    })
-        except (ValueError, IndexError):
-            continue
+        ids = options['Description'].astype(str)
+        if 'Account' in options.columns:
+            ids = options['Account'].astype(str) + '|' + ids
+        # A contract can be held in several rows (e.g. long and short lots); later rows are numbered
+        occurrence = ids.groupby(ids.to_numpy()).cumcount()
+        ids = ids.where(occurrence == 0, ids + '#' + (occurrence + 1).astype(str))
+        self.records = [{
+            'id': id,
+            'symbol': symbol,
+            'description': description,
+            'expiration_date': str(expiry),
+            'quantity': quantity,
+            'strike': strike,
+            'type': option_type,
+            'premium': premium
+        } for id, symbol, description, expiry, quantity, strike, option_type, premium in zip(
+            ids, options['Symbol'].astype(object), options['Description'].astype(object), self.expiries,
+            options['Quantity'].tolist(), options['Strike'].tolist(), options['Type'].astype(object),
+            options['Premium'].tolist())]
+
+    def bounds(self, today):
+        """Return the calendar offsets where the alerts of today start and where each alert level ends."""
+        today = np.datetime64(today, 'D')
+        # Days are counted from now, so an expiration today has already passed
+        # and one tomorrow is 0 days away
+        return [int(np.searchsorted(self.expiries, today + np.timedelta64(days + 1, 'D'), side='right'))
+                for days in [-1] + [limit for limit, _ in ALERT_LEVELS]]
 
-    # Sort alerts by days to expiration
-    alerts.sort(key=lambda x: x['days_to_expiration'])
-    return alerts
+    def counts(self, today):
+        """Return the number of alerts at each level on a day."""
+        bounds = self.bounds(today) + [len(self.expiries)]
+        levels = [level for _, level in ALERT_LEVELS] + ['info']
+        return {level: bounds[i + 1] - bounds[i] for i, level in enumerate(levels)}
 
-def apply_date_filter(trading_data, start_date=None, end_date=None):
-    """Apply date filtering to the trading data and recalculate analytics."""
+    def alerts(self, today):
+        """Return the alerts of a day (positions not yet expired), nearest expiration first."""
+        bounds = self.bounds(today)
+        start = bounds[0]
+        days = ((self.expiries[start:] - np.datetime64(today, 'D')).astype(np.int64) - 1).tolist()
+        levels = np.searchsorted(np.array(bounds[1:]), np.arange(start, len(self.expiries)), side='right')
+        names = [level for _, level in ALERT_LEVELS] + ['info']
+        return [{**record, 'days_to_expiration': days_left, 'alert_level': names[level]}
+                for record, days_left, level in zip(self.records[start:], days, levels.tolist())]
+
+def calculate_expiration_alerts(positions_df, today=None):
+    """Calculate alerts for upcoming option expirations."""
+    return ExpiryCalendar(positions_df).alerts(today or datetime.now().date())
+
+def apply_date_filter(trading_data, start_date=None, end_date=None, executor=None):
+    """
+    Apply date filtering to the trading data and recalculate analytics.
+    The frames are date-sorted, so each window is a binary search and a slice
+    of the cached rows; nothing is copied or re-matched. With an executor the
+    analytics are left as futures (see window_view).
+    """
     if not start_date and not end_date:
         return trading_data
 
-    # Filter option transactions if they exist
-    if 'option_transactions' in trading_data:
-        original_transactions = trading_data['option_transactions'].copy()
+    # Reduce the option ledger over the window
+    if 'trade_ledger' in trading_data:
+        trading_data['option_transactions'] = trading_data['trade_ledger'].fills_between(start_date, end_date)
 
-        # Ensure Date column is datetime
-        if 'Date' in original_transactions.columns:
-            original_transactions['Date'] = pd.to_datetime(original_transactions['Date'], format='%Y%m%d')
+        # Recalculate analytics with filtered data (or take the pre-warmed ones)
+        trading_data.update(window_view(trading_data, start_date, end_date, executor=executor))
 
-            # Apply date filtering
-            if start_date:
-                start_date_dt = pd.to_datetime(start_date)
-                original_transactions = original_transactions[original_transactions['Date'] >= start_date_dt]
+    # Filter stock transactions if they exist
+    if 'stock_transactions' in trading_data and 'Date' in trading_data['stock_transactions'].columns:
+        trading_data['stock_transactions'] = date_window(trading_data['stock_transactions'], start_date, end_date)
 
-            if end_date:
-                end_date_dt = pd.to_datetime(end_date)
-                original_transactions = original_transactions[original_transactions['Date'] <= end_date_dt]
+    return trading_data
 
-            # Update the filtered data
-            trading_data['option_transactions'] = original_transactions
+# Columns of the transaction and position tables, in display order
+TABLE_COLUMNS = {
+    'stock_positions': ['Symbol', 'Description', 'Quantity', 'Price', 'Amount'],
+    'option_positions': ['Symbol', 'Description', 'Expiration', 'Strike', 'Type', 'Quantity', 'Premium', 'Amount'],
+    'stock_transactions': ['Date', 'Symbol', 'Action', 'Quantity', 'Price', 'Amount'],
+    'option_transactions': ['Date', 'Symbol', 'Description', 'Expiration', 'Strike', 'Type', 'Action',
+                            'Quantity', 'Price', 'Amount']
+}
 
-            # Recalculate analytics with filtered data
-            trading_data['trading_analytics'] = calculate_trading_analytics(original_transactions, start_date, end_date)
-            trading_data['option_summary'] = calculate_option_summary(original_transactions, start_date, end_date)
+class TableIndex:
+    """
+    Server-side paging, sorting and searching over one displayed table of a cached dataset.
+    Sort orders and search text are computed the first time they are needed and then
+    shared by every request for the dataset; transaction tables are date-sorted, so a
+    date range is a contiguous block of rows.
+    """
 
-    # Filter stock transactions if they exist
-    if 'stock_transactions' in trading_data:
-        original_stock_transactions = trading_data['stock_transactions'].copy()
+    def __init__(self, frame, columns):
+        self.frame = frame
+        self.columns = [column for column in columns if column in frame.columns]
+        self.dates = DateWindowIndex(frame['Date']) if 'Date' in self.columns else None
+        self._orders = {}
+        self._search_text = None
+        self._lock = threading.Lock()
 
-        # Ensure Date column is datetime
-        if 'Date' in original_stock_transactions.columns:
-            original_stock_transactions['Date'] = pd.to_datetime(original_stock_transactions['Date'], format='%Y%m%d')
+    def order(self, column):
+        """Row positions sorted ascending by column (missing values first, ties in row order)."""
+        with self._lock:
+            if column not in self._orders:
+                codes, _ = pd.factorize(self.frame[column], sort=True)
+                order = np.argsort(codes, kind='stable')
+                order.flags.writeable = False
+                self._orders[column] = order
+            return self._orders[column]
 
-            # Apply date filtering
-            if start_date:
-                start_date_dt = pd.to_datetime(start_date)
-                original_stock_transactions = original_stock_transactions[original_stock_transactions['Date'] >= start_date_dt]
+    def search_text(self):
+        """Lower-cased text of each row's displayed values, for substring search."""
+        with self._lock:
+            if self._search_text is None:
+                self._search_text = table_search_text(self.frame, self.columns)
+            return self._search_text
 
-            if end_date:
-                end_date_dt = pd.to_datetime(end_date)
-                original_stock_transactions = original_stock_transactions[original_stock_transactions['Date'] <= end_date_dt]
+    def extended(self, frame, rows):
+        """
+        Return the index of frame, this index's frame with rows inserted at the positions
+        rows. Search text already computed is kept for the old rows; sort orders are
+        computed again when they are needed.
+        """
+        index = TableIndex(frame, self.columns)
+        with self._lock:
+            text = self._search_text
+        if text is not None:
+            values = np.empty(len(frame), dtype=object)
+            inserted = np.zeros(len(frame), dtype=bool)
+            inserted[rows] = True
+            values[~inserted] = text.to_numpy()
+            values[rows] = table_search_text(frame.iloc[rows], self.columns).to_numpy()
+            index._search_text = pd.Series(values, index=frame.index)
+        return index
 
-            # Update the filtered data
-            trading_data['stock_transactions'] = original_stock_transactions
+    def query(self, start=0, length=10, sort_column=None, ascending=True, search=None,
+              start_date=None, end_date=None):
+        """
+        Return (records_total, records_filtered, page) for one request: the rows within the
+        date range, those of them matching search, and the requested page of those sorted.
+        """
+        lo, hi = self.dates.bounds(start_date, end_date) if self.dates else (0, len(self.frame))
+        keep = None
+        if search:
+            keep = self.search_text().iloc[lo:hi].str.contains(search.lower(), regex=False).to_numpy()
+            records_filtered = int(keep.sum())
+        else:
+            records_filtered = hi - lo
 
-    return trading_data
+        if sort_column in self.columns:
+            rows = self.order(sort_column)
+            if not ascending:
+                rows = rows[::-1]
+            if lo > 0 or hi < len(self.frame):
+                rows = rows[(rows >= lo) & (rows < hi)]
+            if keep is not None:
+                rows = rows[keep[rows - lo]]
+        else:
+            rows = np.arange(lo, hi)
+            if keep is not None:
+                rows = rows[keep]
+
+        # length of -1 asks for every row
+        stop = None if length < 0 else start + length
+        page = self.frame.iloc[rows[start:stop]][self.columns]
+        return hi - lo, records_filtered, page
+
+def table_search_text(frame, columns):
+    """Lower-cased text of the displayed values of each row of a frame, tab separated."""
+    text = pd.Series('', index=frame.index)
+    for column in columns:
+        values = frame[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime('%Y-%m-%d')
+        text = text + '\t' + values.astype(str).str.lower()
+    return text
+
+def table_records(page):
+    """Convert a page of table rows into JSON-ready records (dates as YYYY-MM-DD, NaN as null)."""
+    page = page.copy()
+    for column in page.columns:
+        if pd.api.types.is_datetime64_any_dtype(page[column]):
+            page[column] = page[column].dt.strftime('%Y-%m-%d')
+    page = page.astype(object)
+    return page.where(page.notna(), None).to_dict('records')
+
+def window_view_tasks(trading_data, start_date=None, end_date=None):
+    """Return the calculations of the parts of the dashboard that depend on the date range, by key."""
+    tasks = {}
+    if 'trade_ledger' in trading_data:
+        ledger = trading_data['trade_ledger']
+        tasks['trading_analytics'] = lambda: calculate_trading_analytics(ledger, start_date, end_date)
+        tasks['option_summary'] = lambda: calculate_option_summary(ledger, start_date, end_date)
+        tasks['option_complex_trades'] = lambda: aggregate_complex_option_trades(trading_data, start_date, end_date)
+        if 'account_breakdown' in trading_data:
+            tasks['account_breakdown'] = lambda: calculate_account_breakdown(trading_data, start_date, end_date)
+    return tasks
+
+def calculate_window_view(trading_data, start_date=None, end_date=None):
+    """Calculate the parts of the dashboard that depend on the date range."""
+    return {key: task() for key, task in window_view_tasks(trading_data, start_date, end_date).items()}
+
+def window_view(trading_data, start_date=None, end_date=None, keys=None, executor=None):
+    """
+    Return the date range's pre-warmed view of the dataset, calculating it (or only
+    the given keys of it) if there is none. With an executor the calculations are
+    submitted to it and the view holds their futures.
+    """
+    view = trading_data.get('window_views', {}).get((start_date or None, end_date or None))
+    if view is not None:
+        return view
+    tasks = window_view_tasks(trading_data, start_date, end_date)
+    if keys is not None:
+        tasks = {key: task for key, task in tasks.items() if key in keys}
+    if executor is not None:
+        return {key: executor.submit(task) for key, task in tasks.items()}
+    return {key: task() for key, task in tasks.items()}
 
 def get_available_data_files():
     """Get list of available .tlg files in the data directory."""
     return [os.path.basename(f) for f in glob.glob('data/*.tlg')]
 
-def parse_trading_data(filename):
-    """Parse trading data from the specified file."""
-    # Read the trading data file
-    with open(os.path.join('data', filename), 'r') as file:
-        lines = file.readlines()
+def resolve_data_file(requested_file, available_files):
+    """Return the requested data file, or ALL_DATA_FILES when several files exist; default to the first file."""
+    if requested_file in available_files:
+        return requested_file
+    if requested_file == ALL_DATA_FILES and len(available_files) > 1:
+        return ALL_DATA_FILES
+    return available_files[0]  # Default to first file if none selected or invalid
 
-    # Helper function to extract expiration date from option symbol
-    def extract_expiration_date(description):
-        try:
-            # Split the description and look for the date part (e.g., "04APR25")
-            parts = description.split()
-            for part in parts:
-                if len(part) == 7 and part[0:2].isdigit() and part[2:5].isalpha() and part[5:].isdigit():
-                    # Convert to datetime and format
-                    from datetime import datetime
-                    date = datetime.strptime(part, '%d%b%y')
-                    return date.strftime('%Y-%m-%d')
-        except:
-            return None
+# Section markers of a .tlg file, in the order they appear
+TLG_SECTIONS = ['ACCOUNT_INFORMATION', 'STOCK_TRANSACTIONS', 'OPTION_TRANSACTIONS',
+                'STOCK_POSITIONS', 'OPTION_POSITIONS', 'EOF']
+
+# Column schema of each tabular section
+TLG_HEADERS = {
+    'STOCK_TRANSACTIONS': ['Type', 'ID', 'Symbol', 'Description', 'Exchange', 'Action', 'Status',
+                           'Date', 'Time', 'Currency', 'Quantity', 'Multiplier', 'Price', 'Amount', 'Fee'],
+    'OPTION_TRANSACTIONS': ['Type', 'ID', 'Symbol', 'Description', 'Exchange', 'Action', 'Status',
+                            'Date', 'Time', 'Currency', 'Quantity', 'Multiplier', 'Price', 'Amount', 'Fee'],
+    'STOCK_POSITIONS': ['Type', 'Account', 'Symbol', 'Description', 'Currency', 'Empty', 'Time', 'Quantity',
+                        'Multiplier', 'Price', 'Amount'],
+    'OPTION_POSITIONS': ['Type', 'Account', 'Symbol', 'Description', 'Currency', 'Empty', 'Time', 'Quantity', 'Shares',
+                         'Premium', 'Amount']
+}
+
+# A marker is a line holding only the section name
+SECTION_MARKER_PATTERN = re.compile(
+    rb'^[ \t]*(' + b'|'.join(name.encode() for name in TLG_SECTIONS) + rb')[ \t]*\r?$',
+    re.MULTILINE
+)
+
+PARSE_CHUNK_SIZE = 1024 * 1024
+
+def scan_tlg_sections(path, chunk_size=PARSE_CHUNK_SIZE, start=0, end=None, current_section=None):
+    """
+    Find the byte range of each section in a .tlg file with one chunked pass over the file.
+    start, end and current_section scan only part of the file, starting inside a section.
+    """
+    ranges = {}
+    section_start = start
+    offset = start  # file offset of the start of buffer
+    buffer = b''
+
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while True:
+            chunk = file.read(chunk_size if end is None else min(chunk_size, end - offset - len(buffer)))
+            buffer += chunk
+            # Only scan complete lines, the partial last line is kept for the next chunk
+            scan_end = len(buffer) if not chunk else buffer.rfind(b'\n') + 1
+
+            for match in SECTION_MARKER_PATTERN.finditer(buffer, 0, scan_end):
+                if current_section:
+                    ranges[current_section] = (section_start, offset + match.start())
+                current_section = match.group(1).decode()
+                section_start = offset + match.end()
+
+            offset += scan_end
+            buffer = buffer[scan_end:]
+            if not chunk:
+                break
+
+    if current_section:
+        ranges[current_section] = (section_start, offset)
+    return ranges
+
+class FileRange(io.RawIOBase):
+    """Read-only stream over a byte range of an open binary file."""
+
+    def __init__(self, file, start, end):
+        self._file = file
+        self._position = start
+        self._end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._end - self._position)
+        if size <= 0:
+            return 0
+        self._file.seek(self._position)
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._position += read
+        return read
+
+def read_tlg_section(file, section, start, end):
+    """Read one pipe-delimited section straight into a DataFrame of strings."""
+    headers = TLG_HEADERS[section]
+    options = dict(sep='|', header=None, names=headers, dtype=str, na_filter=False,
+                   quoting=csv.QUOTE_NONE, engine='c')
+    try:
+        # Extra fields beyond the schema are dropped and missing ones left empty
+        df = pd.read_csv(io.BufferedReader(FileRange(file, start, end), PARSE_CHUNK_SIZE),
+                         usecols=range(len(headers)), **options)
+    except pd.errors.ParserError:
+        # Every row is shorter than the schema, which usecols does not accept
+        df = pd.read_csv(io.BufferedReader(FileRange(file, start, end), PARSE_CHUNK_SIZE),
+                         index_col=False, **options)
+    except pd.errors.EmptyDataError:
         return None
 
-    # Helper function to extract strike price from option symbol
-    def extract_strike_price(description):
-        try:
-            # Split the description and look for the strike price (e.g., "175" in "GOOG 04APR25 175 P")
-            parts = description.split()
-            for i, part in enumerate(parts):
-                if i > 0 and part.replace('.', '').isdigit():  # Check if it's a number (including decimals)
-                    return float(part)
-        except:
-            return None
+    if df.empty:
         return None
+    # Lines are stripped, so leading whitespace never belongs to the first field
+    df[headers[0]] = df[headers[0]].str.lstrip()
+    return df
 
-    # Helper function to extract option type (P or C)
-    def extract_option_type(description):
-        try:
-            return description.split()[-1]  # Last part is P or C
-        except:
-            return None
+def read_account_information(file, start, end):
+    """Return the fields of the first line in the ACCOUNT_INFORMATION section."""
+    stream = io.BufferedReader(FileRange(file, start, end))
+    for line in io.TextIOWrapper(stream, encoding='utf-8'):
+        line = line.strip()
+        if line:
+            return line.split('|')
+    return None
 
-    # Parse different sections
-    sections = {}
-    current_section = None
-    current_data = []
+# Option descriptions look like "GOOG 04APR25 175 P" (SYMBOL DDMMMYY STRIKE TYPE)
+OPTION_DESCRIPTION_PATTERN = (r'^\s*\S+\s+(?P<Expiry>\d{2}[A-Za-z]{3}\d{2})\s+'
+                              r'(?P<Strike>\d+(?:\.\d+)?)\s+(?P<Type>[PC])\s*$')
 
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
+def decode_option_descriptions(symbols, descriptions):
+    """
+    Decode option descriptions into Expiration, Strike, Type, Contract and Decode_Error columns.
+    Each distinct description is matched once and each distinct expiry parsed once; rows that
+    do not follow the SYMBOL DDMMMYY STRIKE TYPE format are flagged with Decode_Error.
+    """
+    columns = ['Expiration', 'Strike', 'Type', 'Contract', 'Decode_Error']
+    if len(descriptions) == 0:
+        return pd.DataFrame(columns=columns, index=descriptions.index)
 
-        if line in ['ACCOUNT_INFORMATION', 'STOCK_TRANSACTIONS', 'OPTION_TRANSACTIONS',
-                   'STOCK_POSITIONS', 'OPTION_POSITIONS', 'EOF']:
-            if current_section:
-                sections[current_section] = current_data
-            current_section = line
-            current_data = []
-        else:
-            current_data.append(line)
+    description_codes, description_values = pd.factorize(descriptions, use_na_sentinel=False)
+    unique_descriptions = pd.Series(description_values, dtype=object).fillna('')
+    parts = unique_descriptions.str.extract(OPTION_DESCRIPTION_PATTERN)
+
+    # Parse every distinct expiry string only once
+    expiry_codes, expiry_values = pd.factorize(parts['Expiry'])
+    expiry_dates = pd.to_datetime(pd.Series(expiry_values, dtype=object), format='%d%b%y', errors='coerce')
+    expirations = np.append(expiry_dates.dt.strftime('%Y-%m-%d').to_numpy(dtype=object), np.nan)
+    expiration = pd.Series(expirations[expiry_codes], dtype=object)  # code -1 picks the trailing NaN
+
+    decode_error = parts['Expiry'].isna().to_numpy() | expiration.isna().to_numpy()
+    expiration = expiration.where(~decode_error, None)
+    strike = pd.to_numeric(parts['Strike']).astype(float).where(~decode_error)
+    # Unrecognised descriptions keep their last word as the type, as before
+    option_type = parts['Type'].where(~decode_error, unique_descriptions.str.split().str[-1])
+    option_type = option_type.astype(object).where(option_type.notna(), None)
+    suffix = (parts['Expiry'] + '_' + parts['Strike'] + '_' + parts['Type']).where(
+        ~decode_error, unique_descriptions.str.split().str.join('_'))
 
-    # Convert sections to DataFrames
+    # The contract key also depends on the symbol, so build it once per (symbol, description) pair
+    symbol_codes, symbol_values = pd.factorize(symbols, use_na_sentinel=False)
+    pair_codes, pairs = pd.factorize(symbol_codes.astype(np.int64) * len(description_values) + description_codes)
+    pair_symbols = pd.Series(symbol_values.take(pairs // len(description_values)), dtype=object).astype(str)
+    pair_contracts = (pair_symbols + '_' + suffix.take(pairs % len(description_values)).reset_index(drop=True)).to_numpy()
+
+    return pd.DataFrame({
+        'Expiration': expiration.to_numpy()[description_codes],
+        'Strike': strike.to_numpy()[description_codes],
+        'Type': option_type.to_numpy()[description_codes],
+        'Contract': pair_contracts[pair_codes],
+        'Decode_Error': decode_error[description_codes]
+    }, index=descriptions.index)
+
+def contract_keys(option_transactions):
+    """Return the contract key (symbol, expiry, strike, type) of each option transaction."""
+    if 'Contract' in option_transactions.columns:
+        return option_transactions['Contract']
+    return decode_option_descriptions(option_transactions['Symbol'], option_transactions['Description'])['Contract']
+
+@stage_timer('read')
+def read_trading_sections(path, sections=None):
+    """Parse the account information and tabular sections of a .tlg file into DataFrames."""
+    # Locate the sections, then stream each one into the C parser
+    if sections is None:
+        sections = scan_tlg_sections(path)
     dfs = {}
 
-    # Parse account information
-    if 'ACCOUNT_INFORMATION' in sections and sections['ACCOUNT_INFORMATION']:
-        account_info = sections['ACCOUNT_INFORMATION'][0].split('|')
-        if len(account_info) >= 5:  # Make sure we have enough fields
-            dfs['account_info'] = pd.DataFrame([{
-                'Account ID': account_info[1],
-                'Name': account_info[2],
-                'Type': account_info[3],
-                'Address': ' '.join(account_info[4:])  # Join remaining fields as address
-            }])
-
-    # Parse transactions and positions
-    for section in ['STOCK_TRANSACTIONS', 'OPTION_TRANSACTIONS', 'STOCK_POSITIONS', 'OPTION_POSITIONS']:
-        if section in sections and sections[section]:
-            # Get headers based on section type
-            if section == 'STOCK_TRANSACTIONS':
-                headers = ['Type', 'ID', 'Symbol', 'Description', 'Exchange', 'Action', 'Status',
-                          'Date', 'Time', 'Currency', 'Quantity', 'Multiplier', 'Price', 'Amount', 'Fee']
-            elif section == 'OPTION_TRANSACTIONS':
-                headers = ['Type', 'ID', 'Symbol', 'Description', 'Exchange', 'Action', 'Status',
-                          'Date', 'Time', 'Currency', 'Quantity', 'Multiplier', 'Price', 'Amount', 'Fee']
-            elif section == 'STOCK_POSITIONS':
-                headers = ['Type', 'Account', 'Symbol', 'Description', 'Currency', 'Empty', 'Time', 'Quantity',
-                          'Multiplier', 'Price', 'Amount']
-            else:  # OPTION_POSITIONS
-                headers = ['Type', 'Account', 'Symbol', 'Description', 'Currency', 'Empty', 'Time', 'Quantity', 'Shares',
-                           'Premium', 'Amount']
-
-            # Convert to DataFrame
-            data = [line.split('|') for line in sections[section]]
-            # Ensure all rows have the same number of columns as headers
-            data = [row[:len(headers)] if len(row) > len(headers) else row + [''] * (len(headers) - len(row)) for row in data]
-            df = pd.DataFrame(data, columns=headers)
-
-            # Convert numeric columns to float
-            numeric_columns = ['Quantity', 'Multiplier',
-                               'Price', 'Amount', 'Shares', 'Premium', 'Fee']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-            # Add expiration date and strike price for options
-            if section in ['OPTION_TRANSACTIONS', 'OPTION_POSITIONS']:
-                df['Expiration'] = df['Description'].apply(extract_expiration_date)
-                df['Strike'] = df['Description'].apply(extract_strike_price)
-                df['Type'] = df['Description'].apply(extract_option_type)
-
-                # For positions, calculate the total premium (price * multiplier)
-                # if section == 'OPTION_POSITIONS':
-                #     df['Price'] = df['Price'] * df['Multiplier']  # Multiply by 100 to get total premium
-
-            dfs[section.lower()] = df
-
-        # After creating all DataFrames, calculate analytics and summaries
-    if 'option_transactions' in dfs:
-        dfs['trading_analytics'] = calculate_trading_analytics(dfs['option_transactions'])
-        dfs['option_summary'] = calculate_option_summary(dfs['option_transactions'])
+    with open(path, 'rb', buffering=0) as file:
+        # Parse account information
+        if 'ACCOUNT_INFORMATION' in sections:
+            account_info = read_account_information(file, *sections['ACCOUNT_INFORMATION'])
+            if account_info and len(account_info) >= 5:  # Make sure we have enough fields
+                dfs['account_info'] = pd.DataFrame([{
+                    'Account ID': account_info[1],
+                    'Name': account_info[2],
+                    'Type': account_info[3],
+                    'Address': ' '.join(account_info[4:])  # Join remaining fields as address
+                }])
 
-    if 'option_positions' in dfs:
-        dfs['option_positions_summary'] = calculate_option_positions_summary(dfs['option_positions'])
-        # Add expiration alerts
-        dfs['expiration_alerts'] = calculate_expiration_alerts(dfs['option_positions'])
+        # Parse transactions and positions
+        for section in ['STOCK_TRANSACTIONS', 'OPTION_TRANSACTIONS', 'STOCK_POSITIONS', 'OPTION_POSITIONS']:
+            if section not in sections:
+                continue
+            df = read_tlg_section(file, section, *sections[section])
+            if df is None:
+                continue
+            dfs[section.lower()] = prepare_section(section, df)
 
     return dfs
 
-def aggregate_complex_option_trades(option_transactions):
-    """
-    Aggregate option transactions into complex (multi-leg) trades.
-    Returns a list of complex trades, each with legs and summary metrics.
-    """
-    if option_transactions is None or option_transactions.empty:
-        return []
+def prepare_section(section, df):
+    """Type the columns of a freshly read section frame."""
+    # Convert numeric columns to float
+    numeric_columns = ['Quantity', 'Multiplier',
+                       'Price', 'Amount', 'Shares', 'Premium', 'Fee']
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
-    # Ensure Date is datetime
-    option_transactions = option_transactions.copy()
-    option_transactions['Date'] = pd.to_datetime(option_transactions['Date'], format='%Y%m%d', errors='coerce')
-
-    # Group by Symbol and Expiration to find related trades
-    grouped = option_transactions.groupby(['Symbol', 'Expiration'])
-
-    complex_trades = []
-
-    for (symbol, expiration), group in grouped:
-        if len(group) < 2:
-            continue  # Need at least 2 legs for a complex trade
-        # Sort by date
-        group = group.sort_values('Date')
-        # Classify type (very basic)
-        types = set(group['Type'])
-        strikes = set(group['Strike'])
-        trade_type = 'Custom'
-        if len(group) == 2:
-            if len(types) == 1 and len(strikes) == 2:
-                trade_type = 'Vertical Spread'
-            elif len(types) == 2 and len(strikes) == 1:
-                trade_type = 'Straddle'
-            elif len(types) == 2 and len(strikes) == 2:
-                trade_type = 'Strangle'
-        elif len(group) == 4:
-            trade_type = 'Iron Condor'
-        # Aggregate metrics
-        net_amount = group['Amount'].sum()
-        net_fees = group['Fee'].sum() if 'Fee' in group.columns else 0
-        open_date = group['Date'].min()
-        close_date = group['Date'].max()
-        summary = {
-            'Symbol': symbol,
-            'Expiration': expiration,
-            'Open_Date': open_date,
-            'Close_Date': close_date,
-            'Num_Legs': len(group),
-            'Trade_Type': trade_type,
-            'Net_Amount': net_amount,
-            'Net_Fees': net_fees,
-            'Legs': group.to_dict('records'),
-        }
-        complex_trades.append(summary)
-    # Sort by open date descending
-    complex_trades = sorted(complex_trades, key=lambda x: x['Open_Date'], reverse=True)
-    return complex_trades
+    # Add expiration date, strike price, option type and contract key for options
+    if section in ['OPTION_TRANSACTIONS', 'OPTION_POSITIONS']:
+        decoded = decode_option_descriptions(df['Symbol'], df['Description'])
+        for col in decoded.columns:
+            df[col] = decoded[col]
 
-@app.route('/')
-def index():
-    # Get the requested file from query parameters, default to first available file
-    available_files = get_available_data_files()
+    # Parse transaction dates once. Stock transactions are kept in date order for
+    # windowing; option transactions keep file order, which the ledger relies on.
+    if section.endswith('_TRANSACTIONS') and 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'], format='%Y%m%d')
+        if section == 'STOCK_TRANSACTIONS':
+            df = date_sorted(df)
 
-    # If no files exist, return empty dashboard
-    if not available_files:
-        empty_data = {
-            'available_files': [],
-            'selected_file': None,
-            'option_complex_trades': []
+    return compact_columns(df)
+
+# Text columns with few distinct values are stored as categoricals
+CATEGORY_COLUMNS = ['Account', 'Type', 'Symbol', 'Description', 'Exchange', 'Action', 'Status', 'Time',
+                    'Currency', 'Direction']
+# Counts are stored as 32-bit integers when every value is whole. Money columns
+# stay float64: lots pro-rate amounts and fees across partial fills, and
+# fixed-point values would round those shares differently.
+INTEGER_COLUMNS = ['Quantity', 'Multiplier', 'Shares']
+
+def compact_columns(df):
+    """Convert the columns of a frame to their compact types, in place; returns the frame."""
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    for column in INTEGER_COLUMNS:
+        if column in df.columns and df[column].dtype.kind in 'fi' and df[column].dtype != np.int32:
+            values = df[column].to_numpy()
+            if (np.isfinite(values).all() and (np.abs(values) < 2 ** 31).all()
+                    and (values == np.round(values)).all()):
+                df[column] = values.astype(np.int32)
+    return df
+
+def memory_report(dataset):
+    """Return the rows and bytes of every table in a dataset, with the type and bytes of each column."""
+    frames = {}
+    for name, value in dataset.items():
+        if isinstance(value, pd.DataFrame):
+            frames[name] = value
+        elif isinstance(value, TradeLedger):
+            frames['closed_trades'] = value.closed_trades
+            frames['open_trades'] = value.open_trades
+    report = {}
+    for name, frame in frames.items():
+        usage = frame.memory_usage(index=False, deep=True)
+        report[name] = {
+            'rows': len(frame),
+            'bytes': int(usage.sum()),
+            'columns': {column: {'dtype': str(frame[column].dtype), 'bytes': int(usage[column])}
+                        for column in frame.columns}
         }
-        return render_template('index.html', data=empty_data)
+    return report
 
-    requested_file = request.args.get('data_file')
-    if requested_file and requested_file in available_files:
-        selected_file = requested_file
-    else:
-        selected_file = available_files[0]  # Default to first file if none selected or invalid
+# Files derived from the data files (sidecars, the SQLite store) are written here,
+# never into data/, which may be a read-only or shared volume
+CACHE_DIRECTORY = os.environ.get('TLG_CACHE_DIR', 'cache')
 
-    # Get date range parameters
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+# Columnar sidecar cache (optional): the parsed sections of data/<file>.tlg are
+# written to <cache directory>/<file>.tlg.columns/ as one .npy file per column,
+# which later loads memory-map instead of parsing the text again
+SIDECAR_CACHE = os.environ.get('TLG_SIDECAR_CACHE', '0') == '1'
+SIDECAR_SUFFIX = '.columns'
+SIDECAR_VERSION = 2
 
-    # Parse the selected file
-    trading_data = parse_trading_data(selected_file)
+def sidecar_path(path):
+    return os.path.join(CACHE_DIRECTORY, os.path.basename(path) + SIDECAR_SUFFIX)
 
-    # Apply date filtering if parameters are provided
-    if start_date or end_date:
-        # Filter option transactions
-        if 'option_transactions' in trading_data:
-            original_transactions = trading_data['option_transactions'].copy()
+def source_signature(path):
+    """Identify the source file (and its contents) a sidecar was built from."""
+    stat = os.stat(path)
+    return {'version': SIDECAR_VERSION, 'path': os.path.abspath(path), 'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size}
 
-            # Ensure Date column is datetime
-            if 'Date' in original_transactions.columns:
-                original_transactions['Date'] = pd.to_datetime(original_transactions['Date'], format='%Y%m%d')
+def write_sidecar_column(directory, name, series):
+    """Write one column as .npy files and return how to read it back."""
+    if pd.api.types.is_datetime64_dtype(series):
+        np.save(os.path.join(directory, name + '.npy'), series.to_numpy().view('i8'))
+        return 'datetime'
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        np.save(os.path.join(directory, name + '.npy'), series.cat.codes.to_numpy())
+        np.save(os.path.join(directory, name + '.uniques.npy'), np.asarray(series.cat.categories, dtype=str))
+        return 'category'
+    if series.dtype == object:
+        # Strings are stored as integer codes into a fixed-width table of the distinct values
+        codes, uniques = pd.factorize(series)
+        np.save(os.path.join(directory, name + '.npy'), codes.astype(np.int32))
+        np.save(os.path.join(directory, name + '.uniques.npy'), np.asarray(uniques, dtype=str))
+        return 'string'
+    np.save(os.path.join(directory, name + '.npy'), series.to_numpy())
+    return 'numeric'
 
-                # Apply date filtering
-                if start_date:
-                    start_date_dt = pd.to_datetime(start_date)
-                    original_transactions = original_transactions[original_transactions['Date'] >= start_date_dt]
+def read_sidecar_column(directory, name, kind):
+    """Map one column of a sidecar back into memory."""
+    values = np.load(os.path.join(directory, name + '.npy'), mmap_mode='r').view(np.ndarray)
+    if kind == 'datetime':
+        return values.view('datetime64[ns]')
+    if kind == 'category':
+        categories = np.load(os.path.join(directory, name + '.uniques.npy')).astype(object)
+        return pd.Categorical.from_codes(values, categories=categories)
+    if kind == 'string':
+        uniques = np.load(os.path.join(directory, name + '.uniques.npy'))
+        table = np.empty(len(uniques) + 1, dtype=object)
+        table[:-1] = uniques
+        table[-1] = None  # code -1 marks a missing value
+        return table[values]
+    return values
 
-                if end_date:
-                    end_date_dt = pd.to_datetime(end_date)
-                    original_transactions = original_transactions[original_transactions['Date'] <= end_date_dt]
+def write_sidecar(path, sections, signature):
+    """
+    Write the parsed sections of a .tlg file as a sidecar directory in the cache directory.
+    The directory is built under a temporary name and renamed into place, so readers
+    never see a partial sidecar. Returns False if the cache directory is not writable.
+    """
+    target = sidecar_path(path)
+    directory = None
+    try:
+        os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix='.' + os.path.basename(target) + '.', dir=CACHE_DIRECTORY)
+        manifest = {'source': signature, 'sections': {}}
+        for section, df in sections.items():
+            columns = []
+            for i, column in enumerate(df.columns):
+                kind = write_sidecar_column(directory, f'{section}.{i}', df[column])
+                columns.append({'name': column, 'kind': kind})
+            manifest['sections'][section] = {'rows': len(df), 'columns': columns}
+        with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
 
-                # Update the filtered data
-                trading_data['option_transactions'] = original_transactions
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(directory, target)
+        return True
+    except OSError as e:
+        app.logger.warning('Could not write sidecar for %s: %s', path, e)
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+        return False
 
-                # Recalculate analytics with filtered data
-                trading_data['trading_analytics'] = calculate_trading_analytics(original_transactions, start_date, end_date)
-                trading_data['option_summary'] = calculate_option_summary(original_transactions, start_date, end_date)
+@stage_timer('read')
+def read_sidecar(path):
+    """Return the memory-mapped sections of a .tlg file, or None if its sidecar is missing or stale."""
+    directory = sidecar_path(path)
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['source'] != source_signature(path):
+            return None
 
-        # Filter stock transactions if they exist
-        if 'stock_transactions' in trading_data:
-            original_stock_transactions = trading_data['stock_transactions'].copy()
+        sections = {}
+        for section, layout in manifest['sections'].items():
+            sections[section] = pd.DataFrame({
+                column['name']: read_sidecar_column(directory, f'{section}.{i}', column['kind'])
+                for i, column in enumerate(layout['columns'])
+            }, copy=False)
+        return sections
+    except (OSError, ValueError, KeyError):
+        return None
 
-            # Ensure Date column is datetime
-            if 'Date' in original_stock_transactions.columns:
-                original_stock_transactions['Date'] = pd.to_datetime(original_stock_transactions['Date'], format='%Y%m%d')
+def load_trading_sections(path):
+    """Load the sections of a .tlg file from its sidecar, (re)building the sidecar if needed."""
+    sections = read_sidecar(path)
+    if sections is None:
+        # Fingerprint the source before parsing so a concurrent change invalidates the sidecar
+        signature = source_signature(path)
+        sections = read_trading_sections(path)
+        write_sidecar(path, sections, signature)
+    return sections
 
-                # Apply date filtering
-                if start_date:
-                    start_date_dt = pd.to_datetime(start_date)
-                    original_stock_transactions = original_stock_transactions[original_stock_transactions['Date'] >= start_date_dt]
+def build_trading_dataset(dfs, ledger=None):
+    """
+    Add the trade ledger, analytics and summaries derived from the parsed sections.
+    ledger, when given, is the already built ledger of the option transactions.
+    """
+    if 'option_transactions' in dfs:
+        if ledger is None:
+            ledger = build_trade_ledger(dfs['option_transactions'])
+        dfs.update(ledger_dataset(ledger))
 
-                if end_date:
-                    end_date_dt = pd.to_datetime(end_date)
-                    original_stock_transactions = original_stock_transactions[original_stock_transactions['Date'] <= end_date_dt]
+    if 'option_positions' in dfs:
+        dfs.update(option_positions_dataset(dfs['option_positions']))
 
-                # Update the filtered data
-                trading_data['stock_transactions'] = original_stock_transactions
+    # Date-range views computed ahead of requests by the data watcher. The key
+    # exists from the start so the watcher only ever replaces its value.
+    dfs['window_views'] = {}
 
-    # Add the list of available files to the template context
-    trading_data['available_files'] = available_files
-    trading_data['selected_file'] = selected_file
+    # Paging, sort and search state for the table endpoints
+    dfs['table_indexes'] = {name: TableIndex(dfs[name], columns)
+                            for name, columns in TABLE_COLUMNS.items() if name in dfs}
 
-    # Add complex option trades aggregation
-    if 'option_transactions' in trading_data:
-        trading_data['option_complex_trades'] = aggregate_complex_option_trades(trading_data['option_transactions'])
-    else:
-        trading_data['option_complex_trades'] = []
+    return dfs
+
+def ledger_dataset(ledger, previous=None, change=None):
+    """
+    Return the dataset entries derived from a trade ledger. Given the previous dataset and
+    the LedgerChange that extended its ledger into this one, the complex trades and the
+    daily P&L are updated for the change rather than computed again.
+    """
+    # Every option summary is a reduction of the same ledger
+    data = {
+        'trade_ledger': ledger,
+        'option_transactions': ledger.fills,
+        'trading_analytics': calculate_trading_analytics(ledger),
+        'option_summary': calculate_option_summary(ledger)
+    }
+    if previous is None:
+        clusters = complex_trade_clusters(ledger.fills)
+        trades, legs = detect_complex_trades(ledger, clusters)
+        daily = daily_pnl_series(ledger)
+    else:
+        clusters, trades, legs = extend_complex_trades(previous, ledger, change)
+        daily = daily_pnl_series(ledger, previous['daily_pnl'], change.exit_dates)
+    data.update(complex_trade_clusters=clusters, complex_trades=trades, complex_trade_legs=legs, daily_pnl=daily)
+    return data
+
+def option_positions_dataset(positions):
+    """Return the dataset entries derived from the option positions."""
+    return {
+        'option_positions_summary': calculate_option_positions_summary(positions),
+        # Expiration alerts are looked up for the current day when they are shown
+        'expiry_calendar': ExpiryCalendar(positions)
+    }
+
+def read_data_file_sections(filename):
+    """Read the sections of data/<filename>, from its sidecar when enabled."""
+    path = os.path.join('data', filename)
+    if SIDECAR_CACHE:
+        return load_trading_sections(path)
+    return read_trading_sections(path)
+
+@stage_timer('parse')
+def parse_trading_data(filename):
+    """Parse trading data from the specified file."""
+    return build_trading_dataset(read_data_file_sections(filename))
+
+# Incremental ingestion (optional): when a cached .tlg file has grown, only the
+# appended lines are parsed and only the contracts they touch are matched again
+INCREMENTAL_INGEST = os.environ.get('TLG_INCREMENTAL_INGEST', '0') == '1'
+
+# Bytes at the start and at the end of the last parse that must be unchanged
+# for a file to count as appended to rather than rewritten
+INGEST_SIGNATURE_BYTES = 4096
+
+@dataclass(frozen=True)
+class IngestState:
+    """Where the last parse of a .tlg file ended, so later appends can be read on their own."""
+    size: int
+    head: bytes
+    tail: bytes
+    ranges: dict
+
+    @property
+    def last_section(self):
+        """The section still open at the end of the parsed bytes."""
+        if not self.ranges:
+            return None
+        return max(self.ranges, key=lambda section: self.ranges[section][0])
+
+def read_ingest_state(path, size, ranges):
+    with open(path, 'rb') as file:
+        head = file.read(min(size, INGEST_SIGNATURE_BYTES))
+        file.seek(max(0, size - INGEST_SIGNATURE_BYTES))
+        tail = file.read(size - max(0, size - INGEST_SIGNATURE_BYTES))
+    return IngestState(size=size, head=head, tail=tail, ranges=ranges)
+
+def scan_appended_sections(path, state):
+    """
+    Return (state, ranges) for the lines appended to a .tlg file since state, or None when
+    the file was truncated or rewritten and must be parsed again from the start.
+    """
+    size = os.path.getsize(path)
+    # An unterminated last line may still be growing, so it cannot be extended in place
+    if size < state.size or (state.tail and not state.tail.endswith(b'\n')):
+        return None
+    current = read_ingest_state(path, state.size, state.ranges)
+    if current.head != state.head or current.tail != state.tail:
+        return None
+
+    appended = scan_tlg_sections(path, start=state.size, end=size, current_section=state.last_section)
+    ranges = dict(state.ranges)
+    for section, (start, end) in appended.items():
+        if section in state.ranges and section == state.last_section and start == state.size:
+            ranges[section] = (state.ranges[section][0], end)
+        else:
+            ranges[section] = (start, end)
+    return read_ingest_state(path, size, ranges), appended
+
+@stage_timer('parse')
+def ingest_trading_data(filename, previous=None):
+    """
+    Parse trading data from the specified file, starting from the previous dataset of
+    the same file when the file has only been appended to since.
+    """
+    path = os.path.join('data', filename)
+    state = previous.get('ingest_state') if previous else None
+    if state is not None:
+        scanned = scan_appended_sections(path, state)
+        if scanned is not None:
+            dataset = append_trading_data(path, previous, *scanned)
+            if dataset is not None:
+                return dataset
+
+    # Full parse, remembering where it ended
+    size = os.path.getsize(path)
+    ranges = scan_tlg_sections(path, end=size)
+    sections = read_sidecar(path) if SIDECAR_CACHE else None
+    if sections is None:
+        signature = source_signature(path)
+        sections = read_trading_sections(path, ranges)
+        if SIDECAR_CACHE:
+            write_sidecar(path, sections, signature)
+    dfs = build_trading_dataset(sections)
+    dfs['ingest_state'] = read_ingest_state(path, size, ranges)
+    return dfs
+
+def append_trading_data(path, previous, state, appended):
+    """
+    Add the appended sections to the previous dataset of a file. Transaction rows are merged
+    into their date-sorted frames by position, and the ledger, complex trades, daily P&L and
+    table indexes are extended for the rows and positions they touch; positions sections,
+    which are snapshots, are read again. The previous dataset is left as it was.
+    Returns None when the appended lines restart a section that was already complete,
+    which only a full parse handles the same way.
+    """
+    previous_state = previous['ingest_state']
+    for section, (start, end) in appended.items():
+        continues = section == previous_state.last_section and start == previous_state.size
+        if section == 'ACCOUNT_INFORMATION' or (section in previous_state.ranges and not continues):
+            return None
+
+    dfs = dict(previous)
+    dfs['window_views'] = {}
+    table_indexes = dfs['table_indexes'] = dict(previous['table_indexes'])
+
+    with open(path, 'rb', buffering=0) as file:
+        for section, (start, end) in appended.items():
+            if section not in TLG_HEADERS:
+                continue  # EOF
+            name = section.lower()
+
+            if section.endswith('_POSITIONS'):
+                df = read_tlg_section(file, section, *state.ranges[section])
+                if df is None:
+                    continue
+                dfs[name] = prepare_section(section, df)
+                if section == 'OPTION_POSITIONS':
+                    dfs.update(option_positions_dataset(dfs[name]))
+                rows = None
+            else:
+                df = read_tlg_section(file, section, start, end)
+                if df is None:
+                    continue
+                df = prepare_section(section, df)
+                rows = None
+                if section == 'OPTION_TRANSACTIONS' and 'trade_ledger' in dfs:
+                    ledger, change = extend_trade_ledger(dfs['trade_ledger'], df)
+                    dfs.update(ledger_dataset(ledger, dfs, change))
+                    rows = change.rows
+                elif section == 'OPTION_TRANSACTIONS':
+                    dfs.update(ledger_dataset(build_trade_ledger(df)))
+                elif name in dfs:
+                    positions = np.searchsorted(dfs[name]['Date'].to_numpy(), df['Date'].to_numpy(), side='right')
+                    dfs[name] = merge_rows(dfs[name], df, positions)
+                    rows = positions + np.arange(len(df))
+                else:
+                    dfs[name] = df
+
+            if name in TABLE_COLUMNS:
+                if rows is not None and name in table_indexes:
+                    table_indexes[name] = table_indexes[name].extended(dfs[name], rows)
+                else:
+                    table_indexes[name] = TableIndex(dfs[name], TABLE_COLUMNS[name])
+
+    dfs['ingest_state'] = state
+    return dfs
+
+# Selecting this instead of a file analyzes every data file together
+ALL_DATA_FILES = 'all'
+
+# Several files of the consolidated view are parsed on the shared worker pool; 1 parses them in turn
+CONSOLIDATED_WORKERS = int(os.environ.get('CONSOLIDATED_WORKERS', os.cpu_count() or 1))
+
+def sections_as_of(sections):
+    """Date of the latest transaction in a file's sections (NaT if it has none)."""
+    latest = pd.NaT
+    for section in ['stock_transactions', 'option_transactions']:
+        if section in sections and not sections[section].empty:
+            dates = pd.to_datetime(sections[section]['Date'], format='%Y%m%d', errors='coerce')
+            latest = max(latest, dates.max()) if pd.notna(latest) else dates.max()
+    return latest
+
+def merge_file_sections(filenames, file_sections):
+    """
+    Merge the sections of several files into one set of section frames.
+    Every row is tagged with the Account ID of its file, transactions that appear in more
+    than one file are kept once (by ID), and each account's positions are taken from its
+    most recent file, since every export holds a full positions snapshot.
+    """
+    tagged = {}
+    latest_positions = {}
+    accounts = []
+    for number, (filename, sections) in enumerate(zip(filenames, file_sections)):
+        if 'account_info' in sections:
+            account = sections['account_info']['Account ID'].iloc[0]
+            accounts.append(sections['account_info'])
+        else:
+            account = os.path.splitext(filename)[0]
+
+        for section, df in sections.items():
+            if section == 'account_info':
+                continue
+            df = df.copy(deep=False)
+            df['Account'] = account
+            tagged.setdefault(section, []).append((number, df))
+
+        # Positions come from the file with the latest transactions (later files win ties)
+        as_of = (sections_as_of(sections), number)
+        if account not in latest_positions or as_of >= latest_positions[account]:
+            latest_positions[account] = as_of
+
+    dfs = {}
+    if accounts:
+        dfs['account_info'] = pd.concat(accounts, ignore_index=True).drop_duplicates('Account ID', ignore_index=True)
+    latest_files = {number for _, number in latest_positions.values()}
+
+    for section, frames in tagged.items():
+        if section.endswith('_positions'):
+            frames = [(number, df) for number, df in frames if number in latest_files]
+        df = compact_columns(pd.concat([df for _, df in frames], ignore_index=True))
+        if section.endswith('_transactions'):
+            # Overlapping exports repeat transactions; their IDs identify them
+            has_id = df['ID'].astype(str).str.strip() != ''
+            df = df[~(df['ID'].duplicated() & has_id)].reset_index(drop=True)
+            if pd.api.types.is_datetime64_any_dtype(df['Date']):
+                df = date_sorted(df)
+        dfs[section] = df
+    return dfs
+
+@stage_timer('parse')
+def parse_consolidated_data(filenames):
+    """
+    Parse several data files in parallel on the shared worker pool and analyze them as
+    one dataset, with a per-account breakdown.
+    """
+    workers = max(1, min(CONSOLIDATED_WORKERS, len(filenames)))
+    if workers > 1:
+        file_sections = pool_map(read_data_file_sections, filenames)
+    else:
+        file_sections = [read_data_file_sections(filename) for filename in filenames]
+
+    dfs = build_trading_dataset(merge_file_sections(filenames, file_sections))
+    dfs['account_breakdown'] = calculate_account_breakdown(dfs)
+    return dfs
+
+def calculate_account_breakdown(trading_data, start_date=None, end_date=None):
+    """Summarize option trading per account for a consolidated dataset."""
+    if 'trade_ledger' not in trading_data:
+        return []
+    ledger = trading_data['trade_ledger']
+    fills = ledger.fills_between(start_date, end_date)
+    lo, hi = ledger.closed_index.bounds(start_date, end_date)
+    closed = ledger.closed_trades.iloc[lo:hi]
+    lo, hi = ledger.open_index.bounds(start_date, end_date)
+    open_trades = ledger.open_trades.iloc[lo:hi]
+    held = ledger.closed_trades.iloc[ledger.held_past(start_date, end_date)]
+
+    breakdown = pd.DataFrame({
+        'total_transactions': fills.groupby('Account', observed=True).size(),
+        'total_fees': fills.groupby('Account', observed=True)['Fee'].sum(),
+        'closed_positions': closed.groupby('Account', observed=True).size(),
+        'winning_trades': closed.groupby('Account', observed=True)['Is_Win'].sum(),
+        'total_pnl': closed.groupby('Account', observed=True)['PnL'].sum(),
+        'open_positions': open_trades.groupby('Account', observed=True).size().add(
+            held.groupby('Account', observed=True).size(), fill_value=0)
+    }).fillna(0)
+    breakdown['win_rate'] = np.where(breakdown['closed_positions'] > 0,
+                                     breakdown['winning_trades'] / breakdown['closed_positions'].clip(lower=1) * 100, 0)
+
+    names = {}
+    if 'account_info' in trading_data:
+        names = dict(zip(trading_data['account_info']['Account ID'], trading_data['account_info']['Name']))
+    breakdown = breakdown.rename_axis('account').reset_index()
+    breakdown['name'] = breakdown['account'].map(names).fillna('')
+    for column in ['total_transactions', 'closed_positions', 'winning_trades', 'open_positions']:
+        breakdown[column] = breakdown[column].astype(int)
+    return breakdown.to_dict('records')
+
+# Opening fills of the same underlying executed within this many seconds of
+# each other are legs of one complex trade
+COMPLEX_TRADE_WINDOW_SECONDS = int(os.environ.get('COMPLEX_TRADE_WINDOW_SECONDS', 300))
+
+COMPLEX_TRADE_COLUMNS = ['Trade_ID', 'Symbol', 'Expiration', 'Open_Date', 'Close_Date', 'Num_Legs',
+                         'Num_Fills', 'Trade_Type', 'Net_Amount', 'Net_Fees']
+
+def fill_timestamps(fills):
+    """Execution time of each fill: its Date plus its Time of day (midnight when missing)."""
+    time_codes, time_values = pd.factorize(fills['Time'].astype(str))
+    times = pd.to_timedelta(pd.Series(time_values, dtype=object), errors='coerce').fillna(pd.Timedelta(0))
+    return fills['Date'].to_numpy() + times.to_numpy()[time_codes]
+
+def opening_legs(fills):
+    """Mask of the fills that can open a leg of a complex trade: opening fills with a decodable contract."""
+    action_codes, actions = pd.factorize(fills['Action'], use_na_sentinel=False)
+    opening = np.array(['OPEN' in str(action) for action in actions], dtype=bool)[action_codes]
+    return opening & fills['Expiration'].notna().to_numpy()
+
+def fill_underlyings(fills):
+    """Underlying of each fill: its Symbol, within its Account in a consolidated ledger."""
+    underlying = fills['Symbol'].astype(str)
+    if 'Account' in fills.columns:
+        underlying = fills['Account'].astype(str) + '|' + underlying
+    return underlying
+
+def cluster_trade_ids(underlying_codes, timestamps, sequence):
+    """
+    Trade_ID of each opening fill, given the fills in (underlying, execution time, Seq) order:
+    a new trade starts wherever the underlying changes or more than COMPLEX_TRADE_WINDOW_SECONDS
+    pass between consecutive fills, and a trade's ID is the Seq of its first fill.
+    """
+    starts_trade = np.ones(len(sequence), dtype=bool)
+    starts_trade[1:] = ((underlying_codes[1:] != underlying_codes[:-1])
+                        | (np.diff(timestamps) > np.timedelta64(COMPLEX_TRADE_WINDOW_SECONDS, 's')))
+    return sequence[np.maximum.accumulate(np.where(starts_trade, np.arange(len(sequence)), 0))]
+
+@stage_timer('complex_trades')
+def complex_trade_clusters(fills):
+    """
+    Group the opening legs of fills into trades with one sort and one diff. Returns one row per
+    leg, sorted by Underlying (categorical, sorted categories), execution Timestamp and Seq,
+    with the Lot_Key of its position and the Trade_ID of the trade it opens.
+    """
+    opens = fills[opening_legs(fills)]
+    underlying_codes, underlyings = pd.factorize(fill_underlyings(opens), sort=True)
+    timestamps = fill_timestamps(opens)
+    sequence = opens['Seq'].to_numpy()
+    order = np.lexsort((sequence, timestamps, underlying_codes))
+    underlying_codes, timestamps, sequence = underlying_codes[order], timestamps[order], sequence[order]
+    return pd.DataFrame({
+        'Underlying': pd.Categorical.from_codes(underlying_codes, categories=underlyings),
+        'Timestamp': timestamps,
+        'Seq': sequence,
+        'Lot_Key': lot_keys(opens).to_numpy()[order],
+        'Trade_ID': cluster_trade_ids(underlying_codes, timestamps, sequence)
+    })
+
+def extend_complex_trades(dataset, ledger, change):
+    """
+    Return (clusters, trades, legs) for a ledger that extend_trade_ledger extended from the
+    one of dataset. The appended opening legs are merged into the clusters by position and
+    only the underlyings they touch are clustered again. The trades whose opening legs
+    changed or that hold a position matched again are detected again, against the full
+    clusters, and replace their previous rows by position; all other trades are kept.
+    """
+    clusters = dataset['complex_trade_clusters']
+    fills = ledger.fills.iloc[change.rows]
+    appended = complex_trade_clusters(fills).assign(Trade_ID=-1)
+    previous_underlyings = clusters['Underlying'].cat.categories
+    underlyings = pd.Index(sorted(set(previous_underlyings).union(appended['Underlying'].cat.categories)))
+    codes = underlyings.get_indexer(previous_underlyings)[clusters['Underlying'].cat.codes]
+    appended_codes = underlyings.get_indexer(appended['Underlying'].cat.categories)[appended['Underlying'].cat.codes]
+    keys = sort_keys(clusters.assign(Underlying=codes), ['Underlying', 'Timestamp', 'Seq'])
+    positions = np.searchsorted(keys, sort_keys(appended.assign(Underlying=appended_codes),
+                                                ['Underlying', 'Timestamp', 'Seq']))
+    clusters = merge_rows(clusters.assign(Underlying=codes), appended.assign(Underlying=appended_codes), positions)
+
+    # Cluster the legs of every underlying an appended fill belongs to again
+    codes = clusters['Underlying'].to_numpy()
+    touched = np.unique(underlyings.get_indexer(fill_underlyings(fills).unique()))
+    _, rows = window_rows(np.searchsorted(codes, touched, side='left'), np.searchsorted(codes, touched, side='right'))
+    previous_ids = clusters['Trade_ID'].to_numpy()[rows]
+    trade_ids = clusters['Trade_ID'].to_numpy().copy()
+    trade_ids[rows] = cluster_trade_ids(codes[rows], clusters['Timestamp'].to_numpy()[rows],
+                                        clusters['Seq'].to_numpy()[rows])
+    dirty = (previous_ids != trade_ids[rows]) | clusters['Lot_Key'].iloc[rows].isin(change.keys).to_numpy()
+    dirty = np.unique(np.r_[previous_ids[dirty], trade_ids[rows][dirty]])
+    dirty = dirty[dirty >= 0]
+    clusters = clusters.assign(Underlying=pd.Categorical.from_codes(codes, categories=underlyings), Trade_ID=trade_ids)
+
+    trades, legs = detect_complex_trades(ledger, clusters, dirty)
+    previous_trades, previous_legs = dataset['complex_trades'], dataset['complex_trade_legs']
+    keep = ~previous_trades['Trade_ID'].isin(dirty).to_numpy()
+    positions = np.searchsorted(sort_keys(previous_trades, ['Open_Date', 'Trade_ID'])[keep],
+                                sort_keys(trades, ['Open_Date', 'Trade_ID']))
+    trades = merge_rows(previous_trades, trades, positions, keep)
+    # Legs are sorted by Trade_ID first, so each trade's legs go in as one block
+    keep = ~previous_legs['Trade_ID'].isin(dirty).to_numpy()
+    positions = np.searchsorted(previous_legs['Trade_ID'].to_numpy()[keep], legs['Trade_ID'].to_numpy(), side='right')
+    legs = merge_rows(previous_legs, legs, positions, keep)
+    return clusters, trades, legs
+
+def joined_labels(groups, labels, separator=' / '):
+    """
+    Join the distinct labels of each group in sorted order, with one concatenation pass over
+    the group boundaries rather than a Python call per group. Returns a Series indexed by
+    the sorted groups.
+    """
+    group_codes, group_values = pd.factorize(groups, sort=True)
+    label_codes, label_values = pd.factorize(labels, sort=True)
+    pairs = np.unique(group_codes.astype(np.int64) * len(label_values) + label_codes)
+    pair_groups, pair_labels = np.divmod(pairs, len(label_values))
+    first = np.r_[True, pair_groups[1:] != pair_groups[:-1]]
+    parts = np.where(first, '', separator).astype(object) + np.asarray(label_values, dtype=object)[pair_labels]
+    return pd.Series(np.add.reduceat(parts, np.flatnonzero(first)), index=group_values[pair_groups[first]])
+
+@stage_timer('complex_trades')
+def detect_complex_trades(ledger, clusters=None, trade_ids=None):
+    """
+    Detect complex (multi-leg) option trades in the ledger from the clusters of its opening
+    legs (complex_trade_clusters, computed when not given). Closing fills join the trade of
+    the earliest lot they close. Pass trade_ids to build only those trades, e.g. the ones an
+    append touched; clusters must still cover the whole ledger so that closing fills are
+    assigned as in a full run.
+    Returns (trades, legs): one row per trade with two or more legs sorted by Open_Date,
+    and their fills sorted by Trade_ID.
+    """
+    fills = ledger.fills
+    empty = (pd.DataFrame(columns=COMPLEX_TRADE_COLUMNS), fills.iloc[:0].assign(Trade_ID=pd.Series(dtype=np.int64)))
+    if clusters is None:
+        clusters = complex_trade_clusters(fills)
+    members = clusters if trade_ids is None else clusters[clusters['Trade_ID'].isin(trade_ids)]
+    if members.empty:
+        return empty
+    # A closing fill belongs to the trade of the earliest lot it closes
+    trade_of_seq = pd.Series(clusters['Trade_ID'].to_numpy(), index=clusters['Seq'].to_numpy())
+    closed = ledger.closed_trades
+    if trade_ids is not None:  # only fills closing lots the trades opened can join them
+        closed = closed[closed['Exit_Seq'].isin(closed.loc[closed['Entry_Seq'].isin(members['Seq']), 'Exit_Seq'])]
+    closing = closed[closed['Entry_Seq'].isin(trade_of_seq.index)]
+    closing = closing.sort_values(['Exit_Seq', 'Entry_Seq'], kind='stable').drop_duplicates('Exit_Seq')
+
+    # Opening then closing legs, taken from the fills at once
+    legs = fills.iloc[pd.Index(fills['Seq']).get_indexer(np.r_[members['Seq'], closing['Exit_Seq']])].assign(
+        Trade_ID=np.r_[members['Trade_ID'], trade_of_seq.loc[closing['Entry_Seq']]])
+    open_legs = legs.iloc[:len(members)]
+
+    # Per-trade shape of the opening legs: distinct contracts, types, strikes and expiries
+    shape = open_legs.groupby('Trade_ID', sort=True).agg(
+        Symbol=('Symbol', 'first'),
+        Open_Date=('Date', 'min'),
+        Num_Legs=('Contract', 'nunique'),
+        Num_Types=('Type', 'nunique'),
+        Num_Strikes=('Strike', 'nunique'),
+        Num_Expiries=('Expiration', 'nunique')
+    )
+    shape = shape[shape['Num_Legs'] >= 2]  # Need at least 2 legs for a complex trade
+    if shape.empty:
+        return empty
+    legs = legs[legs['Trade_ID'].isin(shape.index)]
+    legs = legs.sort_values(['Trade_ID', 'Date', 'Seq'], kind='stable', ignore_index=True)
+
+    totals = legs.groupby('Trade_ID', sort=True).agg(
+        Close_Date=('Date', 'max'),
+        Num_Fills=('Date', 'size'),
+        Net_Amount=('Amount', 'sum'),
+        Net_Fees=('Fee', 'sum')
+    )
+    expirations = joined_labels(open_legs['Trade_ID'], open_legs['Expiration'])
+    trades = shape.join(totals).assign(Expiration=expirations).reset_index()
+
+    # Classify the strategy from the shape of its opening legs
+    legs_count, types, strikes, expiries = (trades[column] for column in
+                                            ['Num_Legs', 'Num_Types', 'Num_Strikes', 'Num_Expiries'])
+    trades['Trade_Type'] = np.select(
+        [
+            (expiries == 1) & (legs_count == 2) & (types == 1) & (strikes == 2),
+            (expiries == 1) & (legs_count == 2) & (types == 2) & (strikes == 1),
+            (expiries == 1) & (legs_count == 2) & (types == 2) & (strikes == 2),
+            (expiries == 1) & (legs_count == 3) & (types == 1) & (strikes == 3),
+            (expiries == 1) & (legs_count == 4) & (types == 2),
+            (expiries == 2) & (legs_count == 2) & (types == 1) & (strikes == 1),
+            (expiries == 2) & (legs_count == 2) & (types == 1) & (strikes == 2)
+        ],
+        ['Vertical Spread', 'Straddle', 'Strangle', 'Butterfly', 'Iron Condor',
+         'Calendar Spread', 'Diagonal Spread'],
+        default='Custom'
+    )
+    trades = trades[COMPLEX_TRADE_COLUMNS].sort_values(['Open_Date', 'Trade_ID'], kind='stable', ignore_index=True)
+    return trades, legs
+
+@stage_timer('complex_trades')
+def aggregate_complex_option_trades(trading_data, start_date=None, end_date=None):
+    """
+    Return the complex (multi-leg) trades opened within the date window, newest first,
+    as summary records; their legs are served by /api/complex-trades/<trade_id>/legs.
+    """
+    trades = complex_trades_window(trading_data, start_date, end_date)
+    if trades is None:
+        return []
+    return trades.to_dict('records')
+
+def complex_trades_window(trading_data, start_date=None, end_date=None):
+    """Return the complex trades opened within the date window, newest first (None without a complex trades frame)."""
+    trades = trading_data.get('complex_trades')
+    if trades is None or trades.empty:
+        return trades
+    lo, hi = DateWindowIndex(trades['Open_Date']).bounds(start_date, end_date)
+    return trades.iloc[lo:hi].iloc[::-1]
+
+def complex_trade_legs(trading_data, trade_id):
+    """Return the fills of one complex trade, or None if there is no such trade."""
+    legs = trading_data.get('complex_trade_legs')
+    if legs is None:
+        return None
+    trade_ids = legs['Trade_ID'].to_numpy()
+    lo, hi = np.searchsorted(trade_ids, trade_id, side='left'), np.searchsorted(trade_ids, trade_id, side='right')
+    if lo == hi:
+        return None
+    return legs.iloc[lo:hi]
+
+# Time series for charting: the closed trades' P&L per business day, from which
+# the equity curve, drawdowns and rolling statistics of any date window,
+# frequency and rolling window are computed with cumulative sums
+TIMESERIES_WINDOWS = [20, 60, 252]
+TIMESERIES_FREQUENCIES = {'D': 252, 'W': 52, 'M': 12}  # periods per year, for annualizing
+
+def daily_pnl_series(ledger, previous=None, exit_dates=None):
+    """
+    Return the P&L, trade count and winning trades of the closed trades per business day of exit.
+    Given the series of a previous ledger and the exit dates of the closed lots removed or
+    added since, only the days of those exit dates are summed again.
+    """
+    closed = ledger.closed_trades
+    if closed.empty:
+        return pd.DataFrame({'PnL': [], 'Trades': [], 'Wins': []}, index=pd.DatetimeIndex([], name='Date'))
+
+    # Trades are in exit date order; weekend exits count towards the next business day
+    dates = closed['Exit_Date'].to_numpy()
+    first, last = np.busday_offset(dates[[0, -1]].astype('datetime64[D]'), 0, roll='forward')
+    days = np.arange(first, last + 1)
+    days = days[np.is_busday(days)]
+    if previous is None or previous.empty:
+        summed, rows = days, np.arange(len(dates))
+    else:
+        # The exits of a business day are those after the business day before it
+        summed = np.intersect1d(np.busday_offset(exit_dates.astype('datetime64[D]'), 0, roll='forward'), days)
+        lo = np.searchsorted(dates, (np.busday_offset(summed, -1) + 1).astype(dates.dtype))
+        hi = np.searchsorted(dates, (summed + 1).astype(dates.dtype))
+        _, rows = window_rows(lo, hi)
+    positions = np.searchsorted(summed, np.busday_offset(dates[rows].astype('datetime64[D]'), 0, roll='forward'))
+    sums = pd.DataFrame({
+        'PnL': np.bincount(positions, weights=closed['PnL'].to_numpy(dtype=float)[rows], minlength=len(summed)),
+        'Trades': np.bincount(positions, minlength=len(summed)),
+        'Wins': np.bincount(positions, weights=closed['Is_Win'].to_numpy(dtype=float)[rows], minlength=len(summed))
+    }, index=pd.DatetimeIndex(summed.astype('datetime64[ns]'), name='Date'))
+    if summed is days:
+        return sums
+    daily = previous.reindex(pd.DatetimeIndex(days.astype('datetime64[ns]'), name='Date'), fill_value=0)
+    daily.loc[sums.index, sums.columns] = sums
+    return daily
+
+def resample_series(daily, frequency):
+    """Sum a daily series into weekly ('W') or monthly ('M') periods, each dated by its last business day."""
+    if frequency == 'D' or daily.empty:
+        return daily
+    codes, _ = pd.factorize(daily.index.to_period(frequency))
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)] - 1
+    return pd.DataFrame(np.add.reduceat(daily.to_numpy(dtype=float), starts, axis=0),
+                        columns=daily.columns, index=daily.index[ends])
+
+def rolling_sum(values, window):
+    """Sum of each trailing window of values (NaN until the first full window), from one cumulative sum."""
+    prefix = np.concatenate([[0.0], np.cumsum(values)])
+    sums = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums[window - 1:] = prefix[window:] - prefix[:-window]
+    return sums
+
+def rolling_statistics(series, window, periods_per_year):
+    """Rolling Sharpe ratio, volatility, win rate and drawdown of a P&L series."""
+    pnl = series['PnL'].to_numpy(dtype=float)
+    # Centering first keeps the sum of squares from cancelling on long histories
+    offset = pnl.mean() if len(pnl) else 0.0
+    centered_mean = rolling_sum(pnl - offset, window) / window
+    variance = np.full(len(pnl), np.nan)
+    if window > 1:
+        variance = (rolling_sum((pnl - offset) ** 2, window) - window * centered_mean ** 2) / (window - 1)
+    volatility = np.sqrt(np.clip(variance, 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility > 0, (centered_mean + offset) / volatility, np.nan)
+        trades = rolling_sum(series['Trades'].to_numpy(dtype=float), window)
+        win_rate = np.where(trades > 0, rolling_sum(series['Wins'].to_numpy(dtype=float), window) / trades * 100, np.nan)
+
+    # Drawdown from the highest equity within the window
+    equity = pd.Series(np.cumsum(pnl))
+    drawdown = (equity - equity.rolling(window, min_periods=1).max()).to_numpy()
+    return {
+        'sharpe': sharpe * periods_per_year ** 0.5,
+        'volatility': volatility * periods_per_year ** 0.5,
+        'win_rate': win_rate,
+        'drawdown': drawdown
+    }
+
+def json_series(values):
+    """Convert an array to a JSON-ready list with NaN as null."""
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isfinite(values), values, None).tolist()
+
+@stage_timer('timeseries')
+def calculate_timeseries(trading_data, start_date=None, end_date=None, frequency='D', windows=TIMESERIES_WINDOWS):
+    """
+    Return the P&L, equity curve and drawdown of the trades closed within the date window,
+    at the given frequency, with rolling statistics over each window (in periods of that
+    frequency). Rolling statistics look back before start_date; the equity curve and its
+    drawdown start from zero at start_date.
+    """
+    daily = trading_data.get('daily_pnl')
+    if daily is None:
+        daily = pd.DataFrame({'PnL': [], 'Trades': [], 'Wins': []}, index=pd.DatetimeIndex([], name='Date'))
+    series = resample_series(daily, frequency)
+    periods_per_year = TIMESERIES_FREQUENCIES[frequency]
+    rolling = {window: rolling_statistics(series, window, periods_per_year) for window in windows}
+
+    lo, hi = DateWindowIndex(series.index).bounds(start_date, end_date)
+    pnl = series['PnL'].to_numpy(dtype=float)[lo:hi]
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, 0)) if len(equity) else equity
+    return {
+        'frequency': frequency,
+        'dates': series.index[lo:hi].strftime('%Y-%m-%d').tolist(),
+        'pnl': json_series(pnl),
+        'trades': series['Trades'].to_numpy()[lo:hi].astype(int).tolist(),
+        'equity': json_series(equity),
+        'drawdown': json_series(equity - peak),
+        'rolling': {
+            str(window): {name: json_series(values[lo:hi]) for name, values in statistics.items()}
+            for window, statistics in rolling.items()
+        }
+    }
+
+# Scenario engine: Black-Scholes value and Greeks of the open option positions over a
+# grid of underlying price shocks x volatility shocks x days forward. Spot prices and
+# implied volatilities come from a local CSV file with Symbol, Spot and Volatility
+# columns (volatility as a decimal, e.g. 0.25). Dividends are ignored.
+MARKET_DATA_FILE = os.environ.get('MARKET_DATA_FILE', os.path.join('data', 'market_data.csv'))
+RISK_FREE_RATE = float(os.environ.get('RISK_FREE_RATE', 0.04))
+SCENARIO_METRICS = ['value', 'pnl', 'delta', 'gamma', 'vega', 'theta']
+# Default axes as (first, last, count): relative spot shocks, absolute volatility shocks, days forward
+SCENARIO_AXES = {'spot_shocks': (-0.2, 0.2, 41), 'vol_shocks': (-0.1, 0.1, 11), 'days': (0, 30, 7)}
+SCENARIO_MAX_POINTS = 100000  # grid points per request
+SCENARIO_CHUNK_ELEMENTS = 1 << 16  # contract x grid point evaluations at once, sized to stay in cache
+# Answered grids, by dataset, market data, axes and day (default 16 MB)
+SCENARIO_CACHE_MAX_BYTES = int(os.environ.get('SCENARIO_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+MIN_VOLATILITY = 1e-4
+
+market_data_cache = {}  # file fingerprint -> market data frame
+
+def load_market_data(path=None):
+    """Return the market data as a frame of Spot and Volatility by symbol, or None if there is no file."""
+    path = path or MARKET_DATA_FILE
+    try:
+        key = file_fingerprint(path)
+    except OSError:
+        return None
+    market = market_data_cache.get(key)
+    if market is None:
+        market = pd.read_csv(path, dtype={'Symbol': str}, skipinitialspace=True)
+        missing = {'Symbol', 'Spot', 'Volatility'} - set(market.columns)
+        if missing:
+            raise ValueError(f'{path} has no {", ".join(sorted(missing))} column')
+        market = market[['Symbol', 'Spot', 'Volatility']].dropna().drop_duplicates('Symbol', keep='last')
+        market = market.set_index('Symbol').astype(float)
+        market.attrs['fingerprint'] = key
+        market_data_cache.clear()
+        market_data_cache[key] = market
+    return market
+
+# Abramowitz and Stegun 7.1.26 for erfc, scaled to the normal distribution: for x >= 0,
+# 1 - N(x) = t * (a1 + t * (a2 + ...)) * exp(-x**2 / 2) with t = 1 / (1 + p * x / sqrt(2))
+NORMAL_TAIL_P = 0.3275911 / np.sqrt(2)
+NORMAL_TAIL_COEFFICIENTS = 0.5 * np.array([1.061405429, -1.453152027, 1.421413741, -0.284496736, 0.254829592])
+
+def normal_cdf(x, density=None):
+    """
+    Standard normal distribution function of an array, with an absolute error below 1e-7.
+    density, if given, is exp(-x**2 / 2), which callers often have already.
+    """
+    # Computed in place on two temporaries: this is most of the cost of a scenario grid
+    if density is None:
+        density = np.exp(-0.5 * x * x)
+    t = np.abs(x)
+    t *= NORMAL_TAIL_P
+    t += 1
+    np.reciprocal(t, out=t)
+    tail = t * NORMAL_TAIL_COEFFICIENTS[0]
+    for coefficient in NORMAL_TAIL_COEFFICIENTS[1:]:
+        tail += coefficient
+        tail *= t
+    tail *= density
+    # N(x) = 0.5 + sign(x) * (0.5 - tail)
+    np.subtract(0.5, tail, out=tail)
+    np.copysign(tail, x, out=tail)
+    tail += 0.5
+    return tail
+
+def black_scholes_calls(spot, strike, years, volatility, rate, metrics=SCENARIO_METRICS):
+    """
+    Black-Scholes value and Greeks per share of European calls; the arguments broadcast
+    against each other. Vega is per volatility point and theta per calendar day. Calls
+    at expiry (years of 0) are worth their intrinsic value and have no gamma, vega or theta.
+    """
+    live = years > 0
+    years = np.maximum(years, 1e-9)
+    sqrt_years = np.sqrt(years)
+    deviation = volatility * sqrt_years
+    discounted_strike = strike * np.exp(-rate * years)
+    d1 = np.log(spot / strike) + (rate + 0.5 * volatility * volatility) * years
+    d1 /= deviation
+    # exp(-d1**2 / 2), shared by both distribution functions and the Greeks;
+    # exp(-d2**2 / 2) is the same times spot / discounted strike
+    density = d1 * d1
+    density *= -0.5
+    np.exp(density, out=density)
+    results = {}
+    if 'value' in metrics or 'delta' in metrics:
+        n_d1 = normal_cdf(d1, density)
+        if 'delta' in metrics:
+            results['delta'] = n_d1
+    if 'value' in metrics or 'theta' in metrics:
+        strike_term = normal_cdf(d1 - deviation, density * (spot / discounted_strike))
+        strike_term *= discounted_strike
+        if 'value' in metrics:
+            value = spot * n_d1
+            value -= strike_term
+            results['value'] = value
+    if {'gamma', 'vega', 'theta'} & set(metrics):
+        density *= live / np.sqrt(2 * np.pi)
+        if 'gamma' in metrics:
+            results['gamma'] = density / (spot * deviation)
+        if 'vega' in metrics:
+            results['vega'] = spot * density * (sqrt_years / 100)
+        if 'theta' in metrics:
+            theta = spot * density * (volatility / (-2 * sqrt_years))
+            theta -= rate * live * strike_term
+            theta /= 365
+            results['theta'] = theta
+    return results
+
+def put_call_parity(spot, strike, years, rate, metrics=SCENARIO_METRICS):
+    """
+    Per-share difference between a European put and the call of the same strike and expiry:
+    the put is the call, short the underlying and long the discounted strike. Gamma and
+    vega are the same for both, so they have no entry.
+    """
+    discounted_strike = strike * np.exp(-rate * years)
+    parity = {}
+    if 'value' in metrics:
+        parity['value'] = discounted_strike - spot
+    if 'delta' in metrics:
+        parity['delta'] = np.ones_like(discounted_strike) * -1.0
+    if 'theta' in metrics:
+        parity['theta'] = rate * discounted_strike * (years > 0) / 365
+    return parity
+
+def weighted_sums(weights, values):
+    """
+    Sum the per-contract values (first axis) with each row of weights. Axes the values
+    do not vary along are kept as length-one axes, so they are not computed at full size.
+    """
+    values = np.broadcast_to(values, np.broadcast_shapes(np.shape(values), (weights.shape[1], 1, 1, 1)))
+    sums = weights @ values.reshape(weights.shape[1], int(np.prod(values.shape[1:])))
+    return sums.reshape((weights.shape[0],) + values.shape[1:])
+
+def scenario_contracts(positions_df, market, today):
+    """
+    Net the open option positions into contracts (symbol, expiry, strike) with their market
+    inputs. Puts are held as calls plus their put-call parity difference, so a call and a put
+    of the same strike are one contract: Shares counts both, Put_Shares the puts. Returns the
+    contracts and the symbols without market data.
+    """
+    columns = ['Symbol', 'Expiration', 'Strike', 'Shares', 'Put_Shares', 'Spot', 'Volatility', 'Years']
+    if positions_df is None or positions_df.empty or 'Expiration' not in positions_df.columns:
+        return pd.DataFrame(columns=columns), []
+    options = positions_df[positions_df['Type'].isin(['P', 'C']) & positions_df['Expiration'].notna()
+                           & positions_df['Strike'].notna()]
+    shares = (options['Shares'] if 'Shares' in options.columns else options['Quantity'] * 100).astype(float)
+    contracts = (pd.DataFrame({'Symbol': options['Symbol'].astype(str), 'Expiration': options['Expiration'],
+                               'Strike': options['Strike'], 'Shares': shares,
+                               'Put_Shares': shares.where((options['Type'] == 'P').to_numpy(), 0.0)})
+                 .groupby(['Symbol', 'Expiration', 'Strike'])[['Shares', 'Put_Shares']].sum()
+                 .reset_index())
+    days = (pd.to_datetime(contracts['Expiration']) - pd.Timestamp(today)).dt.days
+    contracts = contracts[((contracts['Shares'] != 0) | (contracts['Put_Shares'] != 0)) & (days >= 0)]
+    contracts = contracts.assign(Years=days[contracts.index] / 365)
+
+    known = contracts['Symbol'].isin(market.index)
+    missing = sorted(contracts.loc[~known, 'Symbol'].unique())
+    contracts = contracts[known].join(market, on='Symbol').reset_index(drop=True)
+    return contracts[columns], missing
+
+def scenario_axis(text, default):
+    """Parse a grid axis given as first:last:count or as comma-separated values."""
+    if not text:
+        return np.linspace(*default)
+    if ':' in text:
+        first, last, count = text.split(':')
+        if int(count) < 1:
+            raise ValueError('an axis needs at least one point')
+        return np.linspace(float(first), float(last), int(count))
+    return np.array([float(value) for value in text.split(',')])
+
+@stage_timer('scenarios')
+def calculate_scenarios(trading_data, market, spot_shocks, vol_shocks, days, metrics=('pnl',),
+                        rate=RISK_FREE_RATE, today=None):
+    """
+    Value the open option positions over every (spot shock, volatility shock, days forward)
+    point, summed per underlying and for the portfolio. Spot shocks are relative to the
+    current spot, volatility shocks are added to the implied volatility and days forward
+    shorten the time to expiry.
+
+    The contracts are evaluated as calls in chunks, each one broadcast array per metric,
+    and summed per underlying with one matrix product; the puts' parity differences do
+    not depend on volatility and are summed without it.
+    """
+    today = today or datetime.now().date()
+    contracts, missing = scenario_contracts(trading_data.get('option_positions'), market, today)
+    codes, underlyings = pd.factorize(contracts['Symbol'], sort=True)
+    count = len(contracts)
+    # Rows of position sizes placed in each contract's underlying column
+    call_weights = np.zeros((len(underlyings), count))
+    call_weights[codes, np.arange(count)] = contracts['Shares'].to_numpy(dtype=float)
+    put_weights = np.zeros((len(underlyings), count))
+    put_weights[codes, np.arange(count)] = contracts['Put_Shares'].to_numpy(dtype=float)
+    # Per contract, along the axes: contract, spot shock, volatility shock, days forward
+    spot = contracts['Spot'].to_numpy(dtype=float)[:, None, None, None]
+    strike = contracts['Strike'].to_numpy(dtype=float)[:, None, None, None]
+    years = contracts['Years'].to_numpy(dtype=float)[:, None, None, None]
+    volatility = np.maximum(contracts['Volatility'].to_numpy(dtype=float)[:, None, None, None], MIN_VOLATILITY)
+
+    # Today's values and Greeks
+    base = {metric: weighted_sums(call_weights, values)
+            for metric, values in black_scholes_calls(spot, strike, years, volatility, rate).items()}
+    for metric, values in put_call_parity(spot, strike, years, rate).items():
+        base[metric] = base[metric] + weighted_sums(put_weights, values)
+    base = {metric: values.reshape(len(underlyings)) for metric, values in base.items()}
+
+    shape = (len(spot_shocks), len(vol_shocks), len(days))
+    grid_metrics = sorted({'value' if metric == 'pnl' else metric for metric in metrics})
+    shocked_spot = spot * (1 + spot_shocks)[None, :, None, None]
+    remaining_years = np.maximum(years - np.asarray(days, dtype=float)[None, None, None, :] / 365, 0)
+    shocked_volatility = np.maximum(volatility + vol_shocks[None, None, :, None], MIN_VOLATILITY)
+    totals = {metric: np.zeros((len(underlyings),) + shape) for metric in grid_metrics}
+    chunk = max(1, SCENARIO_CHUNK_ELEMENTS // max(1, int(np.prod(shape))))
+    for lo in range(0, count, chunk):
+        rows = slice(lo, lo + chunk)
+        values = black_scholes_calls(shocked_spot[rows], strike[rows], remaining_years[rows],
+                                     shocked_volatility[rows], rate, grid_metrics)
+        for metric in grid_metrics:
+            totals[metric] += weighted_sums(call_weights[:, rows], values[metric])
+    for metric, values in put_call_parity(shocked_spot, strike, remaining_years, rate, grid_metrics).items():
+        totals[metric] += weighted_sums(put_weights, values)
+
+    def grids(index):
+        result = {}
+        for metric in metrics:
+            if metric == 'pnl':
+                values = totals['value'][index].sum(axis=0) - base['value'][index].sum()
+            else:
+                values = totals[metric][index].sum(axis=0)
+            result[metric] = (values.round(4) + 0.0).tolist()  # + 0.0 drops negative zeros
+        return result
+
+    def summary(index):
+        return {metric: round(float(values[index].sum()), 4) + 0.0 for metric, values in base.items()}
+
+    return {
+        'as_of': today.isoformat(),
+        'rate': rate,
+        'axes': {'spot_shocks': spot_shocks.tolist(), 'vol_shocks': vol_shocks.tolist(),
+                 'days': np.asarray(days).tolist()},
+        'portfolio': {'contracts': count, 'today': summary(slice(None)), 'grid': grids(slice(None))},
+        'underlyings': {
+            symbol: {
+                'spot': float(market.at[symbol, 'Spot']),
+                'volatility': float(market.at[symbol, 'Volatility']),
+                'contracts': int((codes == i).sum()),
+                'today': summary(slice(i, i + 1)),
+                'grid': grids(slice(i, i + 1))
+            }
+            for i, symbol in enumerate(underlyings)
+        },
+        'missing_market_data': missing
+    }
+
+# Resampling engine: confidence bands for the final P&L, max drawdown and Sharpe ratio of
+# the closed trades, and their risk of ruin, from many resampled trade sequences. Paths
+# are built in vectorized batches, each with its own seed spawned from one SeedSequence,
+# so a run is reproducible whatever the number of worker processes.
+RESAMPLING_METHODS = ['bootstrap', 'montecarlo']
+RESAMPLING_PERCENTILES = [5, 25, 50, 75, 95]
+RESAMPLING_MAX_PATHS = 200000
+RESAMPLING_MAX_BLOCK = 1000  # trades
+RESAMPLING_MAX_DRAWS = 500_000_000  # paths x trades per request
+RESAMPLING_BATCH_ELEMENTS = 1 << 20  # trades x paths per batch
+# Requests of several batches spread them over the shared worker pool; 1 keeps them in the request
+RESAMPLING_WORKERS = int(os.environ.get('RESAMPLING_WORKERS', os.cpu_count() or 1))
+# Answered runs, by dataset, date range and parameters (default 4 MB)
+RESAMPLING_CACHE_MAX_BYTES = int(os.environ.get('RESAMPLING_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+
+def path_statistics(growth, valid, sums, ruin):
+    """
+    Final P&L, max drawdown, Sharpe ratio and ruin of trade sequences, one per row, with the
+    definitions of calculate_trading_analytics. growth is one plus each trade's daily return
+    (one for the trades without a return, which valid marks); sums are each sequence's P&L,
+    return count, return sum and sum of squared returns. A sequence is ruined when its
+    compounded returns lose the ruin fraction of their start.
+    """
+    final_pnl, count, total, total_squares = sums
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = (total_squares - count * mean * mean) / (count - 1)
+        volatility = np.sqrt(np.maximum(variance, 0))
+        sharpe = np.where((count > 1) & (volatility != 0), mean / volatility * 252 ** 0.5, 0.0)
+
+        equity = np.cumprod(growth, axis=1)
+        ruined = equity.min(axis=1, initial=1.0) <= 1 - ruin
+        # Peaks start at the first trade with a return; the trades without one repeat
+        # the previous value, so they do not change the deepest drawdown
+        peak = np.fmax.accumulate(np.where(valid, equity, np.nan), axis=1)
+        equity /= peak
+        drawdown = np.fmin.reduce(equity, axis=1) - 1
+    max_drawdown = np.where(count > 0, np.abs(np.nan_to_num(drawdown)) * final_pnl, 0.0)
+    return {'final_pnl': final_pnl, 'max_drawdown': max_drawdown, 'sharpe_ratio': sharpe, 'ruined': ruined}
+
+def trade_history(pnl, returns, block):
+    """
+    Prepare a closed-trade history for resampling in blocks: the per-trade growth and
+    validity, extended circularly by block - 1 trades so that a block starting at any
+    trade is a plain slice, and the P&L, return count, return sum and sum of squares of
+    the full block starting at every trade and of the shorter last block of a path.
+    """
+    count = len(pnl)
+    valid = ~np.isnan(returns)
+    returns = np.where(valid, returns, 0.0)
+    extend = lambda values: np.concatenate([values, values[:block - 1]])
+    tail = count - (-(-count // block) - 1) * block
+    block_sums, tail_sums = [], []
+    for values in (pnl, valid.astype(float), returns, returns * returns):
+        prefix = np.concatenate([[0.0], np.cumsum(extend(values))])
+        block_sums.append(prefix[block:block + count] - prefix[:count])
+        tail_sums.append(prefix[tail:tail + count] - prefix[:count])
+    return {'growth': extend(1 + returns), 'valid': extend(valid), 'block_sums': block_sums,
+            'tail_sums': tail_sums, 'count': count, 'block': block}
+
+def resample_batch(history, paths, seed, ruin):
+    """
+    Statistics of one batch of resampled paths, each as long as the history, made of
+    blocks of consecutive trades starting at random trades (wrapping around at the end).
+    Blocks keep runs of wins and losses together; blocks of one trade are independent draws.
+    """
+    rng = np.random.default_rng(seed)
+    count, block = history['count'], history['block']
+    starts = rng.integers(0, count, size=(paths, -(-count // block)))
+    rows = starts if block == 1 else (starts[:, :, None] + np.arange(block)).reshape(paths, -1)[:, :count]
+    sums = [full[starts[:, :-1]].sum(axis=1) + last[starts[:, -1]]
+            for full, last in zip(history['block_sums'], history['tail_sums'])]
+    return path_statistics(history['growth'][rows], history['valid'][rows], sums, ruin)
+
+@stage_timer('resampling')
+def calculate_resampling(ledger, start_date=None, end_date=None, method='bootstrap', paths=10000,
+                         block=None, seed=0, ruin=0.5):
+    """
+    Percentile bands of the final P&L, max drawdown and Sharpe ratio over resampled
+    sequences of the closed trades in the date window, the risk of ruin and the chance
+    of a loss. Batches run on a process pool when there are several.
+    """
+    lo, hi = ledger.closed_index.bounds(start_date, end_date)
+    trades = ledger.closed_trades.iloc[lo:hi]
+    pnl = trades['PnL'].to_numpy(dtype=float)
+    returns = trades['Return'].to_numpy(dtype=float)
+    count = len(pnl)
+    # Monte Carlo draws every trade independently: blocks of one
+    block = 1 if method == 'montecarlo' else max(1, min(block or round(count ** (1 / 3)), count))
+    result = {
+        'method': method,
+        'paths': paths,
+        'block_length': block,
+        'seed': seed,
+        'ruin_level': ruin,
+        'trades': count,
+        'percentiles': RESAMPLING_PERCENTILES
+    }
+    if count < 2:
+        return {**result, 'observed': {}, 'bands': {}, 'risk_of_ruin': None, 'probability_of_loss': None}
+
+    # The history itself is the path of the blocks starting at 0, block, 2 * block, ...
+    history = trade_history(pnl, returns, block)
+    in_order = np.arange(0, count, block)
+    observed = path_statistics(history['growth'][None, :count], history['valid'][None, :count],
+                               [full[in_order[:-1]].sum(keepdims=True) + last[in_order[-1:]]
+                                for full, last in zip(history['block_sums'], history['tail_sums'])], ruin)
+
+    # Batch sizes depend only on the history, so the seeds give the same paths on any pool
+    batch_paths = max(1, RESAMPLING_BATCH_ELEMENTS // count)
+    sizes = [min(batch_paths, paths - start) for start in range(0, paths, batch_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = max(1, min(RESAMPLING_WORKERS, len(sizes)))
+    if workers > 1:
+        batches = pool_map(resample_batch, [history] * len(sizes), sizes, seeds, [ruin] * len(sizes))
+    else:
+        batches = [resample_batch(history, size, batch_seed, ruin) for size, batch_seed in zip(sizes, seeds)]
+    statistics = {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+    return {
+        **result,
+        'observed': {name: float(values[0]) for name, values in observed.items() if name != 'ruined'},
+        'bands': {
+            name: dict(zip((f'p{percentile}' for percentile in RESAMPLING_PERCENTILES),
+                           np.percentile(values, RESAMPLING_PERCENTILES).round(4).tolist()))
+            for name, values in statistics.items() if name != 'ruined'
+        },
+        'risk_of_ruin': float(statistics['ruined'].mean()),
+        'probability_of_loss': float((statistics['final_pnl'] < 0).mean())
+    }
+
+# SQLite store (optional, TLG_SQLITE_STORE=1): every source (a data file, or the
+# consolidated view) is parsed once into a local SQLite database together with the
+# lots, complex trades and per-day totals derived from it. The dashboard, table,
+# trade legs, time series, alerts, period analytics, scenario and resampling
+# endpoints then read only the rows of the requested date range and symbol, so
+# their memory and latency follow the window rather than the length of the history.
+# The database is kept in the cache directory by default.
+SQLITE_STORE = os.environ.get('TLG_SQLITE_STORE', '0') == '1'
+SQLITE_STORE_PATH = os.environ.get('TLG_SQLITE_STORE_PATH', os.path.join(CACHE_DIRECTORY, 'trades.sqlite'))
+
+# Stored frames: the date column that windows their rows, and their indexed lookups
+# (each index leads with the source)
+STORE_TABLES = {
+    'account_info': (None, []),
+    'stock_transactions': ('Date', [['Date'], ['Symbol', 'Date']]),
+    'option_transactions': ('Date', [['Date'], ['Symbol', 'Expiration', 'Date']]),
+    'stock_positions': (None, [['Symbol']]),
+    'option_positions': (None, [['Symbol']]),
+    'closed_trades': ('Exit_Date', [['Exit_Date'], ['Symbol', 'Exit_Date']]),
+    'open_trades': ('Entry_Date', [['Entry_Date'], ['Symbol', 'Entry_Date']]),
+    'complex_trades': ('Open_Date', [['Open_Date'], ['Symbol', 'Open_Date']]),
+    'complex_trade_legs': (None, [['Trade_ID']]),
+    'daily_pnl': ('Date', [['Date']])
+}
+# The frames a dashboard page is built from; legs and the daily P&L are read on their own
+WINDOW_FRAMES = ['account_info', 'stock_transactions', 'option_transactions', 'stock_positions',
+                 'option_positions', 'closed_trades', 'open_trades', 'complex_trades']
+
+def quoted(name):
+    """Quote a table or column name for SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+def store_date(value, round_up=False):
+    """A date range bound as stored dates (YYYY-MM-DD text) compare; start bounds round up to a whole day."""
+    day = pd.to_datetime(value)
+    return (day.ceil('D') if round_up else day).strftime('%Y-%m-%d')
+
+def sql_values(series):
+    """Return a column's values for SQLite: dates as YYYY-MM-DD text, missing values as NULL."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # Transaction, lot and expiration dates are whole days
+        series = series.dt.strftime('%Y-%m-%d')
+    if series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+        return series.where(series.notna(), None).tolist()
+    return series.tolist()  # numbers and flags; SQLite stores NaN as NULL
+
+def typed_column(values, dtype):
+    """Restore the dtype a column had in the dataset from the values read back from SQLite."""
+    if dtype == 'object':
+        return values
+    if dtype == 'category':
+        return values.astype('category')
+    if dtype.startswith('datetime64'):
+        return pd.to_datetime(values, format='%Y-%m-%d')
+    return values.astype(dtype)
+
+def typed_frame(rows, columns):
+    """Return rows read from SQLite as a frame with the given {column: dtype} types."""
+    frame = pd.DataFrame(rows, columns=list(columns))
+    for column, dtype in columns.items():
+        frame[column] = typed_column(frame[column], dtype)
+    return frame
+
+def read_frame(db, sql, params, columns):
+    """Run a query and return its rows as a typed frame."""
+    return typed_frame(db.execute(sql, params).fetchall(), columns)
+
+def store_frames(dataset):
+    """Return the frames of a parsed dataset that are kept in the store, by table."""
+    frames = {name: dataset[name] for name in ['account_info', 'stock_transactions', 'stock_positions',
+                                                'option_positions', 'complex_trades', 'complex_trade_legs']
+              if name in dataset}
+    if 'trade_ledger' in dataset:
+        ledger = dataset['trade_ledger']
+        frames['option_transactions'] = ledger.fills
+        frames['closed_trades'] = ledger.closed_trades
+        frames['open_trades'] = ledger.open_trades
+        frames['daily_pnl'] = dataset['daily_pnl'].reset_index()
+    return frames
+
+def store_filter(source, name, columns, start_date=None, end_date=None, symbol=None):
+    """Return the WHERE clause and parameters selecting a source's rows of a table within a date range and symbol."""
+    clauses, params = ['Source = ?'], [source]
+    date_column = STORE_TABLES[name][0]
+    if date_column in columns:
+        if start_date:
+            clauses.append(f'{quoted(date_column)} >= ?')
+            params.append(store_date(start_date, round_up=True))
+        if end_date:
+            clauses.append(f'{quoted(date_column)} <= ?')
+            params.append(store_date(end_date))
+    if symbol and 'Symbol' in columns:
+        clauses.append('Symbol = ?')
+        params.append(symbol)
+    return ' AND '.join(clauses), params
+
+def store_order(name, columns, descending=False):
+    """
+    ORDER BY clause for a table's rows in dataset order. Windowed tables are stored in
+    date order, so that is their date index's order and the rows need no sorting.
+    """
+    direction = ' DESC' if descending else ''
+    date_column = STORE_TABLES[name][0]
+    if date_column in columns:
+        return f'{quoted(date_column)}{direction}, rowid{direction}'
+    return f'rowid{direction}'
+
+def window_dataset(dfs, consolidated=False, end_date=None):
+    """
+    Complete the frames read from the store for one window into a dataset, as build_trading_dataset does.
+    The closed lots may include those held past end_date, which count as open at the end of the window.
+    """
+    if 'option_transactions' in dfs:
+        ledger = indexed_ledger(dfs['option_transactions'], dfs.pop('closed_trades'), dfs.pop('open_trades'))
+        dfs['trade_ledger'] = ledger
+        dfs['trading_analytics'] = calculate_trading_analytics(ledger, None, end_date)
+        dfs['option_summary'] = calculate_option_summary(ledger, None, end_date)
+        if consolidated:
+            dfs['account_breakdown'] = calculate_account_breakdown(dfs, None, end_date)
+
+    if 'option_positions' in dfs:
+        dfs['option_positions_summary'] = calculate_option_positions_summary(dfs['option_positions'])
+        dfs['expiry_calendar'] = ExpiryCalendar(dfs['option_positions'])
+    dfs['window_views'] = {}
+    return dfs
+
+class TradeStore:
+    """
+    SQLite copy of the parsed datasets, one set of rows per source. A source is
+    rewritten in one transaction whenever its files change, and read back one
+    date range (and symbol) at a time within a read transaction, so readers in
+    any process see either the old rows or the new ones.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            db.execute('PRAGMA synchronous=NORMAL')
+            if not self._ready:
+                # Write-ahead logging lets pages be read while a source is rewritten
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('CREATE TABLE IF NOT EXISTS store_sources (Source TEXT PRIMARY KEY, Fingerprint TEXT)')
+                db.execute('CREATE TABLE IF NOT EXISTS store_frames (Source TEXT, Name TEXT, Columns TEXT, '
+                           'PRIMARY KEY (Source, Name))')
+                # Rows, amount and fees of the transactions per section, symbol and day
+                db.execute('CREATE TABLE IF NOT EXISTS daily_totals (Source TEXT, Section TEXT, Symbol TEXT, '
+                           'Date TEXT, Rows INTEGER, Amount REAL, Fee REAL)')
+                db.execute('CREATE INDEX IF NOT EXISTS daily_totals_Date ON daily_totals (Source, Section, Date)')
+                self._ready = True
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def snapshot(self):
+        """A connection reading one consistent state of the store."""
+        with self.connect() as db:
+            db.execute('BEGIN')
+            try:
+                yield db
+            finally:
+                db.execute('COMMIT')
+
+    def stored_fingerprint(self, source, db=None):
+        if db is None:
+            with self.connect() as db:
+                return self.stored_fingerprint(source, db)
+        row = db.execute('SELECT Fingerprint FROM store_sources WHERE Source = ?', (source,)).fetchone()
+        return row[0] if row else None
+
+    def stored_frames(self, db, source):
+        """Return the {column: dtype} of each frame stored for a source, by table."""
+        return {name: dict(json.loads(columns)) for name, columns in
+                db.execute('SELECT Name, Columns FROM store_frames WHERE Source = ?', (source,))}
+
+    def sync(self, source):
+        """
+        Bring a source up to date with its data files, parsing them only when they
+        have changed, and return the fingerprint of the stored rows.
+        """
+        key, loader = dataset_source(source)
+        fingerprint = repr(key)
+        if self.stored_fingerprint(source) != fingerprint:
+            with self._lock:
+                if self.stored_fingerprint(source) != fingerprint:
+                    self.write(source, fingerprint, loader())
+        return fingerprint
+
+    def write(self, source, fingerprint, dataset):
+        """Replace the rows of a source with those of its parsed dataset."""
+        frames = store_frames(dataset)
+        with self.connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                # Another process may have stored the same files meanwhile
+                if self.stored_fingerprint(source, db) != fingerprint:
+                    self.delete(db, source)
+                    for name, frame in frames.items():
+                        self.insert(db, source, name, frame)
+                    self.add_daily_totals(db, source, frames)
+                    db.execute('INSERT OR REPLACE INTO store_sources VALUES (?, ?)', (source, fingerprint))
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            db.execute('PRAGMA optimize')  # refresh the planner's statistics for the new rows
+
+    def delete(self, db, source):
+        for name in self.stored_frames(db, source):
+            db.execute(f'DELETE FROM {quoted(name)} WHERE Source = ?', (source,))
+        for table in ['store_frames', 'daily_totals', 'store_sources']:
+            db.execute(f'DELETE FROM {table} WHERE Source = ?', (source,))
+
+    def remove(self, source):
+        """Drop a source whose files are gone."""
+        with self.connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                self.delete(db, source)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+    def sources(self):
+        with self.connect() as db:
+            return [source for source, in db.execute('SELECT Source FROM store_sources ORDER BY Source')]
+
+    def insert(self, db, source, name, frame):
+        columns = list(frame.columns)
+        self.create_table(db, name, columns)
+        names = ', '.join(quoted(column) for column in ['Source'] + columns)
+        placeholders = ', '.join('?' * (len(columns) + 1))
+        values = [sql_values(frame[column]) for column in columns]
+        # Rows are inserted in dataset order, which their rowids keep
+        db.executemany(f'INSERT OR IGNORE INTO {quoted(name)} ({names}) VALUES ({placeholders})',
+                       zip([source] * len(frame), *values))
+        db.execute('INSERT INTO store_frames VALUES (?, ?, ?)',
+                   (source, name, json.dumps([[column, str(frame[column].dtype)] for column in columns])))
+
+    def create_table(self, db, name, columns):
+        """Create a table, or add the columns it is missing, with its indexes."""
+        table = quoted(name)
+        db.execute(f'CREATE TABLE IF NOT EXISTS {table} (Source TEXT NOT NULL)')
+        existing = {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+        for column in columns:
+            if column not in existing:
+                db.execute(f'ALTER TABLE {table} ADD COLUMN {quoted(column)}')
+                existing.add(column)
+        for index in STORE_TABLES[name][1]:
+            if all(column in existing for column in index):
+                db.execute(f'CREATE INDEX IF NOT EXISTS {quoted("_".join([name] + index))} ON {table} '
+                           f'({", ".join(quoted(column) for column in ["Source"] + index)})')
+        if name.endswith('_transactions') and 'ID' in existing:
+            # A transaction is stored once per source; rows without an ID are all kept
+            db.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {quoted(name + "_ID")} ON {table} (Source, ID) '
+                       f"WHERE trim(ID) != ''")
+
+    def add_daily_totals(self, db, source, frames):
+        """Materialize the per-day totals of the transactions as stored (after de-duplication)."""
+        for section in ['stock_transactions', 'option_transactions']:
+            if section not in frames or 'Date' not in frames[section].columns:
+                continue
+            columns = frames[section].columns
+            amount = 'sum(Amount)' if 'Amount' in columns else '0'
+            fee = 'sum(Fee)' if 'Fee' in columns else '0'
+            symbol = 'Symbol' if 'Symbol' in columns else 'NULL'
+            db.execute(f'INSERT INTO daily_totals SELECT Source, ?, {symbol}, Date, count(*), {amount}, {fee} '
+                       f'FROM {section} WHERE Source = ? GROUP BY {symbol}, Date', (section, source))
+
+    def frames(self, source, names, start_date=None, end_date=None, symbol=None, held=False):
+        """
+        Return the stored frames among names of a source within a date range and symbol, from one snapshot.
+        With held, the closed lots opened within the range and closed after its end are read too.
+        """
+        with self.snapshot() as db:
+            stored = self.stored_frames(db, source)
+            dfs = {}
+            for name in names:
+                if name in stored:
+                    where, params = store_filter(source, name, stored[name], start_date, end_date, symbol)
+                    if held and end_date and name == 'closed_trades':
+                        # Selected by entry date, as the open lots are
+                        held_where, held_params = store_filter(source, 'open_trades', stored[name], start_date,
+                                                               end_date, symbol)
+                        where = f'({where}) OR ({held_where} AND Exit_Date > ?)'
+                        params += held_params + [store_date(end_date)]
+                    columns = ', '.join(quoted(column) for column in stored[name])
+                    dfs[name] = read_frame(db, f'SELECT {columns} FROM {quoted(name)} WHERE {where} '
+                                               f'ORDER BY {store_order(name, stored[name])}', params, stored[name])
+        return dfs
+
+    def window(self, source, start_date=None, end_date=None, symbol=None):
+        """Return the dataset of a source reduced to a date range and symbol, reading only those rows."""
+        dfs = self.frames(source, WINDOW_FRAMES, start_date, end_date, symbol, held=True)
+        return window_dataset(dfs, consolidated=source == ALL_DATA_FILES, end_date=end_date)
+
+    def ledger(self, source, start_date=None, end_date=None):
+        """Return the TradeLedger of the fills and lots of a source within a date range, or None without options."""
+        dfs = self.frames(source, ['option_transactions', 'closed_trades', 'open_trades'], start_date, end_date)
+        if 'option_transactions' not in dfs:
+            return None
+        return indexed_ledger(dfs['option_transactions'], dfs['closed_trades'], dfs['open_trades'])
+
+    def table(self, source, name, symbol=None):
+        """Return the StoreTable of a displayed table of a source, or None if the source has no such table."""
+        with self.connect() as db:
+            stored = self.stored_frames(db, source).get(name)
+        if stored is None:
+            return None
+        return StoreTable(self, source, name, stored, symbol)
+
+    def complex_trade_legs(self, source, trade_id):
+        """Return the fills of one complex trade, or None if there is no such trade."""
+        with self.connect() as db:
+            stored = self.stored_frames(db, source).get('complex_trade_legs')
+            if stored is None:
+                return None
+            columns = ', '.join(quoted(column) for column in stored)
+            legs = read_frame(db, f'SELECT {columns} FROM complex_trade_legs WHERE Source = ? AND Trade_ID = ? '
+                                  f'ORDER BY rowid', [source, trade_id], stored)
+        return legs if len(legs) else None
+
+    def export_chunks(self, source, name, rows, start_date=None, end_date=None, symbol=None):
+        """
+        Yield a source's rows of a table within a date range and symbol, reading rows at
+        a time from one snapshot; at least one chunk is yielded, however few rows there are.
+        """
+        with self.snapshot() as db:
+            stored = self.stored_frames(db, source).get(name)
+            if stored is None:
+                yield pd.DataFrame()
+                return
+            where, params = store_filter(source, name, stored, start_date, end_date, symbol)
+            order = store_order(name, stored, descending=name == 'complex_trades')  # newest trades first, as shown
+            columns = ', '.join(quoted(column) for column in stored)
+            cursor = db.execute(f'SELECT {columns} FROM {quoted(name)} WHERE {where} ORDER BY {order}', params)
+            while True:
+                batch = cursor.fetchmany(rows)
+                yield typed_frame(batch, stored)
+                if len(batch) < rows:
+                    break
+
+    def daily_pnl(self, source):
+        """Return the daily P&L series of a source (one row per business day, whatever the number of trades)."""
+        with self.connect() as db:
+            stored = self.stored_frames(db, source).get('daily_pnl')
+            if stored is None:
+                return None
+            columns = ', '.join(quoted(column) for column in stored)
+            daily = read_frame(db, f'SELECT {columns} FROM daily_pnl WHERE Source = ? ORDER BY rowid', [source], stored)
+        return daily.set_index('Date')
+
+class StoreTable:
+    """
+    One displayed table of a source in the TradeStore, with the query interface of
+    TableIndex: the date range, search, sort order and page are all applied in SQL.
+    """
+
+    def __init__(self, store, source, name, stored, symbol=None):
+        self.store = store
+        self.source = source
+        self.name = name
+        self.stored = stored
+        self.symbol = symbol
+        self.columns = [column for column in TABLE_COLUMNS[name] if column in stored]
+
+    def count(self, db, start_date=None, end_date=None):
+        """Rows within the date range, from the per-day totals when the table has them."""
+        if self.name.endswith('_transactions') and 'Date' in self.stored:
+            columns = [column for column in ['Date', 'Symbol'] if column in self.stored]
+            where, params = store_filter(self.source, self.name, columns, start_date, end_date, self.symbol)
+            return db.execute(f'SELECT coalesce(sum(Rows), 0) FROM daily_totals WHERE Section = ? AND {where}',
+                              [self.name] + params).fetchone()[0]
+        where, params = store_filter(self.source, self.name, self.stored, start_date, end_date, self.symbol)
+        return db.execute(f'SELECT count(*) FROM {quoted(self.name)} WHERE {where}', params).fetchone()[0]
+
+    def query(self, start=0, length=10, sort_column=None, ascending=True, search=None,
+              start_date=None, end_date=None):
+        """Return (records_total, records_filtered, page) for one request, as TableIndex.query does."""
+        table = quoted(self.name)
+        where, params = store_filter(self.source, self.name, self.stored, start_date, end_date, self.symbol)
+        with self.store.snapshot() as db:
+            records_total = records_filtered = self.count(db, start_date, end_date)
+            if search:
+                text = " || char(9) || ".join(f"coalesce({quoted(column)}, '')" for column in self.columns)
+                where += f' AND instr(lower(char(9) || {text}), ?) > 0'
+                params = params + [search.lower()]
+                records_filtered = db.execute(f'SELECT count(*) FROM {table} WHERE {where}', params).fetchone()[0]
+
+            # Ties keep row order; descending reverses the whole order, as in memory
+            order = store_order(self.name, self.stored)
+            if sort_column in self.columns:
+                direction = 'ASC' if ascending else 'DESC'
+                order = f'{quoted(sort_column)} {direction}, rowid {direction}'
+            columns = {column: self.stored[column] for column in self.columns}
+            page = read_frame(db, f'SELECT {", ".join(map(quoted, columns))} FROM {table} WHERE {where} '
+                                  f'ORDER BY {order} LIMIT ? OFFSET ?',
+                              params + [length if length >= 0 else -1, start], columns)
+        return records_total, records_filtered, page
+
+trade_store = TradeStore(SQLITE_STORE_PATH)
+
+# Exports: the closed and open lots, complex trades, transactions and positions of a
+# data file and date range, streamed as CSV, JSON Lines or Parquet (with pyarrow
+# installed) in chunks of EXPORT_CHUNK_ROWS rows. Chunks are slices of the cached
+# frames, or with the SQLite store rows read a chunk at a time, so an export holds
+# one chunk in memory and starts sending before the last rows are read.
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORTS = ['closed_trades', 'open_trades', 'complex_trades', 'option_transactions', 'stock_transactions',
+           'option_positions', 'stock_positions']
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+if pyarrow is not None:
+    EXPORT_FORMATS['parquet'] = 'application/vnd.apache.parquet'
+
+def export_frame(trading_data, name, start_date=None, end_date=None):
+    """Return the rows of an export within the date range as a view of the dataset's frames (None if it has none)."""
+    ledger = trading_data.get('trade_ledger')
+    if name in ('closed_trades', 'open_trades', 'option_transactions'):
+        if ledger is None:
+            return None
+        if name == 'option_transactions':
+            return ledger.fills_between(start_date, end_date)
+        index = ledger.closed_index if name == 'closed_trades' else ledger.open_index
+        lo, hi = index.bounds(start_date, end_date)
+        return getattr(ledger, name).iloc[lo:hi]
+    if name == 'complex_trades':
+        return complex_trades_window(trading_data, start_date, end_date)
+    if name == 'stock_transactions' and name in trading_data:
+        return date_window(trading_data[name], start_date, end_date)
+    return trading_data.get(name)  # positions are a snapshot, whatever the date range
+
+def frame_chunks(frame, rows):
+    """Yield a frame in slices of rows, at least one (possibly empty)."""
+    if frame is None:
+        frame = pd.DataFrame()
+    for start in range(0, max(len(frame), 1), rows):
+        yield frame.iloc[start:start + rows]
+
+def export_chunks(source, name, start_date=None, end_date=None, symbol=None):
+    """Return an iterator over the rows of an export in chunks; the dataset is loaded before it is returned."""
+    if SQLITE_STORE:
+        trade_store.sync(source)
+        return trade_store.export_chunks(source, name, EXPORT_CHUNK_ROWS, start_date, end_date, symbol)
+    return frame_chunks(export_frame(load_trading_data(source), name, start_date, end_date), EXPORT_CHUNK_ROWS)
+
+def csv_export(chunks):
+    for number, chunk in enumerate(chunks):
+        yield chunk.to_csv(index=False, header=number == 0, date_format='%Y-%m-%d').encode()
+
+def jsonl_export(chunks):
+    for chunk in chunks:
+        yield ''.join(json.dumps(record) + '\n' for record in table_records(chunk)).encode()
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what is written to it until drained, for streaming a file writer's output."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def parquet_export(chunks):
+    """Write the chunks as the row groups of one Parquet file, sending each as soon as it is written."""
+    sink = ChunkSink()
+    writer = schema = None
+    for chunk in chunks:
+        if writer is not None and chunk.empty:
+            continue
+        # Categories differ from chunk to chunk, so text is written as plain strings
+        chunk = chunk.astype({column: object for column in chunk.columns
+                              if isinstance(chunk[column].dtype, pd.CategoricalDtype)})
+        if writer is None:
+            schema = pyarrow.Schema.from_pandas(chunk, preserve_index=False)
+            for i, field in enumerate(schema):
+                if chunk[field.name].dtype == object:
+                    schema = schema.set(i, pyarrow.field(field.name, pyarrow.string()))
+            writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        writer.write_table(pyarrow.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+EXPORT_WRITERS = {'csv': csv_export, 'jsonl': jsonl_export, 'parquet': parquet_export}
+
+# Background data watcher (optional): parses new and changed .tlg files as they
+# land in data/ and pre-computes the default view and the date presets
+DATA_WATCH = os.environ.get('DATA_WATCH', '0') == '1'
+DATA_WATCH_INTERVAL = float(os.environ.get('DATA_WATCH_INTERVAL', 2))  # polling period, seconds
+DATA_WATCH_DEBOUNCE = float(os.environ.get('DATA_WATCH_DEBOUNCE', 1))  # quiet time before a rebuild, seconds
+DATA_WATCH_POLL = os.environ.get('DATA_WATCH_POLL', '0') == '1'  # force polling, e.g. on network mounts
+
+# Preset windows of the date range selector, in days before today
+DATE_PRESET_DAYS = [7, 30, 90, 365]
+
+def date_presets(today=None):
+    """Return the (start_date, end_date) of the default view, year to date and every day preset."""
+    # The browser computes presets from UTC dates (toISOString)
+    today = today or datetime.now(timezone.utc).date()
+    end_date = today.isoformat()
+    presets = [(None, None), (today.replace(month=1, day=1).isoformat(), end_date)]
+    presets += [((today - timedelta(days=days)).isoformat(), end_date) for days in DATE_PRESET_DAYS]
+    return presets
+
+def prewarm_trading_data(filename, presets):
+    """Load a dataset into the cache and compute its date preset views."""
+    dataset = cached_trading_data(filename)
+    view = read_only_view(dataset)
+    views = {preset: calculate_window_view(view, *preset) for preset in presets}
+    # Replacing the value is atomic: requests see either the old or the new views
+    dataset['window_views'] = views
+
+def preload_trading_data():
+    """Parse every data file, and the consolidated view when there are several, with their date presets."""
+    available = get_available_data_files()
+    presets = date_presets()
+    for filename in available + ([ALL_DATA_FILES] if len(available) > 1 else []):
+        try:
+            prewarm_trading_data(filename, presets)
+        except Exception:
+            app.logger.exception('Could not preload %s', filename)
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+INOTIFY_EVENT = struct.Struct('iIII')
+
+def open_inotify(directory):
+    """Return an inotify descriptor watching directory, through libc. Raises OSError where inotify is not available."""
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if not hasattr(libc, 'inotify_init1'):
+        raise OSError('inotify is not available')
+    fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+        error = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(error, f'inotify_add_watch failed for {directory}')
+    return fd
+
+def inotify_changes(fd, timeout):
+    """
+    Yield the names of files changed in an inotify-watched directory. Events are collected
+    until the directory has been quiet for DATA_WATCH_DEBOUNCE seconds; an empty set is
+    yielded every timeout seconds without events.
+    """
+    try:
+        changed = set()
+        while True:
+            ready, _, _ = select.select([fd], [], [], DATA_WATCH_DEBOUNCE if changed else timeout)
+            if not ready:
+                yield changed
+                changed = set()
+                continue
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if name:
+                    changed.add(os.fsdecode(name))
+    finally:
+        os.close(fd)
+
+def polling_changes(directory, interval):
+    """Yield the names of .tlg files in directory whose fingerprint changed, every interval seconds."""
+    def fingerprints():
+        result = {}
+        for path in glob.glob(os.path.join(directory, '*.tlg')):
+            try:
+                result[os.path.basename(path)] = file_fingerprint(path)
+            except OSError:
+                pass  # deleted while listing
+        return result
+
+    known = fingerprints()
+    while True:
+        time.sleep(interval)
+        current = fingerprints()
+        yield {name for name in current.keys() | known.keys() if current.get(name) != known.get(name)}
+        known = current
+
+class DataWatcher(threading.Thread):
+    """
+    Background thread that watches the data directory and rebuilds the cached dataset
+    of every new or changed .tlg file off the request path. While a rebuild runs,
+    requests for that file are served its previous dataset.
+    """
+
+    def __init__(self, directory='data', on_change=None, preloaded=False):
+        super().__init__(name='data-watcher', daemon=True)
+        self.directory = directory
+        self.on_change = on_change  # called after the datasets of changed files were rebuilt
+        self.preloaded = preloaded  # the current files are already cached, with their presets
+
+    def changes(self):
+        if not DATA_WATCH_POLL:
+            try:
+                return inotify_changes(open_inotify(self.directory), DATA_WATCH_INTERVAL)
+            except OSError as e:
+                app.logger.info('inotify unavailable (%s), polling %s instead', e, self.directory)
+        return polling_changes(self.directory, DATA_WATCH_INTERVAL)
+
+    def run(self):
+        changes = self.changes()
+        presets = date_presets()
+        if not self.preloaded:
+            self.refresh(get_available_data_files(), presets)
+        for changed in changes:
+            # Presets move with the date, so every file is refreshed once a day
+            if date_presets() != presets:
+                presets = date_presets()
+                changed = set(get_available_data_files())
+            changed = {name for name in changed if name.endswith('.tlg')}
+            if changed:
+                self.refresh(changed, presets)
+                if self.on_change is not None:
+                    self.on_change()
+
+    def refresh(self, filenames, presets):
+        with data_refresh_lock:
+            self._refresh(filenames, presets)
+
+    def _refresh(self, filenames, presets):
+        available = get_available_data_files()
+        for filename in sorted(filenames):
+            if filename not in available:
+                continue
+            try:
+                prewarm_trading_data(filename, presets)
+            except Exception:
+                app.logger.exception('Could not pre-warm %s', filename)
+
+        # Keep the consolidated view current if anyone has been using it
+        if 'consolidated' in dataset_cache.sources() and len(available) > 1:
+            try:
+                prewarm_trading_data(ALL_DATA_FILES, presets)
+            except Exception:
+                app.logger.exception('Could not pre-warm the consolidated view')
+
+# Held while the watcher rebuilds datasets; a preloading server takes it before
+# forking so that no worker starts with a half-updated cache
+data_refresh_lock = threading.RLock()
+
+data_watcher = None
+
+def start_data_watcher():
+    """Start the background data watcher once per process."""
+    global data_watcher
+    if data_watcher is None:
+        data_watcher = DataWatcher()
+        data_watcher.start()
+    return data_watcher
+
+# Rendered dashboard pages, gzip-compressed, keyed by their ETag (default 64 MB)
+RENDERED_PAGE_CACHE_MAX_BYTES = int(os.environ.get('RENDERED_PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# The page also changes when the application or its template does
+PAGE_SOURCES = [__file__, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')]
+
+class PageCache:
+    """Process-level LRU cache of response bodies (compressed pages, scenario grids), bounded by a memory budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._pages = OrderedDict()  # etag -> gzip-compressed body
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag):
+        with self._lock:
+            page = self._pages.get(etag)
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(etag)
+            self.hits += 1
+            return page
+
+    def put(self, etag, page):
+        if len(page) > self.max_bytes:
+            return
+        with self._lock:
+            if etag in self._pages:
+                return
+            self._pages[etag] = page
+            self._size += len(page)
+            while self._size > self.max_bytes:
+                _, evicted = self._pages.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._pages),
+                    'size_bytes': self._size, 'max_bytes': self.max_bytes}
+
+page_cache = PageCache(RENDERED_PAGE_CACHE_MAX_BYTES)
+scenario_cache = PageCache(SCENARIO_CACHE_MAX_BYTES)
+resampling_cache = PageCache(RESAMPLING_CACHE_MAX_BYTES)
+
+def page_etag(fingerprint, available_files, selected_file, start_date, end_date):
+    """
+    Strong ETag of a dashboard page: the page depends only on the fingerprint of the
+    contents it was parsed from, the file list, the selected file and date range, the
+    current day (expiration alerts count days from today) and the application itself.
+    """
+    sources = [(os.path.getmtime(path), os.path.getsize(path)) for path in PAGE_SOURCES]
+    state = (fingerprint, available_files, selected_file, start_date or None, end_date or None,
+             datetime.now().date().isoformat(), sources)
+    return hashlib.blake2b(repr(state).encode(), digest_size=16).hexdigest()
+
+def dashboard_context(trading_data, available_files, selected_file, start_date, end_date, executor=None):
+    """
+    Complete a loaded dataset into the dashboard's template data for a date range.
+    With an executor the date range's calculations run on it concurrently and the
+    data holds their futures (pass a PendingContext to resolve them on use).
+    """
+    # Apply date filtering if parameters are provided
+    trading_data = apply_date_filter(trading_data, start_date, end_date, executor)
+
+    if 'expiry_calendar' in trading_data:
+        trading_data['expiration_alerts'] = trading_data['expiry_calendar'].alerts(datetime.now().date())
+
+    # Add the list of available files to the template context
+    trading_data['available_files'] = available_files
+    trading_data['selected_file'] = selected_file
+    trading_data['all_data_files'] = ALL_DATA_FILES
+
+    # Add complex option trades aggregation (the date filter has already added it for a date range)
+    if 'option_complex_trades' not in trading_data:
+        view = window_view(trading_data, keys=['option_complex_trades'], executor=executor)
+        trading_data['option_complex_trades'] = view.get('option_complex_trades', [])
+    return trading_data
+
+def render_dashboard(trading_data, available_files, selected_file, start_date, end_date):
+    """Render the dashboard for a loaded dataset and date range."""
+    trading_data = dashboard_context(trading_data, available_files, selected_file, start_date, end_date)
+    with stage_timer('render'):
+        return render_template('index.html', data=trading_data)
+
+# Streamed rendering (STREAM_PAGES=1): a page missing from the page cache is sent while
+# it renders. The page shell, account information and summary cards go out at once; the
+# date range's calculations run concurrently on a thread pool and each later section
+# follows as soon as the values it shows are ready.
+STREAM_PAGES = os.environ.get('STREAM_PAGES', '0') == '1'
+STREAM_RENDER_THREADS = int(os.environ.get('STREAM_RENDER_THREADS', 4))
+STREAM_CHUNK_BYTES = 64 * 1024  # larger output is sent without waiting for a stall
+
+render_executor = ThreadPoolExecutor(max_workers=STREAM_RENDER_THREADS, thread_name_prefix='render')
+
+class PendingContext(dict):
+    """
+    Template data whose values may be futures. Each future is resolved the first time
+    the template reads it; on_wait is called before blocking on one that is not done.
+    """
+
+    def __init__(self, values, on_wait=None):
+        super().__init__(values)
+        self.on_wait = on_wait
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, Future):
+            if not value.done() and self.on_wait is not None:
+                self.on_wait()
+            value = value.result()
+            self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+def stream_dashboard(trading_data, etag, compressed):
+    """
+    Render the dashboard on a background thread and yield it in chunks, gzip-compressed
+    if asked. What has been rendered is sent whenever the template has to wait for a
+    calculation, or once STREAM_CHUNK_BYTES accumulate. The completed page is added to
+    the page cache; a page that failed to render ends early and is not cached.
+    """
+    template = app.jinja_env.get_template('index.html')
+    context = {'data': trading_data}
+    app.update_template_context(context)
+    chunks = queue.Queue()
+    cancelled = threading.Event()
+    pending = []
+    pending_size = 0
+    page = []
+
+    def flush():
+        nonlocal pending_size
+        if pending:
+            chunks.put(''.join(pending))
+            pending.clear()
+            pending_size = 0
+
+    def render():
+        nonlocal pending_size
+        trading_data.on_wait = flush
+        try:
+            with stage_timer('render'):
+                for piece in template.generate(context):
+                    if cancelled.is_set():
+                        return
+                    pending.append(piece)
+                    pending_size += len(piece)
+                    page.append(piece)
+                    if pending_size >= STREAM_CHUNK_BYTES:
+                        flush()
+            flush()
+            page_cache.put(etag, gzip.compress(''.join(page).encode(), compresslevel=6))
+        except Exception:
+            app.logger.exception('Could not render the dashboard')
+            flush()
+        finally:
+            chunks.put(None)
+
+    threading.Thread(target=render, name='render-stream', daemon=True).start()
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compressed else None  # wbits 31: gzip format
+    try:
+        while (chunk := chunks.get()) is not None:
+            if compressor is None:
+                yield chunk.encode()
+            else:
+                yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        cancelled.set()  # the client went away, or the page is complete
+
+@app.route('/')
+def index():
+    # Get the requested file from query parameters, default to first available file
+    available_files = get_available_data_files()
+
+    # If no files exist, return empty dashboard
+    if not available_files:
+        empty_data = {
+            'available_files': [],
+            'selected_file': None,
+            'option_complex_trades': []
+        }
+        with stage_timer('render'):
+            return render_template('index.html', data=empty_data)
+
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+
+    # Get date range parameters
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    if SQLITE_STORE:
+        # Only the rows of the date range (and symbol) are read, from the store
+        symbol = request.args.get('symbol') or None
+        fingerprint = (trade_store.sync(selected_file), symbol)
+        load = lambda: trade_store.window(selected_file, start_date, end_date, symbol)
+        view_start, view_end = None, None  # the store has already applied the date range
+    else:
+        # The files' fingerprint is known without parsing them; the dataset is
+        # loaded (parsed once and cached while unchanged) only to render a page
+        fingerprint = dataset_source(selected_file)[0]
+        load = None
+        view_start, view_end = start_date, end_date
+
+    # Unchanged pages are answered with 304 Not Modified, or from the rendered page cache.
+    # Each encoding of the page is a separate representation with its own strong ETag.
+    etag = page_etag(fingerprint, available_files, selected_file, start_date, end_date)
+    compressed = 'gzip' in request.accept_encodings
+    representation = etag + '-gzip' if compressed else etag
+    headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains(representation):
+        response = app.response_class(status=304, headers=headers)
+        response.set_etag(representation)
+        return response
+
+    page = page_cache.get(etag)
+    if page is None and load is None:
+        dataset = cached_trading_data(selected_file)
+        load = lambda: read_only_view(dataset)
+        if dataset['fingerprint'] != fingerprint:
+            # The previous version was served while the file is re-parsed: tag the page with what it shows
+            etag = page_etag(dataset['fingerprint'], available_files, selected_file, start_date, end_date)
+            representation = etag + '-gzip' if compressed else etag
+            page = page_cache.get(etag)
+    if page is None and STREAM_PAGES:
+        trading_data = dashboard_context(PendingContext(load()), available_files, selected_file,
+                                         view_start, view_end, executor=render_executor)
+        # Not given an ETag: a page cut short by an error must not be revalidated as complete
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        return app.response_class(stream_dashboard(trading_data, etag, compressed), mimetype='text/html',
+                                  headers=headers)
+    if page is None:
+        html = render_dashboard(load(), available_files, selected_file, view_start, view_end)
+        page = gzip.compress(html.encode(), compresslevel=6)
+        page_cache.put(etag, page)
+
+    if compressed:
+        response = app.response_class(page, mimetype='text/html', headers={**headers, 'Content-Encoding': 'gzip'})
+    else:
+        response = app.response_class(gzip.decompress(page), mimetype='text/html', headers=headers)
+    response.set_etag(representation)
+    return response
+
+@app.cli.command('build-sidecars')
+@click.argument('directory', default='data')
+def build_sidecars(directory):
+    """Pre-build the columnar sidecar of every .tlg file in DIRECTORY, in the cache directory."""
+    for path in sorted(glob.glob(os.path.join(directory, '*.tlg'))):
+        if read_sidecar(path) is not None:
+            click.echo(f'{path}: up to date')
+            continue
+        signature = source_signature(path)
+        if write_sidecar(path, read_trading_sections(path), signature):
+            click.echo(f'{path}: built')
+        else:
+            click.echo(f'{path}: could not write sidecar', err=True)
+
+@app.cli.command('ingest-store')
+def ingest_store():
+    """Load every data file, and the consolidated view, into the SQLite store."""
+    available_files = sorted(get_available_data_files())
+    sources = available_files + ([ALL_DATA_FILES] if len(available_files) > 1 else [])
+    for source in trade_store.sources():
+        if source not in sources:
+            trade_store.remove(source)
+            click.echo(f'{source}: removed')
+    for source in sources:
+        previous = trade_store.stored_fingerprint(source)
+        status = 'up to date' if trade_store.sync(source) == previous else 'loaded'
+        click.echo(f'{source}: {status}')
+
+@app.cli.command('export')
+@click.argument('name', type=click.Choice(EXPORTS))
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'jsonl', 'parquet']), default='csv')
+@click.option('--data-file', help='data file, or "all" for the consolidated view (default: the first file)')
+@click.option('--start-date')
+@click.option('--end-date')
+@click.option('--symbol', help='only this symbol (with the SQLite store)')
+@click.option('--output', type=click.Path(dir_okay=False), help='file to write (default: standard output)')
+def export_command(name, export_format, data_file, start_date, end_date, symbol, output):
+    """Export NAME as CSV, JSON Lines or Parquet, with the filters of the dashboard."""
+    available_files = get_available_data_files()
+    if not available_files:
+        raise click.ClickException('No data files')
+    if export_format not in EXPORT_FORMATS:
+        raise click.ClickException('Parquet export requires pyarrow')
+    chunks = export_chunks(resolve_data_file(data_file, available_files), name, start_date, end_date, symbol)
+    file = open(output, 'wb') if output else click.get_binary_stream('stdout')
+    try:
+        for data in EXPORT_WRITERS[export_format](chunks):
+            file.write(data)
+    finally:
+        if output:
+            file.close()
+
+def date_range_args(args):
+    """Return the start_date and end_date query parameters (None when empty); ValueError if one is not a date."""
+    dates = []
+    for name in ['start_date', 'end_date']:
+        value = args.get(name) or None
+        if value is not None:
+            try:
+                valid = pd.notna(pd.to_datetime(value))
+            except (ValueError, OverflowError):
+                valid = False
+            if not valid:
+                raise ValueError(f'Invalid {name}: {value}')
+        dates.append(value)
+    return dates
+
+@app.route('/api/tables/<table>')
+def table_data(table):
+    """DataTables server-side processing endpoint for the transaction and position tables."""
+    available_files = get_available_data_files()
+    if table not in TABLE_COLUMNS or not available_files:
+        return jsonify({'error': f'Unknown table: {table}'}), 404
+
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+    draw = request.args.get('draw', 0, type=int)
+    try:
+        start_date, end_date = date_range_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if SQLITE_STORE:
+        # Paged, sorted and searched in SQL; only the requested page is read
+        trade_store.sync(selected_file)
+        index = trade_store.table(selected_file, table, request.args.get('symbol') or None)
+    else:
+        index = load_trading_data(selected_file).get('table_indexes', {}).get(table)
+    if index is None:
+        return jsonify({'draw': draw, 'recordsTotal': 0, 'recordsFiltered': 0, 'data': []})
+
+    sort_column = None
+    column_number = request.args.get('order[0][column]', type=int)
+    if column_number is not None and 0 <= column_number < len(index.columns):
+        sort_column = index.columns[column_number]
+
+    records_total, records_filtered, page = index.query(
+        start=max(request.args.get('start', 0, type=int), 0),
+        length=request.args.get('length', 10, type=int),
+        sort_column=sort_column,
+        ascending=request.args.get('order[0][dir]', 'asc') != 'desc',
+        search=request.args.get('search[value]'),
+        start_date=start_date,
+        end_date=end_date
+    )
+    return jsonify({
+        'draw': draw,
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': table_records(page)
+    })
+
+@app.route('/api/complex-trades/<int:trade_id>/legs')
+def complex_trade_legs_data(trade_id):
+    """Legs (fills) of one complex trade, for the trade details modal."""
+    available_files = get_available_data_files()
+    if not available_files:
+        return jsonify({'error': 'No data files'}), 404
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+    if SQLITE_STORE:
+        trade_store.sync(selected_file)
+        legs = trade_store.complex_trade_legs(selected_file, trade_id)
+    else:
+        legs = complex_trade_legs(load_trading_data(selected_file), trade_id)
+    if legs is None:
+        return jsonify({'error': f'Unknown trade: {trade_id}'}), 404
+    columns = ['ID', 'Date', 'Time', 'Symbol', 'Description', 'Expiration', 'Strike', 'Type', 'Action',
+               'Quantity', 'Price', 'Amount', 'Fee']
+    return jsonify({'trade_id': trade_id, 'legs': table_records(legs[[c for c in columns if c in legs.columns]])})
+
+def dataset_version(fingerprint):
+    """Short identifier of the file contents a dataset was parsed from."""
+    return hashlib.blake2b(repr(fingerprint).encode(), digest_size=8).hexdigest()
+
+@app.route('/api/alerts')
+def alerts_data():
+    """
+    Expiration alerts of the selected file for polling. The response carries a cursor;
+    passed back as ?cursor=, only the alerts added or changed since then are returned,
+    with the ids of those that were removed. Alerts only change with the data or the day.
+    """
+    available_files = get_available_data_files()
+    if not available_files:
+        return jsonify({'error': 'No data files'}), 404
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+    if SQLITE_STORE:
+        # Only the option positions are read
+        fingerprint = trade_store.sync(selected_file)
+        calendar = ExpiryCalendar(trade_store.frames(selected_file, ['option_positions']).get('option_positions'))
+    else:
+        dataset = cached_trading_data(selected_file)
+        fingerprint = dataset.get('fingerprint')
+        calendar = dataset.get('expiry_calendar') or ExpiryCalendar(None)
+
+    today = datetime.now().date()
+    version = dataset_version(fingerprint)
+    cursor = f'{version}.{today:%Y%m%d}'
+    response = {'cursor': cursor, 'counts': calendar.counts(today), 'full': False, 'alerts': [], 'removed': []}
+
+    since = request.args.get('cursor', '')
+    if since == cursor:
+        return jsonify(response)
+
+    alerts = calendar.alerts(today)
+    since_version, _, since_day = since.partition('.')
+    try:
+        since_day = datetime.strptime(since_day, '%Y%m%d').date()
+    except ValueError:
+        since_day = None
+    if since_version != version or since_day is None:
+        # Unknown cursor or different data: send everything
+        response.update(full=True, alerts=alerts)
+        return jsonify(response)
+
+    # Same data on another day: the old alerts are the calendar's alerts of that day
+    previous = {alert['id']: alert for alert in calendar.alerts(since_day)}
+    current_ids = {alert['id'] for alert in alerts}
+    response['alerts'] = [alert for alert in alerts if previous.get(alert['id']) != alert]
+    response['removed'] = [alert_id for alert_id in previous if alert_id not in current_ids]
+    return jsonify(response)
+
+@app.route('/api/timeseries')
+def timeseries_data():
+    """
+    Equity curve, drawdown and rolling Sharpe, volatility, win rate and drawdown for charting.
+    Query parameters: data_file, start_date, end_date, frequency (D, W or M) and
+    windows (comma-separated rolling window lengths in periods, default 20,60,252).
+    """
+    available_files = get_available_data_files()
+    if not available_files:
+        return jsonify({'error': 'No data files'}), 404
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+
+    frequency = request.args.get('frequency', 'D').upper()
+    if frequency not in TIMESERIES_FREQUENCIES:
+        return jsonify({'error': f'Unknown frequency: {frequency}'}), 400
+    try:
+        windows = [int(window) for window in request.args.get('windows', '').split(',') if window.strip()]
+    except ValueError:
+        return jsonify({'error': 'windows must be comma-separated integers'}), 400
+    if any(window < 1 for window in windows):
+        return jsonify({'error': 'windows must be positive'}), 400
+
+    if SQLITE_STORE:
+        # The daily series has one row per business day, however many trades there are
+        trade_store.sync(selected_file)
+        trading_data = {'daily_pnl': trade_store.daily_pnl(selected_file)}
+    else:
+        trading_data = load_trading_data(selected_file)
+    return jsonify(calculate_timeseries(trading_data, request.args.get('start_date'),
+                                        request.args.get('end_date'), frequency, windows or TIMESERIES_WINDOWS))
+
+def parse_windows(text):
+    """Parse comma-separated start:end date pairs (either side may be empty) into labels and windows."""
+    labels, windows = [], []
+    for item in text.split(','):
+        start, separator, end = item.strip().partition(':')
+        if not separator:
+            raise ValueError(f'Invalid window: {item}')
+        labels.append(item.strip())
+        windows.append(tuple(pd.to_datetime(bound) if bound.strip() else None for bound in (start, end)))
+    return labels, windows
+
+@app.route('/api/analytics/periods')
+def period_analytics_data():
+    """
+    Trading analytics of every period of the date range, or of explicit windows, in one pass.
+    Query parameters: data_file, start_date, end_date, and frequency (W, M, Q or Y, default M)
+    or windows (comma-separated start:end date pairs; an empty side is open). Returns tidy
+    tables joined on period: periods (one row per window), type_stats, holding_period_stats,
+    best_trades and worst_trades.
+    """
+    available_files = get_available_data_files()
+    if not available_files:
+        return jsonify({'error': 'No data files'}), 404
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+
+    frequency = None
+    if request.args.get('windows'):
+        try:
+            labels, windows = parse_windows(request.args['windows'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # The range spanned by the windows, open on a side any of them is open on
+        starts, ends = [start for start, _ in windows], [end for _, end in windows]
+        start_date = None if None in starts else min(starts)
+        end_date = None if None in ends else max(ends)
+    else:
+        frequency = request.args.get('frequency', 'M').upper()
+        if frequency not in ANALYTICS_PERIODS:
+            return jsonify({'error': f'Unknown frequency: {frequency}'}), 400
+        start_date, end_date = request.args.get('start_date') or None, request.args.get('end_date') or None
+
+    if SQLITE_STORE:
+        # Only the fills and lots of the range are read
+        trade_store.sync(selected_file)
+        ledger = trade_store.ledger(selected_file, start_date, end_date)
+    else:
+        ledger = load_trading_data(selected_file).get('trade_ledger')
+    if frequency is not None:
+        labels, windows = [], []
+        if ledger is not None:
+            labels, windows = period_windows(ledger, frequency, start_date, end_date)
+    if len(windows) > ANALYTICS_MAX_WINDOWS:
+        return jsonify({'error': f'At most {ANALYTICS_MAX_WINDOWS} windows per request'}), 400
+
+    if ledger is None:
+        tables = dict.fromkeys(['periods', 'type_stats', 'holding_period_stats', 'best_trades', 'worst_trades'], [])
+    else:
+        tables = {name: table_records(table) for name, table in
+                  calculate_period_analytics(ledger, labels, windows).items()}
+    return jsonify({'frequency': frequency, **tables})
+
+@app.route('/api/export/<name>')
+def export_data(name):
+    """
+    Download the rows of an export (see EXPORTS) as format=csv (default), jsonl or parquet,
+    streamed while they are read. Query parameters: data_file, start_date and end_date as
+    for the dashboard, and symbol with the SQLite store.
+    """
+    available_files = get_available_data_files()
+    if name not in EXPORTS or not available_files:
+        return jsonify({'error': f'Unknown export: {name}'}), 404
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format == 'parquet' and pyarrow is None:
+        return jsonify({'error': 'Parquet export requires pyarrow'}), 400
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown format: {export_format}'}), 400
+
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+    chunks = export_chunks(selected_file, name, request.args.get('start_date'), request.args.get('end_date'),
+                           request.args.get('symbol') or None)
+    headers = {'Content-Disposition': f'attachment; filename="{name}.{export_format}"'}
+    return app.response_class(EXPORT_WRITERS[export_format](chunks), mimetype=EXPORT_FORMATS[export_format],
+                              headers=headers)
+
+@app.route('/api/scenarios')
+def scenarios_data():
+    """
+    Black-Scholes scenario grid of the open option positions, per underlying and for the portfolio.
+    Query parameters: data_file; spot_shocks, vol_shocks and days, each as first:last:count
+    or comma-separated values; metrics (comma-separated, from value, pnl, delta, gamma,
+    vega and theta; default pnl).
+    """
+    available_files = get_available_data_files()
+    if not available_files:
+        return jsonify({'error': 'No data files'}), 404
+    market = load_market_data()
+    if market is None:
+        return jsonify({'error': f'No market data file: {MARKET_DATA_FILE}'}), 404
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+
+    metrics = [metric.strip() for metric in request.args.get('metrics', 'pnl').split(',') if metric.strip()]
+    unknown = [metric for metric in metrics if metric not in SCENARIO_METRICS]
+    if unknown or not metrics:
+        return jsonify({'error': f'metrics must be among {", ".join(SCENARIO_METRICS)}'}), 400
+    try:
+        axes = {name: scenario_axis(request.args.get(name), default) for name, default in SCENARIO_AXES.items()}
+    except ValueError:
+        return jsonify({'error': 'axes must be first:last:count or comma-separated numbers'}), 400
+    if not all(np.isfinite(axis).all() for axis in axes.values()):
+        return jsonify({'error': 'axes must be finite'}), 400
+    if (axes['spot_shocks'] <= -1).any() or (axes['days'] < 0).any():
+        return jsonify({'error': 'spot shocks must be above -1 and days forward not negative'}), 400
+    if np.prod([len(axis) for axis in axes.values()]) > SCENARIO_MAX_POINTS:
+        return jsonify({'error': f'at most {SCENARIO_MAX_POINTS} grid points'}), 400
+
+    if SQLITE_STORE:
+        # Only the option positions are read, and only when the grid is not cached
+        fingerprint = trade_store.sync(selected_file)
+        load = lambda: trade_store.frames(selected_file, ['option_positions'])
+    else:
+        dataset = cached_trading_data(selected_file)
+        fingerprint = dataset.get('fingerprint')
+        load = lambda: dataset
+
+    # A panel re-requesting the same grid gets the answer already computed
+    today = datetime.now().date()
+    state = (fingerprint, market.attrs.get('fingerprint'), RISK_FREE_RATE, today, metrics,
+             [axis.tolist() for axis in axes.values()])
+    key = hashlib.blake2b(repr(state).encode(), digest_size=16).hexdigest()
+    body = scenario_cache.get(key)
+    if body is None:
+        body = app.json.dumps(calculate_scenarios(load(), market, axes['spot_shocks'], axes['vol_shocks'],
+                                                  axes['days'], metrics, today=today)).encode()
+        scenario_cache.put(key, body)
+    return app.response_class(body, mimetype='application/json')
+
+@app.route('/api/resampling')
+def resampling_data():
+    """
+    Bootstrap or Monte Carlo confidence bands for the final P&L, max drawdown and Sharpe ratio.
+    Query parameters: data_file, start_date, end_date, method (bootstrap or montecarlo),
+    paths (default 10000), block (bootstrap block length in trades), seed (default 0)
+    and ruin (the loss of the compounded returns counted as ruin, default 0.5).
+    """
+    available_files = get_available_data_files()
+    if not available_files:
+        return jsonify({'error': 'No data files'}), 404
+    selected_file = resolve_data_file(request.args.get('data_file'), available_files)
+
+    method = request.args.get('method', 'bootstrap').lower()
+    if method not in RESAMPLING_METHODS:
+        return jsonify({'error': f'Unknown method: {method}'}), 400
+    try:
+        paths = int(request.args.get('paths', 10000))
+        block = int(request.args['block']) if request.args.get('block') else None
+        seed = int(request.args.get('seed', 0))
+        ruin = float(request.args.get('ruin', 0.5))
+    except ValueError:
+        return jsonify({'error': 'paths, block and seed must be integers and ruin a number'}), 400
+    if not 1 <= paths <= RESAMPLING_MAX_PATHS:
+        return jsonify({'error': f'paths must be between 1 and {RESAMPLING_MAX_PATHS}'}), 400
+    if (block is not None and not 1 <= block <= RESAMPLING_MAX_BLOCK) or seed < 0 or not 0 < ruin < 1:
+        return jsonify({'error': f'block must be between 1 and {RESAMPLING_MAX_BLOCK}, seed not negative '
+                                 'and ruin between 0 and 1'}), 400
+
+    start_date, end_date = request.args.get('start_date') or None, request.args.get('end_date') or None
+    if SQLITE_STORE:
+        # Only the fills and lots of the date range are read
+        fingerprint = trade_store.sync(selected_file)
+        ledger = trade_store.ledger(selected_file, start_date, end_date)
+    else:
+        dataset = cached_trading_data(selected_file)
+        fingerprint = dataset.get('fingerprint')
+        ledger = dataset.get('trade_ledger')
+    if ledger is None:
+        return jsonify({'error': 'No option trades'}), 404
+    lo, hi = ledger.closed_index.bounds(start_date, end_date)
+    if paths * (hi - lo) > RESAMPLING_MAX_DRAWS:
+        return jsonify({'error': f'{paths} paths of {hi - lo} trades is too many; ask for fewer paths '
+                                 'or a shorter date range'}), 400
+    state = (fingerprint, start_date, end_date, method, paths, block, seed, ruin)
+    key = hashlib.blake2b(repr(state).encode(), digest_size=16).hexdigest()
+    body = resampling_cache.get(key)
+    if body is None:
+        body = app.json.dumps(calculate_resampling(ledger, start_date, end_date, method, paths,
+                                                   block, seed, ruin)).encode()
+        resampling_cache.put(key, body)
+    return app.response_class(body, mimetype='application/json')
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify({**dataset_cache.stats(), 'rendered_pages': page_cache.stats(), 'scenarios': scenario_cache.stats(),
+                    'resampling': resampling_cache.stats()})
+
+@app.route('/api/cache/memory')
+def cache_memory():
+    """Memory report of every cached dataset: rows and bytes per table and column."""
+    report = {}
+    for key, dataset in dataset_cache.datasets():
+        tables = memory_report(dataset)
+        report[os.path.basename(key[0])] = {
+            'bytes': sum(table['bytes'] for table in tables.values()),
+            'tables': tables
+        }
+    return jsonify(report)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def add_server_timing(response):
+    """Report the request's stage timings, in milliseconds, in a Server-Timing header."""
+    total = time.perf_counter() - g.request_start
+    timings = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in g.get('stage_timings', {}).items()]
+    response.headers['Server-Timing'] = ', '.join(timings + [f'total;dur={total * 1000:.1f}'])
+    if METRICS_ENABLED:
+        request_latency.observe(request.endpoint or 'unknown', total)
+    return response
+
+def dataset_rows(dataset):
+    """Return the row count of each table of a dataset."""
+    rows = {}
+    for name, value in dataset.items():
+        if isinstance(value, pd.DataFrame):
+            rows[name] = len(value)
+        elif isinstance(value, TradeLedger):
+            rows['closed_trades'] = len(value.closed_trades)
+            rows['open_trades'] = len(value.open_trades)
+    return rows
+
+def process_memory():
+    """Return (resident, virtual) memory of this process in bytes, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as file:
+            pages = file.read().split()
+    except OSError:
+        return None
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    return int(pages[1]) * page_size, int(pages[0]) * page_size
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: stage and request latencies, dataset rows, cache stats and process memory."""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled (set METRICS_ENABLED=1)'}), 404
+
+    lines = stage_latency.render() + request_latency.render()
+
+    lines += ['# HELP tlg_dataset_rows Rows in each table of the cached datasets.', '# TYPE tlg_dataset_rows gauge']
+    for key, dataset in dataset_cache.datasets():
+        source = metric_label(os.path.basename(key[0]))
+        for table, count in sorted(dataset_rows(dataset).items()):
+            lines.append(f'tlg_dataset_rows{{source="{source}",table="{table}"}} {count}')
+
+    stats = dataset_cache.stats()
+    for name in ['hits', 'stale_hits', 'misses', 'evictions']:
+        lines += [f'# TYPE tlg_dataset_cache_{name}_total counter', f'tlg_dataset_cache_{name}_total {stats[name]}']
+    for name in ['entries', 'size_bytes', 'max_bytes']:
+        lines += [f'# TYPE tlg_dataset_cache_{name} gauge', f'tlg_dataset_cache_{name} {stats[name]}']
+
+    pages = page_cache.stats()
+    for name in ['hits', 'misses']:
+        lines += [f'# TYPE tlg_page_cache_{name}_total counter', f'tlg_page_cache_{name}_total {pages[name]}']
+    for name in ['entries', 'size_bytes']:
+        lines += [f'# TYPE tlg_page_cache_{name} gauge', f'tlg_page_cache_{name} {pages[name]}']
+
+    memory = process_memory()
+    if memory is not None:
+        lines += ['# TYPE process_resident_memory_bytes gauge', f'process_resident_memory_bytes {memory[0]}',
+                  '# TYPE process_virtual_memory_bytes gauge', f'process_virtual_memory_bytes {memory[1]}']
+    # ru_maxrss is in kilobytes on Linux
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    lines += ['# TYPE process_max_resident_memory_bytes gauge', f'process_max_resident_memory_bytes {max_rss}',
+              '# TYPE process_cpu_seconds_total counter', f'process_cpu_seconds_total {time.process_time():.3f}']
 
-    return render_template('index.html', data=trading_data)
+    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 if __name__ == '__main__':
+    # With the debug reloader, only the child process that serves requests watches
+    if DATA_WATCH and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_data_watcher()
     # Use 0.0.0.0 to make the server externally visible
     app.run(host='0.0.0.0', port=5000, debug=True)
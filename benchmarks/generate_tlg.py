@@ -0,0 +1,146 @@
+"""
+Deterministic synthetic .tlg generator for benchmarks.
+
+Writes an account with stock transactions, option transactions built from single
+legs and multi-leg structures (verticals, straddles, strangles, iron condors,
+calendars and diagonals), partial fills, and stock and option positions. The same
+settings and seed always produce the same file.
+
+    python benchmarks/generate_tlg.py data/synthetic.tlg --rows 100000
+"""
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+BASE_SYMBOLS = ['AAPL', 'MSFT', 'GOOG', 'AMZN', 'TSLA', 'SPY', 'QQQ', 'IWM', 'NVDA', 'META',
+                'AMD', 'NFLX', 'DIS', 'BA', 'JPM', 'XOM', 'KO', 'PEP', 'WMT', 'COST']
+
+# Multi-leg structures: (name, legs as (type, strike offset in steps, expiry index, side))
+# where side +1 buys and -1 sells to open
+STRUCTURES = [
+    ('vertical', [('C', 0, 0, 1), ('C', 1, 0, -1)]),
+    ('put_vertical', [('P', 0, 0, -1), ('P', -1, 0, 1)]),
+    ('straddle', [('C', 0, 0, 1), ('P', 0, 0, 1)]),
+    ('strangle', [('C', 1, 0, -1), ('P', -1, 0, -1)]),
+    ('iron_condor', [('P', -2, 0, 1), ('P', -1, 0, -1), ('C', 1, 0, -1), ('C', 2, 0, 1)]),
+    ('calendar', [('C', 0, 0, -1), ('C', 0, 1, 1)]),
+    ('diagonal', [('P', 0, 0, -1), ('P', -1, 1, 1)]),
+]
+
+def symbol_names(count):
+    """Return count ticker symbols, inventing names beyond the built-in list."""
+    return BASE_SYMBOLS[:count] + [f'SYM{i:03d}' for i in range(max(0, count - len(BASE_SYMBOLS)))]
+
+def split_quantity(rng, quantity, partial_fill_rate):
+    """Split an order quantity into one or more fills."""
+    if quantity < 2 or rng.random() >= partial_fill_rate:
+        return [quantity]
+    parts = rng.randint(2, min(3, quantity))
+    cuts = sorted(rng.sample(range(1, quantity), parts - 1))
+    return [b - a for a, b in zip([0] + cuts, cuts + [quantity])]
+
+def option_description(symbol, expiry, strike, option_type):
+    return f'{symbol} {expiry:%d%b%y}'.upper() + f' {strike:g} {option_type}'
+
+def generate(rows=1000, symbols=5, expiry_spread=60, partial_fill_rate=0.2, multi_leg_rate=0.3,
+             close_rate=0.8, start=date(2024, 1, 2), days=365, seed=1):
+    """Return the lines of a synthetic .tlg file with about rows option transactions."""
+    rng = random.Random(seed)
+    names = symbol_names(symbols)
+    prices = {symbol: rng.choice([50, 100, 150, 200, 400]) for symbol in names}
+    fills = []  # (timestamp, symbol, description, action, status, quantity, price)
+
+    def add_fills(when, symbol, description, action, status, quantity, price):
+        for offset, part in enumerate(split_quantity(rng, quantity, partial_fill_rate)):
+            fills.append((when + timedelta(seconds=offset), symbol, description, action, status, part, price))
+
+    while len(fills) < rows:
+        symbol = rng.choice(names)
+        opened = datetime.combine(start + timedelta(days=rng.randrange(days)), datetime.min.time())
+        opened += timedelta(hours=9, minutes=30 + rng.randrange(390), seconds=rng.randrange(60))
+        expiries = sorted(opened.date() + timedelta(days=rng.randint(1, expiry_spread)) for _ in range(2))
+        if expiries[0] == expiries[1]:
+            expiries[1] += timedelta(days=7)
+        step = max(1, prices[symbol] // 20)
+        quantity = rng.randint(1, 10)
+
+        if rng.random() < multi_leg_rate:
+            _, legs = rng.choice(STRUCTURES)
+        else:
+            legs = [(rng.choice('PC'), rng.randint(-2, 2), 0, rng.choice([1, -1]))]
+
+        for number, (option_type, offset, expiry_index, side) in enumerate(legs):
+            expiry = expiries[expiry_index]
+            strike = prices[symbol] + offset * step
+            description = option_description(symbol, expiry, strike, option_type)
+            when = opened + timedelta(seconds=5 * number)
+            price = round(rng.uniform(0.1, 8), 2)
+            add_fills(when, symbol, description, 'BUYTOOPEN' if side > 0 else 'SELLTOOPEN', 'O', side * quantity, price)
+
+            # Close all or part of the leg before it expires
+            if rng.random() < close_rate:
+                held = (expiry - opened.date()).days
+                closed = opened + timedelta(days=rng.randint(0, held), hours=rng.randint(0, 5))
+                closed_quantity = quantity if rng.random() < 0.8 else rng.randint(1, quantity)
+                price = round(max(0.01, price * rng.uniform(0.2, 1.8)), 2)
+                add_fills(closed, symbol, description, 'SELLTOCLOSE' if side > 0 else 'BUYTOCLOSE', 'C',
+                          -side * closed_quantity, price)
+
+    fills.sort(key=lambda fill: fill[0])
+    lines = ['ACCOUNT_INFORMATION', 'ACT_INF|U0000001|Synthetic Account|Individual|1 Main St|New York NY', '',
+             'STOCK_TRANSACTIONS']
+    for number in range(max(1, rows // 10)):
+        symbol = rng.choice(names)
+        when = start + timedelta(days=rng.randrange(days))
+        quantity = rng.choice([10, 50, 100]) * rng.choice([1, -1])
+        price = round(prices[symbol] * rng.uniform(0.8, 1.2), 2)
+        action = 'BUYTOOPEN' if quantity > 0 else 'SELLTOCLOSE'
+        lines.append(f'STK_TRD|{500000000 + number}|{symbol}|{symbol} STOCK|NYSE|{action}|O|{when:%Y%m%d}|'
+                     f'10:00:00|USD|{quantity}|1|{price}|{round(quantity * price, 2)}|-1.0')
+
+    lines.append('OPTION_TRANSACTIONS')
+    for number, (when, symbol, description, action, status, quantity, price) in enumerate(fills):
+        amount = round(quantity * price * 100, 2)
+        fee = round(-0.65 * abs(quantity), 4)
+        lines.append(f'OPT_TRD|{number + 1}|{symbol}|{description}|CBOE|{action}|{status}|{when:%Y%m%d}|'
+                     f'{when:%H:%M:%S}|USD|{quantity}|100|{price}|{amount}|{fee}')
+
+    as_of = start + timedelta(days=days)
+    lines.append('STOCK_POSITIONS')
+    for symbol in names[:5]:
+        lines.append(f'STK_LOT|U0000001|{symbol}|{symbol} STOCK|USD||{as_of:%Y%m%d}|100|1|{prices[symbol]}|'
+                     f'{prices[symbol] * 100}')
+    lines.append('OPTION_POSITIONS')
+    for _ in range(max(5, min(200, rows // 1000))):
+        symbol = rng.choice(names)
+        expiry = as_of + timedelta(days=rng.randint(-3, expiry_spread))
+        quantity = rng.choice([1, 2, -1, -2])
+        description = option_description(symbol, expiry, prices[symbol], rng.choice('PC'))
+        lines.append(f'OPT_LOT|U0000001|{symbol}|{description}|USD||{as_of:%Y%m%d}|{quantity}|'
+                     f'{quantity * 100}|1.5|{-quantity * 150}')
+    lines.append('EOF')
+    return lines
+
+def write_tlg(path, **settings):
+    """Write a synthetic .tlg file to path."""
+    with open(path, 'w') as file:
+        file.write('\n'.join(generate(**settings)) + '\n')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', help='output .tlg file')
+    parser.add_argument('--rows', type=int, default=1000, help='option transactions to generate')
+    parser.add_argument('--symbols', type=int, default=5, help='number of underlyings')
+    parser.add_argument('--expiry-spread', type=int, default=60, help='maximum days from open to expiry')
+    parser.add_argument('--partial-fill-rate', type=float, default=0.2, help='share of orders split into fills')
+    parser.add_argument('--multi-leg-rate', type=float, default=0.3, help='share of trades with several legs')
+    parser.add_argument('--close-rate', type=float, default=0.8, help='share of legs closed before expiry')
+    parser.add_argument('--days', type=int, default=365, help='days of history')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    write_tlg(args.path, rows=args.rows, symbols=args.symbols, expiry_spread=args.expiry_spread,
+              partial_fill_rate=args.partial_fill_rate, multi_leg_rate=args.multi_leg_rate,
+              close_rate=args.close_rate, days=args.days, seed=args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+Benchmark the .tlg parse and analytics pipeline on synthetic data.
+
+Each stage is timed on its own, at each size, and then run once more under
+tracemalloc for its peak memory:
+
+    parse           locate the sections and read them into frames
+    decode          type the columns and decode the option descriptions
+    ledger          match the option fills into lots
+    analytics       trading analytics and the option summary
+    complex_trades  detect the multi-leg trades and aggregate their summaries
+    render          render the dashboard template
+
+    python benchmarks/run_benchmarks.py --sizes 1000,100000 --output results.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+
+With a baseline, stages slower (or larger) than the baseline by more than the
+threshold are reported as regressions and the script exits with status 1.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+import app as dashboard
+from generate_tlg import write_tlg
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+# pandas deprecation notices from the app would drown the report
+warnings.simplefilter('ignore', FutureWarning)
+
+STAGES = ['parse', 'decode', 'ledger', 'analytics', 'complex_trades', 'render']
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.005
+MIN_BYTES_DELTA = 1024 * 1024
+
+def read_sections(path):
+    """Read the raw sections of a .tlg file, before any typing."""
+    sections = dashboard.scan_tlg_sections(path)
+    raw = {}
+    with open(path, 'rb', buffering=0) as file:
+        for section, (start, end) in sections.items():
+            if section == 'ACCOUNT_INFORMATION':
+                raw[section] = dashboard.read_account_information(file, start, end)
+            elif section in dashboard.TLG_HEADERS:
+                raw[section] = dashboard.read_tlg_section(file, section, start, end)
+    return raw
+
+def decode_sections(raw):
+    """Type the raw sections the way read_trading_sections does."""
+    dfs = {}
+    account_info = raw.get('ACCOUNT_INFORMATION')
+    if account_info and len(account_info) >= 5:
+        dfs['account_info'] = pd.DataFrame([{'Account ID': account_info[1], 'Name': account_info[2],
+                                             'Type': account_info[3], 'Address': ' '.join(account_info[4:])}])
+    for section, df in raw.items():
+        if section != 'ACCOUNT_INFORMATION' and df is not None:
+            dfs[section.lower()] = dashboard.prepare_section(section, df)
+    return dfs
+
+def analyse(ledger):
+    return dashboard.calculate_trading_analytics(ledger), dashboard.calculate_option_summary(ledger)
+
+def complex_trades(ledger):
+    trades, legs = dashboard.detect_complex_trades(ledger)
+    records = dashboard.aggregate_complex_option_trades({'complex_trades': trades, 'complex_trade_legs': legs})
+    return trades, legs, records
+
+def render(dataset, filename):
+    """Render the dashboard the way the index route does for an unfiltered request."""
+    trading_data = dashboard.read_only_view(dataset)
+    trading_data['available_files'] = [filename]
+    trading_data['selected_file'] = filename
+    trading_data['all_data_files'] = dashboard.ALL_DATA_FILES
+    trading_data['option_complex_trades'] = dashboard.window_view(trading_data).get('option_complex_trades', [])
+    with dashboard.app.test_request_context('/'):
+        return dashboard.render_template('index.html', data=trading_data)
+
+def pipeline(path):
+    """
+    Return the stage outputs (filled in as the stages run), a function building
+    each stage's input from the earlier outputs, and the stage functions. Inputs
+    are built outside the timed region so that only the stage itself is measured.
+    """
+    filename = os.path.basename(path)
+    outputs = {}
+
+    def stage_input(name):
+        if name == 'parse':
+            return path
+        if name == 'decode':
+            return copy.deepcopy(outputs['parse'])  # prepare_section types the frames in place
+        if name == 'ledger':
+            return outputs['decode']['option_transactions']
+        if name in ('analytics', 'complex_trades'):
+            return outputs['ledger']
+        return dashboard.build_trading_dataset(dict(outputs['decode']), outputs['ledger'])
+
+    functions = {
+        'parse': read_sections,
+        'decode': decode_sections,
+        'ledger': dashboard.build_trade_ledger,
+        'analytics': analyse,
+        'complex_trades': complex_trades,
+        'render': lambda dataset: render(dataset, filename),
+    }
+    return outputs, stage_input, functions
+
+def time_stage(function, make_input, repeat):
+    """Return the run times of function, each on a freshly built input."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        argument = make_input()
+        gc.collect()
+        start = time.perf_counter()
+        result = function(argument)
+        times.append(time.perf_counter() - start)
+        del argument
+    return times, result
+
+def peak_memory(function, make_input):
+    """Return the peak traced allocation, in bytes, of one run of function."""
+    argument = make_input()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_size(path, repeat, memory):
+    """Benchmark every stage on one file."""
+    outputs, stage_input, functions = pipeline(path)
+    results = {}
+    for name in STAGES:
+        times, outputs[name] = time_stage(functions[name], lambda: stage_input(name), repeat)
+        results[name] = {
+            'seconds': statistics.median(times),
+            'min_seconds': min(times),
+            'runs': len(times),
+        }
+        if memory:
+            results[name]['peak_bytes'] = peak_memory(functions[name], lambda: stage_input(name))
+    results['counts'] = {
+        'option_transactions': len(outputs['decode'].get('option_transactions', ())),
+        'closed_trades': len(outputs['ledger'].closed_trades),
+        'open_trades': len(outputs['ledger'].open_trades),
+        'complex_trades': len(outputs['complex_trades'][0]),
+    }
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Return the regressions of results against baseline as readable lines."""
+    regressions = []
+    for size, stages in results['sizes'].items():
+        previous = baseline.get('sizes', {}).get(size)
+        if previous is None:
+            continue
+        for name in STAGES:
+            current, before = stages.get(name), previous.get(name)
+            if not current or not before:
+                continue
+            if (current['seconds'] > before['seconds'] * (1 + threshold)
+                    and current['seconds'] - before['seconds'] > MIN_SECONDS_DELTA):
+                regressions.append(f'{size} rows {name}: {before["seconds"]:.4f}s -> {current["seconds"]:.4f}s '
+                                   f'({current["seconds"] / before["seconds"]:.2f}x)')
+            if ('peak_bytes' in current and 'peak_bytes' in before
+                    and current['peak_bytes'] > before['peak_bytes'] * (1 + threshold)
+                    and current['peak_bytes'] - before['peak_bytes'] > MIN_BYTES_DELTA):
+                regressions.append(f'{size} rows {name}: peak {before["peak_bytes"] / 2**20:.1f}MB -> '
+                                   f'{current["peak_bytes"] / 2**20:.1f}MB')
+    return regressions
+
+def print_results(results):
+    print(f'{"rows":>9} {"stage":<15} {"median s":>10} {"min s":>10} {"peak MB":>9}')
+    for size, stages in results['sizes'].items():
+        for name in STAGES:
+            stage = stages[name]
+            peak = f'{stage["peak_bytes"] / 2**20:9.1f}' if 'peak_bytes' in stage else f'{"-":>9}'
+            print(f'{size:>9} {name:<15} {stage["seconds"]:10.4f} {stage["min_seconds"]:10.4f} {peak}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the .tlg parse and analytics pipeline.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated option transaction counts')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip the tracemalloc runs')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--data-dir', help='keep the generated files here and reuse them between runs')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against this results file (default: benchmarks/baseline.json '
+                                           'when it exists)')
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results to the baseline file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before flagging, e.g. 0.2')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='tlg-bench-')
+    os.makedirs(data_dir, exist_ok=True)
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'settings': {'repeat': args.repeat, 'seed': args.seed, 'symbols': args.symbols},
+        'sizes': {},
+    }
+    for size in sizes:
+        path = os.path.join(data_dir, f'synthetic-{size}-{args.symbols}-{args.seed}.tlg')
+        if not os.path.exists(path):
+            print(f'Generating {size} rows...', file=sys.stderr)
+            write_tlg(path, rows=size, symbols=args.symbols, seed=args.seed)
+        print(f'Benchmarking {size} rows...', file=sys.stderr)
+        results['sizes'][str(size)] = run_size(path, args.repeat, args.memory)
+
+    print_results(results)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+
+    baseline_path = args.baseline or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) else None)
+    regressions = []
+    if baseline_path and not args.save_baseline:
+        with open(baseline_path) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        print(f'\nCompared with {baseline_path}: '
+              + (f'{len(regressions)} regression(s)' if regressions else 'no regressions'))
+        for line in regressions:
+            print(f'  {line}')
+    if args.save_baseline:
+        with open(args.baseline or DEFAULT_BASELINE, 'w') as file:
+            file.write(text + '\n')
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Gunicorn settings for production serving: gunicorn -c gunicorn.conf.py app:app
+
+The master process parses every .tlg file in data/ before forking the workers,
+which then share the parsed datasets copy-on-write instead of each parsing and
+holding their own copy. With DATA_WATCH=1 the master watches data/, re-parses
+changed files and gracefully replaces the workers (as on SIGHUP) so that they
+serve the new datasets; without it, each worker parses changed files itself.
+"""
+import gc
+import os
+import signal
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+preload_app = True
+accesslog = '-'
+
+def when_ready(server):
+    import app
+
+    # The master reaps every child process it has, which would include the
+    # consolidated view's parser pool, so parse in-process here
+    app.CONSOLIDATED_WORKERS = 1
+    app.preload_trading_data()
+
+    if app.DATA_WATCH:
+        # Forks wait for a running rebuild to finish
+        os.register_at_fork(before=app.data_refresh_lock.acquire,
+                            after_in_parent=app.data_refresh_lock.release,
+                            after_in_child=app.data_refresh_lock.release)
+        master = os.getpid()
+        app.data_watcher = app.DataWatcher(on_change=lambda: os.kill(master, signal.SIGHUP), preloaded=True)
+        app.data_watcher.start()
+
+def pre_fork(server, worker):
+    # Move the master's objects out of the collector's reach, so collections in
+    # the workers don't write to (and so copy) the pages holding the datasets
+    gc.freeze()
+
+def post_fork(server, worker):
+    import app
+    app.SERVE_PRELOADED = app.DATA_WATCH
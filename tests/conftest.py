@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from generate_tlg import generate
+
+def option_line(number, description, action, date, quantity, price, time='10:00:00', fee=None):
+    """One OPT_TRD line of a .tlg file, for hand-written fixtures."""
+    symbol = description.split()[0]
+    status = 'O' if 'OPEN' in action else 'C'
+    fee = round(-0.65 * abs(quantity), 4) if fee is None else fee
+    return (f'OPT_TRD|{number}|{symbol}|{description}|CBOE|{action}|{status}|{date}|{time}|USD|'
+            f'{quantity}|100|{price}|{round(quantity * price * 100, 2)}|{fee}')
+
+def write_lines(path, lines):
+    with open(path, 'w', newline='') as file:
+        file.write('\n'.join(lines) + '\n')
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """An empty data/ directory in the working directory, where the app looks for .tlg files."""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('data')
+    return tmp_path / 'data'
+
+@pytest.fixture
+def synthetic_lines():
+    """Lines of a small synthetic .tlg file with partial fills and multi-leg trades."""
+    return generate(rows=1500, symbols=4, partial_fill_rate=0.4, days=120, seed=7)
@@ -0,0 +1,59 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import app
+from conftest import write_lines
+
+def positions(rows):
+    return pd.DataFrame(rows, columns=['Type', 'Account', 'Symbol', 'Description', 'Quantity', 'Strike', 'Premium'])
+
+def test_repeated_contracts_have_distinct_ids():
+    calendar = app.ExpiryCalendar(positions([
+        ['C', 'U1', 'AAPL', 'AAPL 19JAN24 100 C', 2, 100, 1.5],
+        ['P', 'U1', 'MSFT', 'MSFT 12JAN24 300 P', 1, 300, 2.0],
+        # The same contract held long and short, and in another account
+        ['C', 'U1', 'AAPL', 'AAPL 19JAN24 100 C', -1, 100, 1.2],
+        ['C', 'U2', 'AAPL', 'AAPL 19JAN24 100 C', 3, 100, 1.4]
+    ]))
+    alerts = calendar.alerts(date(2024, 1, 2))
+    ids = [alert['id'] for alert in alerts]
+    assert ids == ['U1|MSFT 12JAN24 300 P', 'U1|AAPL 19JAN24 100 C', 'U1|AAPL 19JAN24 100 C#2',
+                   'U2|AAPL 19JAN24 100 C']
+    assert [alert['quantity'] for alert in alerts[1:]] == [2, -1, 3]
+    # Stable from one day to the next
+    assert [alert['id'] for alert in calendar.alerts(date(2024, 1, 15))] == ids[1:]
+
+def position_line(account, days, quantity=1):
+    expiry = (datetime.now().date() + timedelta(days=days)).strftime('%d%b%y').upper()
+    return f'OPT_LOT|{account}|AAPL|AAPL {expiry} 100 C|USD||20240101|{quantity}|{quantity * 100}|1.5|-150'
+
+@pytest.fixture
+def client(data_dir):
+    # Expiring today (so still listed yesterday), in 2, 5 and 30 days, and a contract held twice
+    write_lines(data_dir / 'x.tlg', ['OPTION_POSITIONS', position_line('U1', 0), position_line('U1', 2),
+                                     position_line('U1', 5), position_line('U1', 30), position_line('U1', 30, -1),
+                                     'EOF'])
+    return app.app.test_client()
+
+def test_cursor(client):
+    first = client.get('/api/alerts').get_json()
+    assert first['full'] and len(first['alerts']) == 4
+    assert first['counts'] == {'danger': 1, 'warning': 1, 'info': 2}
+
+    # Nothing has changed since the cursor
+    same = client.get('/api/alerts', query_string={'cursor': first['cursor']}).get_json()
+    assert (same['full'], same['alerts'], same['removed'], same['cursor']) == (False, [], [], first['cursor'])
+
+    # Polled again the next day: the days left changed and the contract expiring today is gone
+    version, _ = first['cursor'].split('.')
+    yesterday = (datetime.now().date() - timedelta(days=1)).strftime('%Y%m%d')
+    later = client.get('/api/alerts', query_string={'cursor': f'{version}.{yesterday}'}).get_json()
+    assert not later['full']
+    assert [alert['id'] for alert in later['alerts']] == [alert['id'] for alert in first['alerts']]
+    assert len(later['removed']) == 1 and later['removed'][0].startswith('U1|AAPL ')
+
+    # A cursor of other data, or a malformed one, gets every alert
+    for cursor in [f'0000.{yesterday}', 'garbage']:
+        assert client.get('/api/alerts', query_string={'cursor': cursor}).get_json()['full']
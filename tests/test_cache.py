@@ -0,0 +1,52 @@
+import threading
+
+import pandas as pd
+
+import app
+
+def dataset(rows):
+    return {'frame': pd.DataFrame({'value': range(rows)})}
+
+def test_least_recently_used_is_evicted():
+    size = app.estimate_dataset_size(dataset(1000))
+    cache = app.DatasetCache(int(size * 2.5))
+    first = cache.get(('a', 1), lambda: dataset(1000))
+    cache.get(('b', 1), lambda: dataset(1000))
+    # Using a again makes b the least recently used
+    assert cache.get(('a', 1), lambda: None) is first
+    cache.get(('c', 1), lambda: dataset(1000))
+    assert cache.sources() == {'a', 'c'}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 3, 1)
+    assert stats['size_bytes'] <= stats['max_bytes']
+
+def test_new_version_replaces_the_old_one():
+    cache = app.DatasetCache(1 << 30)
+    cache.get(('a', 1), lambda: dataset(10))
+    new = cache.get(('a', 2), lambda: dataset(20))
+    assert cache.datasets() == [(('a', 2), new)]
+
+def test_previous_version_is_served_while_reloading():
+    cache = app.DatasetCache(1 << 30)
+    old = cache.get(('a', 1), lambda: dataset(10))
+    started, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        started.set()
+        release.wait()
+        return dataset(20)
+
+    loader = threading.Thread(target=cache.get, args=(('a', 2), slow_load))
+    loader.start()
+    started.wait()
+    # Another request for the new version gets the old one instead of waiting
+    assert cache.get(('a', 2), lambda: None) is old
+    assert cache.stats()['stale_hits'] == 1
+    release.set()
+    loader.join()
+    assert len(cache.get(('a', 2), lambda: None)['frame']) == 20
+
+def test_oversized_dataset_is_returned_but_not_kept():
+    cache = app.DatasetCache(100)
+    assert len(cache.get(('a', 1), lambda: dataset(1000))['frame']) == 1000
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,48 @@
+import app
+from conftest import option_line, write_lines
+
+LINES = ['OPTION_TRANSACTIONS',
+         # Vertical spread legged in two minutes apart, one leg closed later
+         option_line(1, 'AAPL 19JAN24 100 C', 'BUYTOOPEN', '20240102', 1, 3.0, time='10:00:00'),
+         option_line(2, 'AAPL 19JAN24 110 C', 'SELLTOOPEN', '20240102', -1, 1.0, time='10:02:00'),
+         option_line(3, 'AAPL 19JAN24 100 C', 'SELLTOCLOSE', '20240110', -1, 4.0),
+         # Straddle
+         option_line(4, 'MSFT 16FEB24 300 C', 'BUYTOOPEN', '20240103', 1, 5.0, time='11:00:00'),
+         option_line(5, 'MSFT 16FEB24 300 P', 'BUYTOOPEN', '20240103', 1, 4.0, time='11:00:00'),
+         # Ten minutes apart: two single-leg trades
+         option_line(6, 'SPY 15MAR24 450 C', 'BUYTOOPEN', '20240104', 1, 2.0, time='10:00:00'),
+         option_line(7, 'SPY 15MAR24 460 C', 'SELLTOOPEN', '20240104', -1, 1.0, time='10:10:00'),
+         # Each leg within the window of the previous one: one butterfly spanning eight minutes
+         option_line(8, 'QQQ 15MAR24 400 P', 'BUYTOOPEN', '20240105', 1, 2.0, time='10:00:00'),
+         option_line(9, 'QQQ 15MAR24 410 P', 'SELLTOOPEN', '20240105', -2, 3.0, time='10:04:00'),
+         option_line(10, 'QQQ 15MAR24 420 P', 'BUYTOOPEN', '20240105', 1, 4.5, time='10:08:00'),
+         # Calendar spread
+         option_line(11, 'IWM 16FEB24 200 C', 'SELLTOOPEN', '20240108', -1, 2.0, time='15:00:00'),
+         option_line(12, 'IWM 15MAR24 200 C', 'BUYTOOPEN', '20240108', 1, 3.0, time='15:00:30'),
+         'EOF']
+
+def trades_of(dataset):
+    trades = dataset['complex_trades']
+    first_ids = dataset['option_transactions'].set_index('Seq')['ID'].astype(str)
+    return {first_ids[trade.Trade_ID]: (trade.Symbol, trade.Trade_Type, trade.Num_Legs, trade.Num_Fills)
+            for trade in trades.itertuples()}
+
+def test_legs_are_clustered_into_trades(data_dir):
+    write_lines(data_dir / 'x.tlg', LINES)
+    dataset = app.parse_trading_data('x.tlg')
+    # Trades are identified by the Seq of their first fill
+    assert trades_of(dataset) == {'1': ('AAPL', 'Vertical Spread', 2, 3), '4': ('MSFT', 'Straddle', 2, 2),
+                                  '8': ('QQQ', 'Butterfly', 3, 3), '11': ('IWM', 'Calendar Spread', 2, 2)}
+    legs = app.complex_trade_legs(dataset, dataset['complex_trades']['Trade_ID'].iloc[0])
+    assert legs['ID'].astype(str).tolist() == ['1', '2', '3']
+
+def test_window_splits_trades(data_dir, monkeypatch):
+    monkeypatch.setattr(app, 'COMPLEX_TRADE_WINDOW_SECONDS', 60)
+    write_lines(data_dir / 'x.tlg', LINES)
+    assert trades_of(app.parse_trading_data('x.tlg')) == {'4': ('MSFT', 'Straddle', 2, 2),
+                                                          '11': ('IWM', 'Calendar Spread', 2, 2)}
+
+def test_window_joins_trades(data_dir, monkeypatch):
+    monkeypatch.setattr(app, 'COMPLEX_TRADE_WINDOW_SECONDS', 600)
+    write_lines(data_dir / 'x.tlg', LINES)
+    assert trades_of(app.parse_trading_data('x.tlg'))['6'] == ('SPY', 'Vertical Spread', 2, 2)
@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+import app
+from conftest import option_line, write_lines
+
+CALL, PUT = 'AAPL 19JAN24 100 C', 'MSFT 16FEB24 300 P'
+
+def account(number):
+    return ['ACCOUNT_INFORMATION', f'ACT_INF|{number}|Account {number}|Individual|1 Main St|New York NY']
+
+def position(number, description, quantity):
+    return f'OPT_LOT|{number}|{description.split()[0]}|{description}|USD||20240301|{quantity}|{quantity * 100}|1.5|0'
+
+@pytest.fixture
+def files(data_dir, monkeypatch):
+    monkeypatch.setattr(app, 'CONSOLIDATED_WORKERS', 1)
+    write_lines(data_dir / 'a1.tlg', account('U1') + [
+        'OPTION_TRANSACTIONS',
+        option_line(1, CALL, 'BUYTOOPEN', '20240102', 2, 1.0),
+        option_line(2, CALL, 'SELLTOCLOSE', '20240105', -1, 1.5),
+        'OPTION_POSITIONS', position('U1', CALL, 1), 'EOF'])
+    # A later export of the same account, overlapping the first
+    write_lines(data_dir / 'a2.tlg', account('U1') + [
+        'OPTION_TRANSACTIONS',
+        option_line(2, CALL, 'SELLTOCLOSE', '20240105', -1, 1.5),
+        option_line(3, PUT, 'SELLTOOPEN', '20240201', -1, 4.0),
+        # Rows without an ID are all kept
+        option_line('', PUT, 'SELLTOOPEN', '20240202', -1, 4.0),
+        option_line('', PUT, 'SELLTOOPEN', '20240202', -1, 4.0),
+        'OPTION_POSITIONS', position('U1', CALL, 1), position('U1', PUT, -3), 'EOF'])
+    # Another account holding the same contract; its close matches only its own open
+    write_lines(data_dir / 'b.tlg', account('U2') + [
+        'OPTION_TRANSACTIONS',
+        option_line(10, CALL, 'BUYTOOPEN', '20240103', 1, 1.2),
+        option_line(11, CALL, 'SELLTOCLOSE', '20240104', -2, 1.4),
+        'OPTION_POSITIONS', position('U2', CALL, 0), 'EOF'])
+    return ['a1.tlg', 'a2.tlg', 'b.tlg']
+
+def test_transactions_are_kept_once(files):
+    dataset = app.parse_consolidated_data(files)
+    fills = dataset['option_transactions']
+    assert fills['ID'].astype(str).tolist() == ['1', '10', '11', '2', '3', '', '']
+    assert fills['Account'].astype(str).tolist() == ['U1', 'U2', 'U2', 'U1', 'U1', 'U1', 'U1']
+    assert dataset['account_info']['Account ID'].tolist() == ['U1', 'U2']
+
+    # Lots are matched within each account
+    closed = dataset['trade_ledger'].closed_trades
+    assert list(zip(closed['Account'].astype(str), closed['Entry_ID'].astype(str), closed['Quantity'])) == [
+        ('U2', '10', 1), ('U1', '1', 1)]
+    breakdown = {row['account']: row for row in dataset['account_breakdown']}
+    assert {account: (row['total_transactions'], row['closed_positions'], row['open_positions'])
+            for account, row in breakdown.items()} == {'U1': (5, 1, 4), 'U2': (2, 1, 0)}
+    assert breakdown['U1']['name'] == 'Account U1'
+
+def test_positions_come_from_each_accounts_latest_file(files):
+    positions = app.parse_consolidated_data(files)['option_positions']
+    assert list(zip(positions['Account'].astype(str), positions['Description'].astype(str),
+                    positions['Quantity'])) == [('U1', CALL, 1), ('U1', PUT, -3), ('U2', CALL, 0)]
+
+def file_sections(date, quantity):
+    return {'account_info': pd.DataFrame({'Account ID': ['U1'], 'Name': ['Account U1']}),
+            'option_transactions': pd.DataFrame({'ID': [date], 'Date': [date]}),
+            'option_positions': pd.DataFrame({'Description': [CALL], 'Quantity': [quantity]})}
+
+@pytest.mark.parametrize('dates, quantity', [
+    # The file with the latest transactions wins, wherever it is listed
+    (['20240301', '20240101'], 5),
+    (['20240101', '20240301'], 7),
+    # and on a tie, the file listed last
+    (['20240301', '20240301'], 7)])
+def test_latest_file_is_chosen_by_its_transactions(dates, quantity):
+    merged = app.merge_file_sections(['x.tlg', 'y.tlg'], [file_sections(dates[0], 5), file_sections(dates[1], 7)])
+    assert merged['option_positions']['Quantity'].tolist() == [quantity]
+    assert merged['option_positions']['Account'].tolist() == ['U1']
+
+def test_files_without_account_information_are_named_after_the_file():
+    sections = file_sections('20240101', 1)
+    del sections['account_info']
+    merged = app.merge_file_sections(['U9.tlg'], [sections])
+    assert merged['option_transactions']['Account'].tolist() == ['U9']
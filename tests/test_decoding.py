@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+import app
+
+def test_descriptions_are_decoded():
+    index = [10, 11, 12, 13]
+    symbols = pd.Series(['GOOG', 'GOOG', 'SPY', 'GOOG'], index=index)
+    descriptions = pd.Series(['GOOG 04APR25 175 P', 'GOOG 04APR25 175 P', ' SPY 20DEC24 450.5 C ',
+                              'GOOG 18JUL25 200 C'], index=index)
+    decoded = app.decode_option_descriptions(symbols, descriptions)
+    assert list(decoded.index) == index
+    assert decoded['Expiration'].tolist() == ['2025-04-04', '2025-04-04', '2024-12-20', '2025-07-18']
+    assert decoded['Strike'].tolist() == [175.0, 175.0, 450.5, 200.0]
+    assert decoded['Type'].tolist() == ['P', 'P', 'C', 'C']
+    assert decoded['Contract'].tolist() == ['GOOG_04APR25_175_P', 'GOOG_04APR25_175_P', 'SPY_20DEC24_450.5_C',
+                                            'GOOG_18JUL25_200_C']
+    assert not decoded['Decode_Error'].any()
+
+def test_malformed_descriptions_are_flagged():
+    descriptions = pd.Series(['AAPL 31FEB24 100 C', 'AAPL JAN24 100 C', 'AAPL 19JAN24 abc P', '', None,
+                              'AAPL 19JAN24 100 X'])
+    symbols = pd.Series(['AAPL'] * len(descriptions))
+    decoded = app.decode_option_descriptions(symbols, descriptions)
+    assert decoded['Decode_Error'].tolist() == [True] * len(descriptions)
+    assert decoded['Expiration'].isna().all() and np.isnan(decoded['Strike'].to_numpy(dtype=float)).all()
+    # The last word is kept as the type and the words make the contract key
+    assert decoded['Type'].tolist()[:3] == ['C', 'C', 'P']
+    assert decoded['Contract'].iloc[1] == 'AAPL_AAPL_JAN24_100_C'
+
+def test_contract_depends_on_the_symbol():
+    descriptions = pd.Series(['X 19JAN24 10 C', 'X 19JAN24 10 C'])
+    decoded = app.decode_option_descriptions(pd.Series(['X', 'Y']), descriptions)
+    assert decoded['Contract'].tolist() == ['X_19JAN24_10_C', 'Y_19JAN24_10_C']
+
+def test_empty():
+    decoded = app.decode_option_descriptions(pd.Series([], dtype=object), pd.Series([], dtype=object))
+    assert decoded.empty and list(decoded.columns) == ['Expiration', 'Strike', 'Type', 'Contract', 'Decode_Error']
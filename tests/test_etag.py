@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+import app
+from conftest import write_lines
+
+@pytest.fixture
+def client(data_dir, synthetic_lines):
+    write_lines(data_dir / 'x.tlg', synthetic_lines)
+    return app.app.test_client()
+
+def test_unchanged_page_is_not_modified(client, monkeypatch):
+    response = client.get('/?data_file=x.tlg&start_date=2024-02-01')
+    assert response.status_code == 200 and response.headers['ETag']
+
+    # Revalidated without loading the dataset
+    monkeypatch.setattr(app, 'cached_trading_data', lambda filename: pytest.fail('dataset loaded'))
+    revalidated = client.get('/?data_file=x.tlg&start_date=2024-02-01',
+                             headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == response.headers['ETag']
+
+def test_changed_file_or_range_is_sent_again(client, data_dir):
+    etag = client.get('/?data_file=x.tlg').headers['ETag']
+    other_range = client.get('/?data_file=x.tlg&end_date=2024-02-01', headers={'If-None-Match': etag})
+    assert other_range.status_code == 200 and other_range.headers['ETag'] != etag
+
+    with open(data_dir / 'x.tlg', 'a') as file:
+        file.write('\n')
+    os.utime(data_dir / 'x.tlg', ns=(0, os.stat(data_dir / 'x.tlg').st_mtime_ns + 1))
+    changed = client.get('/?data_file=x.tlg', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
@@ -0,0 +1,66 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import app
+from conftest import write_lines
+
+@pytest.fixture(params=['memory', 'store'])
+def client(request, data_dir, synthetic_lines, monkeypatch):
+    """A test client exporting from the cached dataset, or from the SQLite store, in small chunks."""
+    write_lines(data_dir / 'x.tlg', synthetic_lines)
+    monkeypatch.setattr(app, 'EXPORT_CHUNK_ROWS', 100)
+    if request.param == 'store':
+        monkeypatch.setattr(app, 'SQLITE_STORE', True)
+        monkeypatch.setattr(app, 'trade_store', app.TradeStore(str(data_dir.parent / 'store.sqlite')))
+    return app.app.test_client()
+
+def expected_records(name, start_date=None, end_date=None):
+    frame = app.export_frame(app.load_trading_data('x.tlg'), name, start_date, end_date)
+    return app.table_records(frame.reset_index(drop=True))
+
+def export(client, name, **params):
+    response = client.get(f'/api/export/{name}', query_string=params)
+    assert response.status_code == 200
+    return response
+
+@pytest.mark.parametrize('name', app.EXPORTS)
+def test_jsonl(client, name):
+    response = export(client, name, format='jsonl', start_date='2024-02-01', end_date='2024-03-31')
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == f'attachment; filename="{name}.jsonl"'
+    records = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert records == expected_records(name, '2024-02-01', '2024-03-31')
+
+@pytest.mark.parametrize('name', ['closed_trades', 'option_transactions', 'option_positions'])
+def test_csv(client, name, monkeypatch):
+    if name == 'option_positions':
+        monkeypatch.setattr(app, 'EXPORT_CHUNK_ROWS', 2)
+    response = export(client, name, start_date='2024-02-01')
+    assert response.mimetype == 'text/csv'
+    # One header, however many chunks
+    frame = pd.read_csv(io.BytesIO(response.data), keep_default_na=False, na_values=[''], dtype=str)
+    expected = pd.DataFrame(expected_records(name, '2024-02-01'))
+    assert len(frame) == len(expected) > app.EXPORT_CHUNK_ROWS
+    assert list(frame.columns) == list(expected.columns)
+    for column in ['Symbol', 'Description', 'Date', 'Entry_Date', 'Exit_Date']:
+        if column in expected.columns:
+            assert frame[column].tolist() == expected[column].tolist(), column
+
+def test_empty_window_is_a_header(client):
+    response = export(client, 'closed_trades', start_date='2030-01-01')
+    assert response.data.decode().count('\n') == 1 and response.data.startswith(b'Symbol,')
+    assert export(client, 'closed_trades', format='jsonl', start_date='2030-01-01').data == b''
+
+def test_parquet(client):
+    pytest.importorskip('pyarrow')
+    frame = pd.read_parquet(io.BytesIO(export(client, 'closed_trades', format='parquet').data))
+    assert len(frame) == len(expected_records('closed_trades'))
+
+def test_unknown_export_or_format(client, monkeypatch):
+    assert client.get('/api/export/trades').status_code == 404
+    assert client.get('/api/export/closed_trades?format=xlsx').status_code == 400
+    monkeypatch.setattr(app, 'pyarrow', None)
+    assert client.get('/api/export/closed_trades?format=parquet').status_code == 400
@@ -0,0 +1,122 @@
+import random
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from conftest import option_line, write_lines
+
+def reference_lots(fills):
+    """
+    Match fills lot by lot with a FIFO queue per contract, as a loop: the contract's
+    direction is the side of its first opening fill (or of its first fill), closes
+    consume the oldest open quantity and closes with nothing open match nothing.
+    """
+    closed, opened = [], []
+    ordered = fills.assign(Time=fills['Time'].astype(str)).sort_values(['Date', 'Time', 'Seq'], kind='stable')
+    for _, group in ordered.groupby(app.lot_keys(ordered), sort=False, observed=True):
+        sides = np.where(group['Action'].astype(str).str.contains('BUY'), 1, -1)
+        opening = group['Action'].astype(str).str.contains('OPEN').to_numpy()
+        direction = sides[opening][0] if opening.any() else sides[0]
+        queue = deque()
+        for fill, side in zip(group.itertuples(), sides):
+            size = quantity = abs(fill.Quantity)
+            if quantity == 0:
+                continue
+            if side == direction:
+                queue.append([fill, quantity])
+                continue
+            while quantity > 0 and queue:
+                entry, remaining = queue[0]
+                lot = min(remaining, quantity)
+                entry_amount = direction * entry.Amount * lot / abs(entry.Quantity)
+                entry_fee = entry.Fee * lot / abs(entry.Quantity)
+                exit_amount = -direction * fill.Amount * lot / size
+                exit_fee = fill.Fee * lot / size
+                closed.append({
+                    'Entry_Seq': entry.Seq, 'Exit_Seq': fill.Seq, 'Quantity': lot,
+                    'Entry_Amount': entry_amount, 'Exit_Amount': exit_amount, 'Fees': entry_fee + exit_fee,
+                    'PnL': direction * (exit_amount - entry_amount) - entry_fee - exit_fee,
+                    'Days_Held': (fill.Date - entry.Date).days
+                })
+                queue[0][1] -= lot
+                quantity -= lot
+                if queue[0][1] == 0:
+                    queue.popleft()
+        opened.extend({'Entry_Seq': entry.Seq, 'Quantity': remaining} for entry, remaining in queue)
+    return (pd.DataFrame(closed, columns=['Entry_Seq', 'Exit_Seq', 'Quantity', 'Entry_Amount', 'Exit_Amount',
+                                          'Fees', 'PnL', 'Days_Held']),
+            pd.DataFrame(opened, columns=['Entry_Seq', 'Quantity']))
+
+def assert_matches_reference(ledger):
+    closed, opened = reference_lots(ledger.fills)
+    actual = ledger.closed_trades.sort_values(['Exit_Seq', 'Entry_Seq'], ignore_index=True)
+    expected = closed.sort_values(['Exit_Seq', 'Entry_Seq'], ignore_index=True)
+    assert len(actual) == len(expected)
+    for column in ['Entry_Seq', 'Exit_Seq', 'Days_Held']:
+        np.testing.assert_array_equal(actual[column].to_numpy(), expected[column].to_numpy())
+    for column in ['Quantity', 'Entry_Amount', 'Exit_Amount', 'Fees', 'PnL']:
+        np.testing.assert_allclose(actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                   rtol=1e-12, atol=1e-9)
+
+    actual = ledger.open_trades.sort_values('Entry_Seq', ignore_index=True)
+    expected = opened.sort_values('Entry_Seq', ignore_index=True)
+    np.testing.assert_array_equal(actual['Entry_Seq'].to_numpy(), expected['Entry_Seq'].to_numpy())
+    np.testing.assert_allclose(actual['Quantity'].to_numpy(dtype=float), expected['Quantity'].to_numpy(dtype=float))
+
+def parsed_ledger(path, lines):
+    write_lines(path, lines)
+    return app.build_trade_ledger(app.read_trading_sections(str(path))['option_transactions'])
+
+def test_partial_fills_and_closes_before_any_open(tmp_path):
+    call, put = 'AAPL 19JAN24 100 C', 'MSFT 16FEB24 300 P'
+    lines = ['OPTION_TRANSACTIONS',
+             # Closed before anything was opened: matches nothing
+             option_line(1, call, 'SELLTOCLOSE', '20240102', -2, 1.0),
+             option_line(2, call, 'BUYTOOPEN', '20240103', 3, 1.5),
+             option_line(3, call, 'BUYTOOPEN', '20240104', 2, 2.0),
+             # Closes all of the first fill and part of the second
+             option_line(4, call, 'SELLTOCLOSE', '20240105', -4, 2.5),
+             # Closes the rest of the second fill, and more than is open
+             option_line(5, call, 'SELLTOCLOSE', '20240108', -3, 1.2),
+             option_line(6, call, 'BUYTOOPEN', '20240109', 1, 0.8),
+             # Short position, closed in two partial fills on the same day (time order, not file order)
+             option_line(7, put, 'BUYTOCLOSE', '20240110', 1, 3.0, time='11:00:00'),
+             option_line(8, put, 'SELLTOOPEN', '20240105', -5, 4.0),
+             option_line(9, put, 'BUYTOCLOSE', '20240110', 2, 2.0, time='10:30:00'),
+             option_line(10, put, 'SELLTOOPEN', '20240111', -1, 4.5),
+             # A contract only ever closed takes the side of its first fill
+             option_line(11, 'SPY 15MAR24 450 C', 'BUYTOCLOSE', '20240112', 2, 1.1),
+             'EOF']
+    ledger = parsed_ledger(tmp_path / 'fifo.tlg', lines)
+    assert_matches_reference(ledger)
+    # The part of the close on 20240108 beyond what was open is dropped
+    assert ledger.closed_trades['Quantity'].sum() == 3 + 1 + 1 + 2 + 1
+    assert sorted(ledger.open_trades['Quantity']) == [1, 1, 2, 2]
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_synthetic_fills_match_reference(tmp_path, synthetic_lines, seed):
+    # Dropping some opening fills leaves closes with nothing (or too little) open before them
+    rng = random.Random(seed)
+    lines = [line for line in synthetic_lines
+             if not (line.startswith('OPT_TRD') and '|O|' in line and rng.random() < 0.15)]
+    ledger = parsed_ledger(tmp_path / 'synthetic.tlg', lines)
+    assert len(ledger.closed_trades) and len(ledger.open_trades)
+    assert_matches_reference(ledger)
+
+def test_lots_are_matched_within_each_account(tmp_path):
+    lines = ['OPTION_TRANSACTIONS',
+             option_line(1, 'AAPL 19JAN24 100 C', 'BUYTOOPEN', '20240102', 2, 1.0),
+             option_line(2, 'AAPL 19JAN24 100 C', 'BUYTOOPEN', '20240103', 2, 1.5),
+             option_line(3, 'AAPL 19JAN24 100 C', 'SELLTOCLOSE', '20240104', -3, 2.0),
+             'EOF']
+    write_lines(tmp_path / 'accounts.tlg', lines)
+    fills = app.read_trading_sections(str(tmp_path / 'accounts.tlg'))['option_transactions']
+    fills['Account'] = ['U1', 'U2', 'U1']
+    ledger = app.build_trade_ledger(fills)
+    assert_matches_reference(ledger)
+    # The close of U1 matches only U1's opening fill, and the excess matches nothing
+    assert ledger.closed_trades['Quantity'].tolist() == [2]
+    assert ledger.open_trades['Quantity'].tolist() == [2]
@@ -0,0 +1,118 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from conftest import write_lines
+
+LEDGER_FRAMES = ['fills', 'closed_trades', 'open_trades']
+LEDGER_INDEXES = ['fills_index', 'closed_index', 'open_index']
+FRAMES = ['stock_transactions', 'stock_positions', 'option_positions', 'complex_trade_clusters', 'complex_trades',
+          'complex_trade_legs', 'daily_pnl']
+
+@pytest.fixture
+def appends(monkeypatch):
+    """Record what every append_trading_data call returned (None when it fell back to a full parse)."""
+    results = []
+    append_trading_data = app.append_trading_data
+
+    def recorded(*args):
+        results.append(append_trading_data(*args))
+        return results[-1]
+
+    monkeypatch.setattr(app, 'append_trading_data', recorded)
+    return results
+
+def append_lines(path, lines):
+    with open(path, 'a', newline='') as file:
+        file.write('\n'.join(lines) + '\n')
+
+def used_categories(frame):
+    return frame.apply(lambda column: column.cat.remove_unused_categories()
+                       if isinstance(column.dtype, pd.CategoricalDtype) else column)
+
+def assert_same_frame(frame, expected):
+    # Merged categoricals may keep the categories of rows that were replaced; only the rows matter
+    pd.testing.assert_frame_equal(used_categories(frame), used_categories(expected))
+
+def assert_same_dataset(dataset, full):
+    assert set(dataset) == set(full)
+    if 'trade_ledger' in full:
+        for name in LEDGER_FRAMES:
+            assert_same_frame(getattr(dataset['trade_ledger'], name), getattr(full['trade_ledger'], name))
+        for name in LEDGER_INDEXES:
+            index, expected = getattr(dataset['trade_ledger'], name), getattr(full['trade_ledger'], name)
+            np.testing.assert_array_equal(index.dates, expected.dates)
+            assert set(index.prefix) == set(expected.prefix)
+            for key, values in expected.prefix.items():
+                np.testing.assert_array_equal(index.prefix[key], values)
+        # Empty groups have NaN statistics, which assert_equal treats as equal
+        np.testing.assert_equal(dataset['trading_analytics'], full['trading_analytics'])
+        np.testing.assert_equal(dataset['option_summary'], full['option_summary'])
+    for name in FRAMES:
+        if name in full:
+            assert_same_frame(dataset[name], full[name])
+    if 'option_positions' in full:
+        np.testing.assert_equal(dataset['option_positions_summary'], full['option_positions_summary'])
+    for name, index in full['table_indexes'].items():
+        for query in [{}, {'search': 'a', 'length': 50}, {'sort_column': index.columns[1], 'ascending': False},
+                      {'start_date': '2024-02-01', 'end_date': '2024-03-15', 'sort_column': index.columns[0]}]:
+            total, filtered, page = dataset['table_indexes'][name].query(**query)
+            expected_total, expected_filtered, expected_page = index.query(**query)
+            assert (total, filtered) == (expected_total, expected_filtered)
+            assert_same_frame(page, expected_page)
+
+def split_at(lines, section, rows):
+    """Split lines after the given number of rows of a section."""
+    cut = lines.index(section) + 1 + rows
+    return lines[:cut], lines[cut:]
+
+def test_appended_option_transactions(data_dir, synthetic_lines, appends):
+    # The file ends inside its option transactions, and grows twice
+    head, tail = split_at(synthetic_lines, 'OPTION_TRANSACTIONS', 600)
+    middle, tail = tail[:500], tail[500:]
+    write_lines(data_dir / 'x.tlg', head)
+    dataset = app.ingest_trading_data('x.tlg')
+    for lines in [middle, tail]:
+        append_lines(data_dir / 'x.tlg', lines)
+        dataset = app.ingest_trading_data('x.tlg', dataset)
+    assert len(appends) == 2 and all(result is not None for result in appends)
+    assert_same_dataset(dataset, app.ingest_trading_data('x.tlg'))
+
+def test_appended_fills_out_of_date_order(data_dir, synthetic_lines, appends):
+    # Late-reported fills land among (and re-match) the lots already in the ledger
+    head, tail = split_at(synthetic_lines, 'OPTION_TRANSACTIONS', 900)
+    fills = [line for line in tail if line.startswith('OPT_TRD')]
+    late = random.Random(3).sample(head[head.index('OPTION_TRANSACTIONS') + 1:], 150)
+    head = [line for line in head if line not in late]
+    write_lines(data_dir / 'x.tlg', head)
+    previous = app.ingest_trading_data('x.tlg')
+    expected = app.ingest_trading_data('x.tlg')
+    append_lines(data_dir / 'x.tlg', late + fills)
+    dataset = app.ingest_trading_data('x.tlg', previous)
+    assert appends[-1] is not None
+    assert_same_dataset(dataset, app.ingest_trading_data('x.tlg'))
+    # The previous dataset is left as it was
+    assert_same_dataset(previous, expected)
+
+def test_appended_sections(data_dir, synthetic_lines, appends):
+    # The file ends inside its stock transactions; the option transactions are all appended
+    head, tail = split_at(synthetic_lines, 'STOCK_TRANSACTIONS', 80)
+    write_lines(data_dir / 'x.tlg', head)
+    dataset = app.ingest_trading_data('x.tlg')
+    append_lines(data_dir / 'x.tlg', tail)
+    dataset = app.ingest_trading_data('x.tlg', dataset)
+    assert appends[-1] is not None
+    assert_same_dataset(dataset, app.ingest_trading_data('x.tlg'))
+
+def test_restarted_section_is_parsed_again(data_dir, synthetic_lines, appends):
+    _, tail = split_at(synthetic_lines, 'OPTION_TRANSACTIONS', 600)
+    write_lines(data_dir / 'x.tlg', synthetic_lines)
+    dataset = app.ingest_trading_data('x.tlg')
+    # A second option transactions section after the positions
+    append_lines(data_dir / 'x.tlg', ['OPTION_TRANSACTIONS'] + tail[:20])
+    dataset = app.ingest_trading_data('x.tlg', dataset)
+    assert appends == [None]
+    assert_same_dataset(dataset, app.ingest_trading_data('x.tlg'))
@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+import app
+from conftest import write_lines
+
+SECTIONS = ['STOCK_TRANSACTIONS', 'OPTION_TRANSACTIONS', 'STOCK_POSITIONS', 'OPTION_POSITIONS']
+
+def reference_sections(path):
+    """The line-by-line parser the streamed one replaced: every section as a frame of strings."""
+    with open(path, 'r') as file:
+        lines = file.readlines()
+
+    sections = {}
+    current_section = None
+    current_data = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line in app.TLG_SECTIONS:
+            if current_section:
+                sections[current_section] = current_data
+            current_section = line
+            current_data = []
+        else:
+            current_data.append(line)
+
+    dfs = {}
+    for section in SECTIONS:
+        if sections.get(section):
+            headers = app.TLG_HEADERS[section]
+            data = [line.split('|') for line in sections[section]]
+            data = [row[:len(headers)] if len(row) > len(headers) else row + [''] * (len(headers) - len(row))
+                    for row in data]
+            dfs[section] = pd.DataFrame(data, columns=headers)
+    return dfs
+
+def streamed_sections(path, chunk_size=app.PARSE_CHUNK_SIZE):
+    ranges = app.scan_tlg_sections(path, chunk_size=chunk_size)
+    dfs = {}
+    with open(path, 'rb', buffering=0) as file:
+        for section in SECTIONS:
+            if section in ranges:
+                df = app.read_tlg_section(file, section, *ranges[section])
+                if df is not None:
+                    dfs[section] = df
+    return dfs
+
+def assert_same_sections(path, chunk_size=app.PARSE_CHUNK_SIZE):
+    expected = reference_sections(path)
+    actual = streamed_sections(path, chunk_size)
+    assert list(actual) == list(expected)
+    for section, df in expected.items():
+        pd.testing.assert_frame_equal(actual[section], df, check_dtype=False)
+
+@pytest.mark.parametrize('chunk_size', [64, 4096, app.PARSE_CHUNK_SIZE])
+def test_synthetic_file(tmp_path, synthetic_lines, chunk_size):
+    write_lines(tmp_path / 'synthetic.tlg', synthetic_lines)
+    assert_same_sections(str(tmp_path / 'synthetic.tlg'), chunk_size)
+
+def test_irregular_lines(tmp_path, synthetic_lines):
+    lines = list(synthetic_lines)
+    start = lines.index('OPTION_TRANSACTIONS') + 1
+    lines[start:start] = [
+        # Extra fields are dropped, missing ones are empty
+        'OPT_TRD|X1|AAPL|AAPL 19JAN24 100 C|CBOE|BUYTOOPEN|O|20240105|10:00:00|USD|1|100|1.0|100|-0.65|extra|more',
+        'OPT_TRD|X2|AAPL|AAPL 19JAN24 100 C|CBOE|SELLTOCLOSE|C|20240106|10:00:00|USD|-1|100|1.5|-150',
+        # Blank and indented lines
+        '',
+        '   ',
+        '  OPT_TRD|X3|AAPL|AAPL 19JAN24 100 C|CBOE|SELLTOCLOSE|C|20240106|10:00:00|USD|-1|100|1.5|-150|-0.5',
+        # Quotes are data, not quoting
+        'OPT_TRD|X4|"AAPL|AAPL 19JAN24 100 C|CBOE|BUYTOOPEN|O|20240107|10:00:00|USD|1|100|1.0|100|-0.65',
+    ]
+    # Section markers with surrounding whitespace
+    lines[lines.index('STOCK_POSITIONS')] = '  STOCK_POSITIONS \t'
+    for newline in ['\n', '\r\n']:
+        path = tmp_path / 'irregular.tlg'
+        with open(path, 'w', newline='') as file:
+            file.write(newline.join(lines) + newline)
+        assert_same_sections(str(path), chunk_size=256)
+
+def test_rows_shorter_than_the_schema(tmp_path):
+    write_lines(tmp_path / 'short.tlg', ['STOCK_POSITIONS', 'STK_LOT|U1|AAPL', 'STK_LOT|U1|MSFT|MSFT STOCK',
+                                         'OPTION_POSITIONS', 'EOF'])
+    assert_same_sections(str(tmp_path / 'short.tlg'))
+
+def test_parsed_sections_keep_every_row(tmp_path, synthetic_lines):
+    path = str(tmp_path / 'synthetic.tlg')
+    write_lines(path, synthetic_lines)
+    dfs = app.read_trading_sections(path)
+    for section, df in reference_sections(path).items():
+        parsed = dfs[section.lower()]
+        amounts = pd.to_numeric(df['Amount'], errors='coerce').fillna(0)
+        if section == 'STOCK_TRANSACTIONS':
+            # Kept in date order rather than file order
+            parsed = parsed.sort_values('ID')
+            amounts = amounts[df['ID'].sort_values().index]
+        assert parsed['Amount'].tolist() == amounts.tolist()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from conftest import write_lines
+
+@pytest.fixture
+def ledger(tmp_path, synthetic_lines):
+    write_lines(tmp_path / 'synthetic.tlg', synthetic_lines)
+    return app.build_trade_ledger(app.read_trading_sections(str(tmp_path / 'synthetic.tlg'))['option_transactions'])
+
+def period_rows(table, label, column):
+    rows = table[table['period'] == label].drop(columns='period')
+    return rows.set_index(column) if column else rows
+
+def assert_windows_match(ledger, labels, windows):
+    tables = app.calculate_period_analytics(ledger, labels, windows)
+    assert tables['periods']['period'].tolist() == list(labels)
+    for number, (label, (start, end)) in enumerate(zip(labels, windows)):
+        expected = app.calculate_trading_analytics(ledger, start, end)
+        row = tables['periods'].iloc[number]
+        # A window without closed trades has zero metrics (the single-window analytics have none)
+        for metric in app.PERIOD_METRICS:
+            assert row[metric] == pytest.approx(expected.get(metric, 0), rel=1e-9, abs=1e-9, nan_ok=True), \
+                (label, metric)
+
+        type_stats = period_rows(tables['type_stats'], label, 'Type')
+        assert type_stats.to_dict('index') == expected.get('type_stats', {})
+
+        holding = period_rows(tables['holding_period_stats'], label, 'Holding_Period_Category')
+        expected_holding = pd.DataFrame(expected.get('holding_period_stats', {})).T
+        assert list(holding.index) == list(expected_holding.index)
+        if len(holding):
+            np.testing.assert_allclose(holding.to_numpy(dtype=float), expected_holding.to_numpy(dtype=float))
+
+        for name in ['best_trades', 'worst_trades']:
+            assert period_rows(tables[name], label, None).to_dict('records') == expected.get(name, [])
+
+@pytest.mark.parametrize('frequency', app.ANALYTICS_PERIODS)
+def test_calendar_periods(ledger, frequency):
+    labels, windows = app.period_windows(ledger, frequency, '2024-01-20', None)
+    assert windows
+    assert_windows_match(ledger, labels, windows)
+
+def test_explicit_windows(ledger):
+    # Overlapping, open-ended, empty and reversed windows
+    labels, windows = app.parse_windows('2024-01-01:2024-02-29,2024-02-01:2024-04-30,:2024-01-15,2024-03-01:,:,'
+                                        '2030-01-01:2030-02-01,2024-03-01:2024-02-01,2024-02-10:2024-02-10')
+    assert_windows_match(ledger, labels, windows)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import app
+from conftest import write_lines
+
+@pytest.fixture
+def ledger(tmp_path, synthetic_lines):
+    write_lines(tmp_path / 'synthetic.tlg', synthetic_lines)
+    return app.build_trade_ledger(app.read_trading_sections(str(tmp_path / 'synthetic.tlg'))['option_transactions'])
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    # Several batches of paths, so that they run on the pool
+    monkeypatch.setattr(app, 'RESAMPLING_BATCH_ELEMENTS', 20000)
+
+@pytest.mark.parametrize('method', app.RESAMPLING_METHODS)
+def test_same_seed_same_bands(ledger, small_batches, method):
+    run = app.calculate_resampling(ledger, method=method, paths=400, seed=11)
+    assert run == app.calculate_resampling(ledger, method=method, paths=400, seed=11)
+    assert run['bands'] != app.calculate_resampling(ledger, method=method, paths=400, seed=12)['bands']
+    for name, band in run['bands'].items():
+        assert list(band.values()) == sorted(band.values()), name
+
+def test_pool_and_request_give_the_same_paths(ledger, small_batches, monkeypatch):
+    monkeypatch.setattr(app, 'RESAMPLING_WORKERS', 1)
+    in_request = app.calculate_resampling(ledger, '2024-01-15', '2024-04-01', paths=300, block=4, seed=5)
+    monkeypatch.setattr(app, 'RESAMPLING_WORKERS', 2)
+    monkeypatch.setattr(app, 'PROCESS_POOL_WORKERS', 2)
+    assert app.calculate_resampling(ledger, '2024-01-15', '2024-04-01', paths=300, block=4, seed=5) == in_request
+
+def test_observed_path_is_the_history(ledger):
+    run = app.calculate_resampling(ledger, '2024-02-01', None, paths=50)
+    analytics = app.calculate_trading_analytics(ledger, '2024-02-01', None)
+    assert run['trades'] == analytics['total_trades']
+    assert run['observed']['final_pnl'] == pytest.approx(analytics['total_pnl'])
+    assert run['observed']['max_drawdown'] == pytest.approx(analytics['max_drawdown'])
+    assert run['observed']['sharpe_ratio'] == pytest.approx(analytics['sharpe_ratio'])
+
+def test_monte_carlo_draws_single_trades(ledger):
+    run = app.calculate_resampling(ledger, method='montecarlo', paths=2000, seed=3)
+    assert run['block_length'] == 1
+    # Every path draws as many trades as the history, so the history's final P&L is within the bands
+    assert run['bands']['final_pnl']['p5'] < run['observed']['final_pnl'] < run['bands']['final_pnl']['p95']
+    assert 0 <= run['risk_of_ruin'] <= 1 and 0 <= run['probability_of_loss'] <= 1
+
+def test_too_few_trades(ledger):
+    run = app.calculate_resampling(ledger, '2030-01-01', None)
+    assert (run['trades'], run['bands'], run['risk_of_ruin']) == (0, {}, None)
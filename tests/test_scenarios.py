@@ -0,0 +1,83 @@
+from datetime import date
+from math import erf, exp, log, pi, sqrt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+def normal(x):
+    return 0.5 * (1 + erf(x / sqrt(2)))
+
+def reference(spot, strike, years, volatility, rate, put=False):
+    """Black-Scholes value, delta, gamma, vega (per point) and theta (per day) per share, from the closed forms."""
+    d1 = (log(spot / strike) + (rate + volatility ** 2 / 2) * years) / (volatility * sqrt(years))
+    d2 = d1 - volatility * sqrt(years)
+    density = exp(-d1 * d1 / 2) / sqrt(2 * pi)
+    discounted = strike * exp(-rate * years)
+    decay = -spot * density * volatility / (2 * sqrt(years))
+    if put:
+        value = discounted * normal(-d2) - spot * normal(-d1)
+        delta = normal(d1) - 1
+        theta = decay + rate * discounted * normal(-d2)
+    else:
+        value = spot * normal(d1) - discounted * normal(d2)
+        delta = normal(d1)
+        theta = decay - rate * discounted * normal(d2)
+    return {'value': value, 'delta': delta, 'gamma': density / (spot * volatility * sqrt(years)),
+            'vega': spot * density * sqrt(years) / 100, 'theta': theta / 365}
+
+CASES = [(100, 100, 0.5, 0.2, 0.05), (100, 130, 0.1, 0.6, 0.04), (50, 35, 2.0, 0.35, 0.0), (420, 400, 0.02, 0.15, 0.05)]
+
+@pytest.mark.parametrize('spot, strike, years, volatility, rate', CASES)
+def test_calls_and_puts_by_parity(spot, strike, years, volatility, rate):
+    arrays = [np.array([value], dtype=float) for value in (spot, strike, years)]
+    calls = app.black_scholes_calls(*arrays, volatility, rate)
+    parity = app.put_call_parity(*arrays, rate)
+    expected_call = reference(spot, strike, years, volatility, rate)
+    expected_put = reference(spot, strike, years, volatility, rate, put=True)
+    for metric in ['value', 'delta', 'gamma', 'vega', 'theta']:
+        # The normal distribution function is approximated to within 1e-7
+        assert calls[metric][0] == pytest.approx(expected_call[metric], abs=1e-6 * spot), metric
+        put = calls[metric][0] + parity.get(metric, np.zeros(1))[0]
+        assert put == pytest.approx(expected_put[metric], abs=1e-6 * spot), metric
+
+def test_expired_calls_are_worth_their_intrinsic_value():
+    calls = app.black_scholes_calls(np.array([90.0, 110.0]), 100.0, 0.0, 0.3, 0.05)
+    np.testing.assert_allclose(calls['value'], [0, 10], atol=1e-9)
+    for metric in ['gamma', 'vega', 'theta']:
+        np.testing.assert_array_equal(calls[metric], 0)
+
+def test_scenario_grid_prices_puts_and_calls():
+    today = date(2024, 1, 2)
+    positions = pd.DataFrame({'Symbol': ['AAPL', 'AAPL', 'AAPL'], 'Type': ['C', 'P', 'P'],
+                              'Expiration': ['2024-07-01', '2024-07-01', '2024-04-01'],
+                              'Strike': [100.0, 100.0, 90.0], 'Quantity': [2, -1, 3]})
+    market = pd.DataFrame({'Spot': [100.0], 'Volatility': [0.25]}, index=pd.Index(['AAPL'], name='Symbol'))
+    shocks, vols, days = np.array([-0.1, 0.0, 0.1]), np.array([0.0, 0.05]), np.array([0, 30])
+    result = app.calculate_scenarios({'option_positions': positions}, market, shocks, vols, days,
+                                     metrics=('pnl', 'value', 'delta'), rate=0.05, today=today)
+
+    def portfolio(spot, volatility, days_forward, metric):
+        total = 0
+        for row in positions.itertuples():
+            years = ((pd.Timestamp(row.Expiration) - pd.Timestamp(today)).days - days_forward) / 365
+            total += row.Quantity * 100 * reference(spot, row.Strike, years, volatility, 0.05,
+                                                    put=row.Type == 'P')[metric]
+        return total
+
+    # 600 shares, each within 1e-5 of its exact value
+    tolerance = 1e-2
+    grid = result['portfolio']['grid']
+    base = portfolio(100, 0.25, 0, 'value')
+    assert result['portfolio']['today']['value'] == pytest.approx(base, abs=tolerance)
+    for i, shock in enumerate(shocks):
+        for j, vol in enumerate(vols):
+            for k, day in enumerate(days):
+                value = portfolio(100 * (1 + shock), 0.25 + vol, day, 'value')
+                assert grid['value'][i][j][k] == pytest.approx(value, abs=tolerance)
+                assert grid['pnl'][i][j][k] == pytest.approx(value - base, abs=tolerance)
+                assert grid['delta'][i][j][k] == pytest.approx(portfolio(100 * (1 + shock), 0.25 + vol, day,
+                                                                         'delta'), abs=tolerance)
+    assert result['underlyings']['AAPL']['contracts'] == 2
@@ -0,0 +1,48 @@
+import os
+
+import pandas as pd
+import pytest
+
+import app
+from conftest import write_lines
+
+@pytest.fixture
+def tlg(tmp_path, monkeypatch, synthetic_lines):
+    monkeypatch.setattr(app, 'CACHE_DIRECTORY', str(tmp_path / 'cache'))
+    write_lines(tmp_path / 'x.tlg', synthetic_lines)
+    return str(tmp_path / 'x.tlg')
+
+def test_round_trip(tlg):
+    assert app.read_sidecar(tlg) is None
+    parsed = app.load_trading_sections(tlg)
+    mapped = app.read_sidecar(tlg)
+    assert list(mapped) == list(parsed)
+    for section, df in parsed.items():
+        pd.testing.assert_frame_equal(mapped[section], df)
+
+def test_changed_source_invalidates_the_sidecar(tlg):
+    app.load_trading_sections(tlg)
+    with open(tlg, 'a') as file:
+        file.write('\n')
+    assert app.read_sidecar(tlg) is None
+    # Rebuilt on the next load
+    app.load_trading_sections(tlg)
+    assert app.read_sidecar(tlg) is not None
+
+def test_touched_source_invalidates_the_sidecar(tlg):
+    app.load_trading_sections(tlg)
+    stat = os.stat(tlg)
+    os.utime(tlg, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert app.read_sidecar(tlg) is None
+
+def test_other_version_or_damaged_sidecar_is_ignored(tlg, monkeypatch):
+    version = app.SIDECAR_VERSION
+    app.load_trading_sections(tlg)
+    monkeypatch.setattr(app, 'SIDECAR_VERSION', version + 1)
+    assert app.read_sidecar(tlg) is None
+
+    monkeypatch.setattr(app, 'SIDECAR_VERSION', version)
+    assert app.read_sidecar(tlg) is not None
+    with open(os.path.join(app.sidecar_path(tlg), 'manifest.json'), 'w') as file:
+        file.write('{')
+    assert app.read_sidecar(tlg) is None
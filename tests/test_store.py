@@ -0,0 +1,77 @@
+import math
+
+import pandas as pd
+import pytest
+
+import app
+from conftest import write_lines
+
+WINDOWS = [(None, None), ('2024-02-01', None), (None, '2024-02-15'), ('2024-01-10', '2024-03-20'),
+           ('2024-03-01', '2024-03-01'), ('2030-01-01', '2030-02-01')]
+KEYS = ['trading_analytics', 'option_summary', 'option_complex_trades', 'option_transactions', 'stock_transactions']
+
+def comparable(value):
+    """Frames as records and NaN as None, for comparing datasets."""
+    if isinstance(value, pd.DataFrame):
+        return app.table_records(value.reset_index(drop=True))
+    if isinstance(value, dict):
+        return {key: comparable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [comparable(item) for item in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def assert_close(actual, expected, path=''):
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected), path
+        for key in expected:
+            assert_close(actual[key], expected[key], f'{path}.{key}')
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), path
+        for number, (item, expected_item) in enumerate(zip(actual, expected)):
+            assert_close(item, expected_item, f'{path}[{number}]')
+    elif isinstance(expected, float):
+        # Sums over a window start from another row of the store's prefix sums
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-6), path
+    else:
+        assert actual == expected, path
+
+@pytest.fixture
+def store(data_dir, synthetic_lines):
+    write_lines(data_dir / 'x.tlg', synthetic_lines)
+    store = app.TradeStore(str(data_dir.parent / 'store.sqlite'))
+    store.sync('x.tlg')
+    return store
+
+@pytest.mark.parametrize('start_date, end_date', WINDOWS)
+def test_window_matches_the_cached_dataset(store, start_date, end_date):
+    files = ['x.tlg']
+    window = app.dashboard_context(store.window('x.tlg', start_date, end_date), files, 'x.tlg', None, None)
+    cached = app.dashboard_context(app.read_only_view(app.cached_trading_data('x.tlg')), files, 'x.tlg',
+                                   start_date, end_date)
+    for key in KEYS:
+        assert_close(comparable(window[key]), comparable(cached[key]), key)
+
+def test_symbol_window(store):
+    window = store.window('x.tlg', '2024-02-01', None, symbol='MSFT')
+    assert set(window['option_transactions']['Symbol'].astype(str)) == {'MSFT'}
+    assert set(window['trade_ledger'].closed_trades['Symbol'].astype(str)) == {'MSFT'}
+    fills = app.cached_trading_data('x.tlg')['trade_ledger'].fills_between('2024-02-01', None)
+    assert len(window['option_transactions']) == (fills['Symbol'] == 'MSFT').sum()
+
+def test_ledger_window_matches_the_cached_ledger(store):
+    ledger = store.ledger('x.tlg', '2024-01-20', '2024-04-10')
+    cached = app.cached_trading_data('x.tlg')['trade_ledger']
+    for frame, index in [('fills', 'fills_index'), ('closed_trades', 'closed_index'), ('open_trades', 'open_index')]:
+        lo, hi = getattr(cached, index).bounds('2024-01-20', '2024-04-10')
+        expected = getattr(cached, frame).iloc[lo:hi]
+        assert comparable(getattr(ledger, frame)[list(expected.columns)]) == comparable(expected), frame
+
+def test_changed_file_is_stored_again(store, data_dir, synthetic_lines):
+    fingerprint = store.sync('x.tlg')
+    assert store.sync('x.tlg') == fingerprint
+    write_lines(data_dir / 'x.tlg', synthetic_lines[:len(synthetic_lines) // 2] + ['EOF'])
+    assert store.sync('x.tlg') != fingerprint
+    assert len(store.window('x.tlg')['option_transactions']) == len(
+        app.cached_trading_data('x.tlg')['option_transactions'])
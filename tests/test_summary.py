@@ -0,0 +1,44 @@
+import pytest
+
+import app
+from conftest import option_line, write_lines
+
+START, END = '2024-01-01', '2024-02-15'
+
+def ledger_of(path, lines):
+    write_lines(path, lines)
+    return app.build_trade_ledger(app.read_trading_sections(str(path))['option_transactions'])
+
+def test_lots_held_past_the_window_count_as_open(tmp_path):
+    lines = ['OPTION_TRANSACTIONS',
+             option_line(1, 'AAPL 19JAN24 100 C', 'BUYTOOPEN', '20240105', 1, 1.0),
+             option_line(2, 'AAPL 19JAN24 100 C', 'SELLTOCLOSE', '20240110', -1, 1.5),
+             # Opened within the window and closed after it
+             option_line(3, 'MSFT 15MAR24 300 P', 'SELLTOOPEN', '20240120', -2, 3.0),
+             option_line(4, 'SPY 15MAR24 450 C', 'BUYTOOPEN', '20240201', 1, 2.0),
+             option_line(5, 'MSFT 15MAR24 300 P', 'BUYTOCLOSE', '20240301', 2, 1.0),
+             'EOF']
+    summary = app.calculate_option_summary(ledger_of(tmp_path / 'full.tlg', lines), START, END)
+    assert (summary['closed_positions'], summary['open_positions']) == (1, 2)
+    # As if the file had ended with the window
+    expected = app.calculate_option_summary(ledger_of(tmp_path / 'cut.tlg', lines[:5] + ['EOF']), START, END)
+    assert summary == pytest.approx(expected)
+
+def test_held_lots_of_synthetic_fills(tmp_path, synthetic_lines):
+    ledger = ledger_of(tmp_path / 'full.tlg', synthetic_lines)
+    assert len(ledger.held_past(START, END))
+    cut = [line for line in synthetic_lines if not (line.startswith('OPT_TRD') and line.split('|')[7] > '20240215')]
+    summary = app.calculate_option_summary(ledger, START, END)
+    expected = app.calculate_option_summary(ledger_of(tmp_path / 'cut.tlg', cut), START, END)
+    # A lot closed after the window in several fills is one open lot of the cut file
+    for key in ['total_transactions', 'total_premium', 'open_premium', 'total_fees', 'net_pnl', 'closed_positions']:
+        assert summary[key] == pytest.approx(expected[key]), key
+    assert summary['open_positions'] >= expected['open_positions']
+
+def test_store_window_counts_held_lots(data_dir, synthetic_lines):
+    write_lines(data_dir / 'x.tlg', synthetic_lines)
+    store = app.TradeStore(str(data_dir.parent / 'store.sqlite'))
+    store.sync('x.tlg')
+    summary = store.window('x.tlg', START, END)['option_summary']
+    expected = app.calculate_option_summary(app.load_trading_data('x.tlg')['trade_ledger'], START, END)
+    assert summary == pytest.approx(expected)
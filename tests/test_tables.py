@@ -0,0 +1,66 @@
+import pytest
+
+import app
+from conftest import write_lines
+
+@pytest.fixture(params=['memory', 'store'])
+def client(request, data_dir, synthetic_lines, monkeypatch):
+    """A test client serving tables from the cached dataset, or from the SQLite store."""
+    write_lines(data_dir / 'x.tlg', synthetic_lines)
+    if request.param == 'store':
+        monkeypatch.setattr(app, 'SQLITE_STORE', True)
+        monkeypatch.setattr(app, 'trade_store', app.TradeStore(str(data_dir.parent / 'store.sqlite')))
+    return app.app.test_client()
+
+def table(client, name, **params):
+    response = client.get(f'/api/tables/{name}', query_string={'data_file': 'x.tlg', **params})
+    assert response.status_code == 200
+    return response.get_json()
+
+def displayed(record):
+    return '\t'.join(str(value).lower() for value in record.values())
+
+@pytest.mark.parametrize('query', ['start_date=2024-13-45', 'end_date=yesterday', 'start_date=NaT',
+                                   'start_date=2024-01-01&end_date=99999999999'])
+def test_malformed_dates_are_rejected(client, query):
+    response = client.get(f'/api/tables/option_transactions?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Invalid ')
+
+def test_date_range(client):
+    response = client.get('/api/tables/option_transactions?start_date=2024-02-01&end_date=2024-02-29&length=-1')
+    rows = response.get_json()['data']
+    assert response.status_code == 200 and rows
+    assert all('2024-02-01' <= row['Date'][:10] <= '2024-02-29' for row in rows)
+
+@pytest.mark.parametrize('name', ['option_transactions', 'stock_transactions', 'option_positions'])
+def test_paging_sorting_and_searching(client, name):
+    rows = table(client, name, length=-1)['data']
+    assert len(rows) > 4
+    columns = [column for column in app.TABLE_COLUMNS[name] if column in rows[0]]
+
+    # Pages are consecutive slices of the same order
+    size = max(2, len(rows) // 7)
+    pages = [table(client, name, draw=3, start=start, length=size) for start in range(0, len(rows), size)]
+    assert all(page['draw'] == 3 and page['recordsTotal'] == page['recordsFiltered'] == len(rows) for page in pages)
+    assert [row for page in pages for row in page['data']] == rows
+
+    for number, column in enumerate(columns):
+        for direction in ['asc', 'desc']:
+            page = table(client, name, length=-1, **{'order[0][column]': number, 'order[0][dir]': direction})
+            values = [row[column] for row in page['data']]
+            expected = sorted((row[column] for row in rows), key=lambda value: (value is None, value),
+                              reverse=direction == 'desc')
+            # Missing values come last either way
+            assert [value for value in values if value is not None] == [value for value in expected
+                                                                         if value is not None], column
+            assert sorted(map(repr, page['data'])) == sorted(map(repr, rows))
+
+    search = rows[len(rows) // 2]['Symbol'].lower()
+    page = table(client, name, length=5, **{'search[value]': search.upper()})
+    matches = [row for row in rows if search in displayed(row)]
+    assert (page['recordsTotal'], page['recordsFiltered']) == (len(rows), len(matches))
+    assert page['data'] == matches[:5]
+
+def test_unknown_table(client):
+    assert client.get('/api/tables/closed_trades').status_code == 404
@@ -0,0 +1,68 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import app
+from conftest import write_lines
+
+@pytest.fixture
+def tlg(data_dir, synthetic_lines):
+    write_lines(data_dir / 'x.tlg', synthetic_lines)
+    return data_dir / 'x.tlg'
+
+def test_date_presets():
+    assert app.date_presets(date(2024, 3, 31)) == [
+        (None, None), ('2024-01-01', '2024-03-31'), ('2024-03-24', '2024-03-31'), ('2024-03-01', '2024-03-31'),
+        ('2024-01-01', '2024-03-31'), ('2023-04-01', '2024-03-31')]
+
+def test_prewarmed_views_are_served(tlg, monkeypatch):
+    presets = app.date_presets(date(2024, 3, 20))
+    app.prewarm_trading_data('x.tlg', presets)
+    dataset = app.cached_trading_data('x.tlg')
+    assert list(dataset['window_views']) == presets
+    for preset in presets:
+        np.testing.assert_equal(dataset['window_views'][preset], app.calculate_window_view(dataset, *preset))
+
+    # A preset's view is not calculated again; another range is
+    monkeypatch.setattr(app, 'window_view_tasks', lambda *args: pytest.fail('view calculated'))
+    view = app.apply_date_filter(app.read_only_view(dataset), '2024-02-19', '2024-03-20')
+    assert view['option_summary'] is dataset['window_views'][('2024-02-19', '2024-03-20')]['option_summary']
+    with pytest.raises(pytest.fail.Exception):
+        app.apply_date_filter(app.read_only_view(dataset), '2024-02-20', '2024-03-20')
+
+def test_polling_reports_changed_files(tlg, data_dir):
+    changes = app.polling_changes(str(data_dir), 0.01)
+    assert next(changes) == set()
+    with open(tlg, 'a') as file:
+        file.write('\n')
+    write_lines(data_dir / 'y.tlg', ['EOF'])
+    write_lines(data_dir / 'notes.txt', ['not data'])
+    assert next(changes) == {'x.tlg', 'y.tlg'}
+    (data_dir / 'y.tlg').unlink()
+    assert next(changes) == {'y.tlg'}
+
+def test_inotify_reports_changed_files(tlg, data_dir, monkeypatch):
+    monkeypatch.setattr(app, 'DATA_WATCH_DEBOUNCE', 0.05)
+    try:
+        changes = app.inotify_changes(app.open_inotify(str(data_dir)), 0.05)
+    except OSError:
+        pytest.skip('inotify is not available')
+    assert next(changes) == set()
+    with open(tlg, 'a') as file:
+        file.write('\n')
+    assert next(changes) == {'x.tlg'}
+    changes.close()
+
+def test_refresh_rebuilds_changed_files(tlg, synthetic_lines):
+    presets = app.date_presets()
+    watcher = app.DataWatcher(preloaded=True)
+    watcher.refresh({'x.tlg', 'missing.tlg', 'notes.txt'}, presets)
+    old = app.cached_trading_data('x.tlg')
+    assert list(old['window_views']) == presets
+
+    write_lines(tlg, synthetic_lines[:len(synthetic_lines) // 2] + ['EOF'])
+    watcher.refresh({'x.tlg'}, presets)
+    new = app.dataset_cache.latest(old['fingerprint'][0])
+    assert new is not old and new['fingerprint'] == app.file_fingerprint('data/x.tlg')
+    assert list(new['window_views']) == presets